@@ -5,15 +5,35 @@ OpenClaw Monitor - Web Dashboard (Secure Version)
 
 import os
 import sys
+import copy
+import json
+import time
+import signal
+import gzip
+import pstats
 import base64
+import hashlib
+import cProfile
+import threading
 from datetime import datetime
 from functools import wraps
-from flask import Flask, render_template, jsonify, request, Response
+from flask import Flask, render_template, jsonify, request, Response, g
 from flask_cors import CORS
 
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只使用 gzip
+    brotli = None
+
 # 导入自定义模块
 from pricing_manager import PricingManager
 from data_collector import OpenClawCollector
+from collector_scheduler import CollectorScheduler
+from federation import FederationClient, merge_summaries, merge_tasks, merge_token_usage
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, TIMINGS, render_metrics,
+    begin_request_timings, end_request_timings
+)
 
 app = Flask(__name__)
 CORS(app)
@@ -25,15 +45,195 @@ CORS(app)
 AUTH_USERNAME = os.environ.get('MONITOR_USERNAME', 'admin')
 AUTH_PASSWORD = os.environ.get('MONITOR_PASSWORD', 'admin123')
 
-# 全局实例
-pricing_mgr = PricingManager()
-data_collector = OpenClawCollector()
+# 全局实例，由 create_app() 创建
+pricing_mgr = None
+data_collector = None
+# 聚合模式：MONITOR_PEERS 配置了其它主机上的监控实例时启用 /api/fleet/*
+federation = None
+# 后台调度器：API 只读取最新快照，不再在请求线程里收集
+scheduler = None
+_init_lock = threading.Lock()
 
 # 配置
 APP_VERSION = "1.0.0-secure"
 HOST = "0.0.0.0"
 PORT = 8081
 
+# 后台收集器刷新间隔（秒）
+COLLECTOR_INTERVALS = {
+    "version": 60,
+    "gateway": 10,
+    "system": 5,
+    "tasks": 10,
+    "token_usage": 30,
+    "errors": 30
+}
+
+# 快照项超过 STALE_AFTER 个刷新周期未更新时标记为 stale
+STALE_AFTER = 3
+
+# SSE 推送的心跳间隔（秒）：保持连接，并及时发现已断开的客户端
+STREAM_HEARTBEAT = 15
+# 断线后浏览器的重连等待（毫秒）
+STREAM_RETRY_MS = 5000
+
+# 小于该字节数的响应不压缩（压缩收益抵不过开销）
+COMPRESS_MIN_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# 可按主机下钻的 peer 接口
+FLEET_DRILLDOWN = ("summary", "token-usage", "tasks", "system", "logs")
+
+# ?profile=1 时返回的热点函数数量
+PROFILE_TOP_N = 25
+
+# 每次收集都会变化、但不代表数据变化的字段：不参与变化判断和概览的 ETag
+VOLATILE_FIELDS = {
+    "version": ("last_checked",),
+    "gateway": ("uptime_seconds",),
+    "system": ("sampled_at",),
+}
+
+# 不参与概览 ETag 的部分：系统指标每次采样都不同，仍然随概览返回，
+# 但只有这部分变化时不使缓存失效（面板通过 /api/system 读取最新值）
+ETAG_EXCLUDED = ("system",)
+
+
+def stable_view(name):
+    """返回去掉 name 的易变字段的函数（用于变化判断和概览的 ETag）"""
+    volatile = VOLATILE_FIELDS.get(name, ())
+
+    def view(data):
+        if not volatile or not isinstance(data, dict):
+            return data
+        return {key: value for key, value in data.items() if key not in volatile}
+    return view
+
+
+def create_app():
+    """创建全局实例并注册后台收集器，返回 Flask 应用（重复调用无副作用）
+
+    不在模块导入时执行：冷启动回填用 spawn 方式启动子进程，子进程会以 __mp_main__
+    重新导入主模块（python3 app.py 时即本模块），模块级的初始化会在每个子进程里
+    再执行一遍（打开账本、注册退出钩子、创建采样器和监视器）。
+    """
+    global pricing_mgr, data_collector, federation, scheduler
+    with _init_lock:
+        if data_collector is not None:
+            return app
+        pricing_mgr = PricingManager()
+        data_collector = OpenClawCollector()
+        federation = FederationClient.from_env(default_auth=(AUTH_USERNAME, AUTH_PASSWORD))
+        scheduler = CollectorScheduler()
+        scheduler.register("version", data_collector.get_openclaw_version,
+                           COLLECTOR_INTERVALS["version"], fingerprint=stable_view("version"))
+        scheduler.register("gateway", data_collector.get_gateway_status,
+                           COLLECTOR_INTERVALS["gateway"], fingerprint=stable_view("gateway"))
+        scheduler.register("system", data_collector.get_system_info,
+                           COLLECTOR_INTERVALS["system"], fingerprint=stable_view("system"),
+                           notify=False)
+        scheduler.register("tasks", data_collector.get_running_tasks,
+                           COLLECTOR_INTERVALS["tasks"])
+        scheduler.register("token_usage", data_collector.get_token_usage,
+                           COLLECTOR_INTERVALS["token_usage"])
+        scheduler.register("errors", data_collector.get_error_logs,
+                           COLLECTOR_INTERVALS["errors"])
+    return app
+
+
+@app.before_request
+def ensure_initialized():
+    """由 WSGI 服务器直接导入 app 时，在第一个请求前完成初始化"""
+    create_app()
+
+
+# 文件监视器报告变化后立即刷新的收集器
+WATCH_TRIGGERS = {
+    "sessions": ("token_usage", "tasks"),
+    "logs": ("errors",)
+}
+
+
+def on_files_changed(groups):
+    """会话或日志文件变化：提前唤醒对应收集器"""
+    for group in groups:
+        for name in WATCH_TRIGGERS.get(group, ()):
+            scheduler.trigger(name)
+
+
+def start_background():
+    """启动后台收集线程、系统采样线程和文件监视线程（重复调用无副作用）"""
+    scheduler.start()
+    data_collector.system_sampler.start()
+    if data_collector.file_watch_enabled:
+        data_collector.watcher.on_change = on_files_changed
+        data_collector.watcher.start()
+
+
+def with_token_costs(usage):
+    """按模型计算 Token 成本：所有 (模型, tokens) 一次批量定价
+
+    返回新的字典，不修改传入的数据（快照中的数据是共享的）。
+    """
+    if not usage:
+        return usage
+    usage = copy.deepcopy(usage)
+    
+    # 收集所有需要定价的汇总项：今日 / 本周 / 本月、每日、按模型合计
+    groups = [usage[key] for key in ('today', 'week', 'month') if key in usage]
+    groups.extend(usage.get('daily', []))
+    groups.extend(usage.get('agents', []))
+    
+    items = []
+    targets = []
+    for group in groups:
+        group['cost'] = 0
+        for model, tokens in group.get('models', {}).items():
+            items.append((model, tokens.get('input', 0), tokens.get('output', 0)))
+            targets.append((group, tokens))
+    for entry in usage.get('models', []):
+        items.append((entry['model'], entry.get('input', 0), entry.get('output', 0)))
+        targets.append((None, entry))
+    
+    costs = pricing_mgr.calculate_costs(items)
+    currency = pricing_mgr.get_all_pricing()['currency']
+    for (group, tokens), cost in zip(targets, costs):
+        tokens['cost'] = cost['total_cost']
+        if group is not None:
+            group['cost'] += cost['total_cost']
+    for group in groups:
+        group['cost'] = round(group['cost'], 6)
+        group['currency'] = currency
+    usage['currency'] = currency
+    return usage
+
+
+def filter_tasks(tasks, agent):
+    """从任务快照中筛出一个 agent 的任务和计数（不重新扫描）"""
+    if agent is None or not tasks or "tasks" not in tasks:
+        return tasks
+    counts = next(
+        (entry for entry in tasks.get("agents", []) if entry["agent"] == agent),
+        {"running": 0, "completed_24h": 0}
+    )
+    return {
+        **tasks,
+        "running": counts["running"],
+        "completed_24h": counts["completed_24h"],
+        "tasks": [task for task in tasks["tasks"] if task.get("agent") == agent],
+        "agents": [entry for entry in tasks.get("agents", []) if entry["agent"] == agent]
+    }
+
+
+def snapshot_section(name, fallback):
+    """读取快照中的某一项；尚未收集到时同步调用 fallback"""
+    start_background()
+    entry = scheduler.get(name)
+    if entry is None:
+        return fallback()
+    return entry["data"]
+
 
 def check_auth(username, password):
     """验证用户名密码"""
@@ -75,6 +275,116 @@ def requires_auth(f):
     return decorated
 
 
+def negotiate_encoding(accept_encoding):
+    """按 Accept-Encoding 选择压缩算法：优先 brotli（已安装时），其次 gzip"""
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+@app.after_request
+def optimize_response(response):
+    """统一处理 JSON 响应：内容哈希 ETag、If-None-Match 304 和压缩
+
+    SSE 等流式响应不做处理。ETag 为弱校验值，基于未压缩内容计算，
+    因此同一内容的 gzip / brotli 表示共享同一个 ETag。
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.mimetype != 'application/json'
+            or response.status_code != 200):
+        return response
+    
+    if request.method in ('GET', 'HEAD'):
+        response.cache_control.no_cache = True
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+        if response.status_code != 200:
+            return response
+    
+    response.vary.add('Accept-Encoding')
+    if 'Content-Encoding' in response.headers:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=BROTLI_QUALITY))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+    else:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+@app.before_request
+def begin_request_profiling():
+    """开始记录本请求内的埋点调用；?profile=1 时同时开启 cProfile"""
+    g.request_started = time.perf_counter()
+    g.server_timings = []
+    begin_request_timings()
+    if request.args.get('profile') == '1':
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def add_server_timing(name, seconds, desc=None):
+    """向当前请求的 Server-Timing 响应头追加一项"""
+    g.server_timings.append((name, seconds, desc))
+
+
+def profile_report(profiler, limit=PROFILE_TOP_N):
+    """cProfile 结果中累计耗时最高的函数"""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({func})",
+            "calls": ncalls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3)
+        })
+    rows.sort(key=lambda row: row["cumtime_ms"], reverse=True)
+    return {"total_ms": round(stats.total_tt * 1000, 3), "functions": rows[:limit]}
+
+
+@app.after_request
+def add_timing_headers(response):
+    """Server-Timing：本请求内调用的收集器方法、附加项和总耗时
+
+    注册在 optimize_response 之后，因此先于它执行（profile 结果同样会被压缩）。
+    """
+    entries = end_request_timings()
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        if response.status_code != 401:
+            response = jsonify({
+                "path": request.path,
+                "status": response.status_code,
+                "profile": profile_report(profiler)
+            })
+    
+    timings = [(name, seconds, None) for name, seconds in entries]
+    timings.extend(g.get('server_timings', []))
+    parts = []
+    for name, seconds, desc in timings:
+        part = f"{name};dur={seconds * 1000:.2f}"
+        if desc:
+            part += f';desc="{desc}"'
+        parts.append(part)
+    started = g.get('request_started')
+    if started is not None:
+        parts.append(f"total;dur={(time.perf_counter() - started) * 1000:.2f}")
+    if parts:
+        response.headers['Server-Timing'] = ", ".join(parts)
+    return response
+
+
 # 只对 API 和数据页面要求认证，静态资源可公开
 @app.route('/')
 @requires_auth
@@ -85,18 +395,111 @@ def index():
 
 # ========== API 路由（全部需要认证） ==========
 
+def build_summary():
+    """由后台快照组装完整概览数据"""
+    start_background()
+    now = time.time()
+    data = {}
+    changed_at = {}
+    ages = {}
+    sections = {}
+    for name, entry in scheduler.snapshot().items():
+        data[name] = entry["data"]
+        ages[name] = round(now - entry["updated_at"], 3)
+        changed_at[name] = datetime.fromtimestamp(entry["changed_at"]).isoformat()
+        # 收集器卡住（超过 STALE_AFTER 个周期未完成）或最近一次失败时，数据为旧值
+        interval = COLLECTOR_INTERVALS.get(name, 60)
+        sections[name] = {
+            "stale": entry["error"] is not None
+                     or now - entry["updated_at"] > STALE_AFTER * interval,
+            "error": entry["error"]
+        }
+    if data.get("token_usage"):
+        data["token_usage"] = with_token_costs(data["token_usage"])
+    data["timestamp"] = max(changed_at.values(), default=None)
+    data["changed_at"] = changed_at
+    # 每部分快照距最近一次收集完成的秒数
+    data["snapshot_age"] = ages
+    data["sections"] = sections
+    data["monitor_version"] = APP_VERSION
+    return data
+
+
+def summary_etag(data):
+    """概览的 ETag：只对稳定内容取哈希
+
+    易变字段（VOLATILE_FIELDS）、ETAG_EXCLUDED 中的部分和 snapshot_age 仍在响应里，但不参与哈希，
+    重新收集而数据不变时 ETag 保持不变，If-None-Match 能够命中。
+    """
+    stable = {
+        key: stable_view(key)(value)
+        for key, value in data.items() if key not in ETAG_EXCLUDED and key != "snapshot_age"
+    }
+    stable["changed_at"] = {
+        name: value for name, value in data["changed_at"].items() if name not in ETAG_EXCLUDED
+    }
+    stable["timestamp"] = max(stable["changed_at"].values(), default=None)
+    encoded = json.dumps(stable, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+# 最近一次推送的概览：每个快照版本只序列化一次，所有 SSE 连接共享
+_stream_cache = {"scheduler": None, "version": None, "payload": None}
+_stream_lock = threading.Lock()
+
+
+def stream_payload(source, version):
+    """快照版本 version 对应的 summary 事件数据（JSON 字符串）"""
+    with _stream_lock:
+        if _stream_cache["scheduler"] is not source or _stream_cache["version"] != version:
+            _stream_cache["payload"] = app.json.dumps(build_summary())
+            _stream_cache["scheduler"] = source
+            _stream_cache["version"] = version
+        return _stream_cache["payload"]
+
+
 @app.route('/api/summary')
 @requires_auth
 def api_summary():
-    """获取完整概览数据"""
+    """获取完整概览数据（来自后台快照）"""
     try:
-        data = data_collector.get_summary()
-        data["monitor_version"] = APP_VERSION
-        return jsonify(data)
+        data = build_summary()
+        for name, entry in scheduler.snapshot().items():
+            add_server_timing(f"collector.{name}", entry["duration"], "last background run")
+        response = jsonify(data)
+        # optimize_response 不会覆盖已有的 ETag
+        response.set_etag(summary_etag(data), weak=True)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/stream')
+@requires_auth
+def api_stream():
+    """SSE 推送：连接时先发送一次概览，之后仅在快照数据变化时推送"""
+    start_background()
+    source = scheduler
+    
+    def generate():
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        version = None
+        while True:
+            current = source.wait_for_change(version, STREAM_HEARTBEAT)
+            if current == version:
+                # 注释行作为心跳，浏览器会忽略
+                yield ": keepalive\n\n"
+                continue
+            version = current
+            payload = stream_payload(source, version)
+            yield f"id: {version}\nevent: summary\ndata: {payload}\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @app.route('/api/status')
 @requires_auth
 def api_status():
@@ -104,9 +507,9 @@ def api_status():
     try:
         return jsonify({
             "timestamp": datetime.now().isoformat(),
-            "gateway": data_collector.get_gateway_status(),
+            "gateway": snapshot_section("gateway", data_collector.get_gateway_status),
             "tasks": {
-                "running": data_collector.get_running_tasks()["running"]
+                "running": snapshot_section("tasks", data_collector.get_running_tasks)["running"]
             }
         })
     except Exception as e:
@@ -146,6 +549,19 @@ def update_pricing():
     return jsonify({"success": success})
 
 
+@app.route('/api/pricing/import', methods=['POST'])
+@requires_auth
+def import_pricing():
+    """批量导入模型定价（整批只写一次配置文件）"""
+    data = request.json
+    models = data.get('models') if data else None
+    if not isinstance(models, dict) or not models:
+        return jsonify({"success": False, "error": "No models provided"}), 400
+    
+    imported = pricing_mgr.import_pricing(models, data.get('reason', ''))
+    return jsonify({"success": True, "imported": imported})
+
+
 @app.route('/api/pricing/model/<model_name>', methods=['DELETE'])
 @requires_auth
 def delete_model_pricing(model_name):
@@ -211,8 +627,39 @@ def calculate_cost():
 @app.route('/api/tasks')
 @requires_auth
 def get_tasks():
-    """获取任务列表"""
-    return jsonify(data_collector.get_running_tasks())
+    """获取任务列表（?agent= 只看一个 agent）"""
+    agent = request.args.get('agent')
+    if agent is not None and agent not in data_collector.discover_agents():
+        return jsonify({"error": "Unknown agent"}), 404
+    tasks = snapshot_section("tasks", data_collector.get_running_tasks)
+    return jsonify(filter_tasks(tasks, agent))
+
+
+@app.route('/api/sessions')
+@requires_auth
+def get_sessions():
+    """分页查询会话（过滤、排序、游标分页）"""
+    try:
+        return jsonify(data_collector.list_sessions(request.args.to_dict()))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/api/sessions/<session_id>')
+@requires_auth
+def get_session_detail(session_id):
+    """会话详情：元数据和一页记录（?offset=&limit=，offset 为负数时从末尾倒数）"""
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 0)) or None
+    except ValueError:
+        return jsonify({"error": "Invalid offset or limit"}), 400
+    detail = data_collector.get_session_detail(
+        session_id, request.args.get('agent'), offset, limit
+    )
+    if detail is None:
+        return jsonify({"error": "Session not found"}), 404
+    return jsonify(detail)
 
 
 @app.route('/api/logs')
@@ -227,7 +674,16 @@ def get_logs():
 @requires_auth
 def get_system():
     """获取系统信息"""
-    return jsonify(data_collector.get_system_info())
+    return jsonify(snapshot_section("system", data_collector.get_system_info))
+
+
+@app.route('/api/system/history')
+@requires_auth
+def get_system_history():
+    """获取最近 N 分钟的系统指标历史（用于绘图）"""
+    minutes = request.args.get('minutes', 15, type=float)
+    start_background()
+    return jsonify(data_collector.system_sampler.history(minutes * 60))
 
 
 @app.route('/api/version')
@@ -236,29 +692,122 @@ def get_version():
     """获取版本信息"""
     return jsonify({
         "monitor": APP_VERSION,
-        "openclaw": data_collector.get_openclaw_version()
+        "openclaw": snapshot_section("version", data_collector.get_openclaw_version)
     })
 
 
 @app.route('/api/token-usage')
 @requires_auth
 def get_token_usage():
-    """获取 Token 使用统计"""
+    """获取 Token 使用统计（?agent= 只统计一个 agent）"""
     days = request.args.get('days', 7, type=int)
-    usage = data_collector.get_token_usage(days)
-    
-    # 添加成本计算
-    if 'daily' in usage:
-        for day in usage['daily']:
-            cost = pricing_mgr.calculate_cost(
-                'default',
-                day.get('input', 0),
-                day.get('output', 0)
-            )
-            day['cost'] = cost['total_cost']
-            day['currency'] = cost['currency']
-    
-    return jsonify(usage)
+    agent = request.args.get('agent')
+    if agent is not None and agent not in data_collector.discover_agents():
+        return jsonify({"error": "Unknown agent"}), 404
+    usage = data_collector.get_token_usage(days, agent)
+    return jsonify(with_token_costs(usage))
+
+
+@app.route('/api/token-usage/backfill')
+@requires_auth
+def get_backfill_progress():
+    """获取会话文件并行回填进度（冷启动时）"""
+    return jsonify(data_collector.backfill_progress())
+
+
+@app.route('/metrics')
+@requires_auth
+def metrics():
+    """Prometheus 指标（只读取内存中的快照和计数，不触发文件扫描）"""
+    start_background()
+    body = render_metrics(
+        scheduler.snapshot(),
+        scheduler.durations,
+        scheduler.failures,
+        system_sample=data_collector.system_sampler.latest(),
+        error_patterns=data_collector.log_scanner.pattern_counts(),
+        operations=TIMINGS.histogram_map()
+    )
+    return Response(body, content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/api/debug/timings')
+@requires_auth
+def debug_timings():
+    """各收集器方法的耗时统计（滚动窗口）和后台收集器最近一次耗时"""
+    return jsonify({
+        "operations": TIMINGS.summary(),
+        "collectors": {
+            name: {
+                "duration_ms": round(entry["duration"] * 1000, 3),
+                "updated_at": entry["updated_at"],
+                "error": entry["error"]
+            }
+            for name, entry in scheduler.snapshot().items()
+        }
+    })
+
+
+def fleet_hosts():
+    """?host= 指定的主机（逗号分隔）；返回 (主机列表或 None, 错误响应或 None)"""
+    if federation is None:
+        return None, (jsonify({"error": "Federation mode is not enabled"}), 404)
+    host = request.args.get('host')
+    if not host:
+        return None, None
+    hosts = [name.strip() for name in host.split(',') if name.strip()]
+    unknown = [name for name in hosts if name not in federation.peers]
+    if unknown:
+        return None, (jsonify({"error": f"Unknown host: {', '.join(unknown)}"}), 404)
+    return hosts, None
+
+
+@app.route('/api/fleet/summary')
+@requires_auth
+def fleet_summary():
+    """全部主机的概要（?host= 只看部分主机）"""
+    hosts, error = fleet_hosts()
+    if error:
+        return error
+    return jsonify(merge_summaries(federation.fetch('/api/summary', hosts)))
+
+
+@app.route('/api/fleet/token-usage')
+@requires_auth
+def fleet_token_usage():
+    """全部主机合并的 Token 使用统计，hosts 为按主机拆分"""
+    hosts, error = fleet_hosts()
+    if error:
+        return error
+    days = request.args.get('days', 7, type=int)
+    return jsonify(merge_token_usage(
+        federation.fetch(f'/api/token-usage?days={days}', hosts)
+    ))
+
+
+@app.route('/api/fleet/tasks')
+@requires_auth
+def fleet_tasks():
+    """全部主机的任务列表，每个任务带有 host"""
+    hosts, error = fleet_hosts()
+    if error:
+        return error
+    return jsonify(merge_tasks(federation.fetch('/api/tasks', hosts)))
+
+
+@app.route('/api/fleet/hosts/<name>/<endpoint>')
+@requires_auth
+def fleet_host_detail(name, endpoint):
+    """下钻到单台主机：原样返回该 peer 的接口数据及其状态"""
+    if federation is None:
+        return jsonify({"error": "Federation mode is not enabled"}), 404
+    if name not in federation.peers or endpoint not in FLEET_DRILLDOWN:
+        return jsonify({"error": "Not found"}), 404
+    path = f'/api/{endpoint}'
+    if request.query_string:
+        path += '?' + request.query_string.decode()
+    result = federation.fetch(path, [name])[name]
+    return jsonify({"host": name, **result})
 
 
 @app.route('/api/health')
@@ -303,6 +852,11 @@ if __name__ == '__main__':
 ╚══════════════════════════════════════════════════════════╝
     """)
     
+    # docker stop 发送 SIGTERM：转为正常退出，让 atexit 写入未保存的定价配置
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    create_app()
+    start_background()
     app.run(
         host=HOST,
         port=PORT,
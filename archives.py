@@ -0,0 +1,155 @@
+"""
+OpenClaw Monitor - Archives
+压缩归档的流式读取（.gz；安装了 zstandard 时还支持 .zst），以及按内容哈希
+永久缓存的归档解析结果：归档文件不会再变化，同样的内容只需解析一次，
+改名、移动或状态文件丢失后也能直接复用
+"""
+
+import io
+import os
+import copy
+import gzip
+import json
+import hashlib
+import threading
+from collections import deque
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstandard 为可选依赖，未安装时忽略 .zst 归档
+    zstandard = None
+
+
+ARCHIVE_SUFFIXES = (".gz", ".zst")
+
+
+def is_archive(path: str) -> bool:
+    return path.endswith(ARCHIVE_SUFFIXES)
+
+
+def archive_supported(path: str) -> bool:
+    """当前环境能否解压该归档"""
+    if path.endswith(".gz"):
+        return True
+    return path.endswith(".zst") and zstandard is not None
+
+
+def strip_archive_suffix(path: str) -> str:
+    """去掉压缩后缀，得到压缩前的文件名"""
+    for suffix in ARCHIVE_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def open_archive(path: str) -> BinaryIO:
+    """以流式解压方式打开归档，可按行迭代"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst") and zstandard is not None:
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.BufferedReader(reader, 1024 * 1024)
+    raise ValueError(f"不支持的归档格式: {path}")
+
+
+def read_archive_lines(path: str, start: int, count: int) -> Tuple[int, int, List[bytes]]:
+    """流式解压读取第 start 行起的最多 count 行（不含换行）
+
+    start 为负数时从末尾倒数。归档无法随机访问，每次都要解压到末尾才能得到
+    总行数，但只保留需要的行。返回 (总行数, 实际起始行号, 行列表)。
+    """
+    window = deque(maxlen=-start) if start < 0 else []
+    total = 0
+    with open_archive(path) as f:
+        for line in f:
+            if start < 0 or start <= total < start + count:
+                window.append(line.rstrip(b"\n"))
+            total += 1
+    if start < 0:
+        return total, max(0, total + start), list(window)[:count]
+    return total, start, window
+
+
+def has_uncompressed_copy(path: str) -> bool:
+    """压缩前的原文件是否仍然存在（例如 gzip -k），存在时以原文件为准"""
+    return os.path.exists(strip_archive_suffix(path))
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """文件内容哈希（对压缩后的字节计算，不需要解压）"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArchiveCache:
+    """按内容哈希保存归档的解析结果
+
+    digest() 按 (inode, 大小, mtime) 缓存每个路径的哈希，文件未变化时不重新读取；
+    get() / put() 按 (种类, 哈希) 读写解析结果，结果永久保留。
+    state_file 为 None 时只缓存在内存中。
+    """
+
+    def __init__(self, state_file: Optional[str] = None):
+        self.state_file = state_file
+        self._files: Dict[str, list] = {}
+        self._results: Dict[str, Dict[str, dict]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self._files = state.get("files", {})
+            self._results = state.get("results", {})
+        except Exception as e:
+            print(f"加载归档缓存失败: {e}，将重新解析归档")
+
+    def save(self):
+        """有变化时原子写入（临时文件 + rename）"""
+        with self._lock:
+            if not self.state_file or not self._dirty:
+                return
+            # 不再存在的路径只是哈希索引，解析结果按内容保留
+            self._files = {
+                path: entry for path, entry in self._files.items() if os.path.exists(path)
+            }
+            try:
+                os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+                tmp_file = f"{self.state_file}.tmp"
+                with open(tmp_file, "w", encoding="utf-8") as f:
+                    json.dump({"files": self._files, "results": self._results}, f)
+                os.replace(tmp_file, self.state_file)
+                self._dirty = False
+            except Exception as e:
+                print(f"保存归档缓存失败: {e}")
+
+    def digest(self, path: str, st: os.stat_result) -> str:
+        signature = [st.st_ino, st.st_size, st.st_mtime_ns]
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and entry[:3] == signature:
+                return entry[3]
+        value = file_digest(path)
+        with self._lock:
+            self._files[path] = signature + [value]
+            self._dirty = True
+        return value
+
+    def get(self, kind: str, digest: str) -> Optional[dict]:
+        """解析结果的副本，没有缓存时返回 None"""
+        with self._lock:
+            result = self._results.get(kind, {}).get(digest)
+            return copy.deepcopy(result)
+
+    def put(self, kind: str, digest: str, result: dict):
+        with self._lock:
+            self._results.setdefault(kind, {})[digest] = copy.deepcopy(result)
+            self._dirty = True
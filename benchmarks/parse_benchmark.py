@@ -0,0 +1,108 @@
+"""
+OpenClaw Monitor - 会话解析基准测试
+生成一个合成会话文件（大部分是体积较大的工具输出，少量用量记录），
+比较逐行 json.loads 与 字节预过滤 + parse_line 的解析耗时，按每 GB 折算
+
+用法：python benchmarks/parse_benchmark.py [--size-mb 200] [--repeat 3]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import session_index
+from session_index import SessionIndex, extract_usage
+
+
+def write_synthetic_session(path: str, size_mb: int, tool_output_bytes: int = 4096):
+    """写入约 size_mb MB 的会话文件：每 10 行中 1 条用量记录、1 条模型切换"""
+    target = size_mb * 1024 * 1024
+    tool_line = json.dumps({
+        "type": "message",
+        "message": {"role": "toolResult", "content": "x" * tool_output_bytes}
+    }) + "\n"
+    usage_line = json.dumps({
+        "type": "message",
+        "timestamp": "2026-01-01T12:00:00Z",
+        "message": {
+            "role": "assistant",
+            "model": "gpt-4o",
+            "content": "ok",
+            "usage": {"input": 1200, "output": 300, "totalTokens": 1500}
+        }
+    }) + "\n"
+    model_line = json.dumps({"type": "model_change", "modelId": "gpt-4o"}) + "\n"
+
+    written = 0
+    with open(path, "w") as f:
+        while written < target:
+            block = model_line + usage_line + tool_line * 8
+            f.write(block)
+            written += len(block)
+
+
+def baseline_scan(path: str) -> int:
+    """原实现：逐行 json.loads 后再判断类型"""
+    total = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            usage = extract_usage(record)
+            if usage:
+                total += usage["total"]
+    return total
+
+
+def indexed_scan(path: str) -> int:
+    """当前实现：SessionIndex 的字节预过滤 + parse_line"""
+    index = SessionIndex(workers=1)
+    cursors = index.refresh(os.path.dirname(path))
+    return cursors[path]["total"]
+
+
+def measure(func, path: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(path)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "bench.jsonl")
+        write_synthetic_session(path, args.size_mb)
+        size_gb = os.path.getsize(path) / 1024 ** 3
+        expected = baseline_scan(path)
+
+        cases = [("json.loads 每行", baseline_scan)]
+        orjson = session_index.orjson
+        session_index.orjson = None
+        cases.append(("预过滤 + json", indexed_scan))
+        results = [(name, measure(func, path, args.repeat)) for name, func in cases]
+        session_index.orjson = orjson
+        if orjson is not None:
+            results.append(("预过滤 + orjson", measure(indexed_scan, path, args.repeat)))
+        assert indexed_scan(path) == expected
+
+        print(f"文件大小: {size_gb * 1024:.0f} MB")
+        for name, seconds in results:
+            print(f"{name:<16} {seconds:8.3f} s   {seconds / size_gb:8.2f} s/GB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+OpenClaw Monitor - 基准测试
+在合成的 ~/.openclaw 上测量收集器方法和 Flask 路由的冷启动耗时、
+吞吐量以及 p50 / p99 延迟，结果保存为 JSON，便于在提交之间对比回归
+
+用法：
+    python benchmarks/run_benchmarks.py                      # 默认规模
+    python benchmarks/run_benchmarks.py --sessions 1000 --iterations 50
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import base64
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.synthetic_home import SyntheticSpec, generate_home
+
+# 基准测试计时的 Flask 路由
+ROUTES = [
+    "/api/summary",
+    "/api/token-usage?days=7",
+    "/api/tasks",
+    "/api/system",
+    "/api/logs?days=7",
+    "/metrics",
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """最近秩百分位数"""
+    ordered = sorted(samples)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def measure(func: Callable[[], object], iterations: int, warmup: int = 1) -> Dict[str, float]:
+    """重复调用 func，返回吞吐量和延迟分布（毫秒）"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    return {
+        "iterations": iterations,
+        "throughput_per_s": round(iterations / elapsed, 2) if elapsed else None,
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+def timed_once(func: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    func()
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(spec: SyntheticSpec, iterations: int, home: str) -> dict:
+    """生成数据并运行全部基准，返回结果字典"""
+    dataset = generate_home(home, spec)
+
+    # create_app() 创建全局收集器：必须先把 HOME 指向合成目录
+    os.environ["HOME"] = home
+    os.environ["MONITOR_OFFLINE"] = "1"
+    os.environ["MONITOR_FILE_WATCH"] = "off"
+    import app as app_module
+    app_module.create_app()
+
+    collector = app_module.data_collector
+    collector.tmp_logs = dataset["log_dir"]
+    # 不启动后台线程：快照在下面手动刷新，计时不受线程干扰
+    app_module.start_background = lambda: None
+
+    cold = {
+        "get_token_usage": timed_once(collector.get_token_usage),
+        "get_error_logs": timed_once(collector.get_error_logs),
+        "get_running_tasks": timed_once(collector.get_running_tasks),
+    }
+
+    methods = {
+        "get_token_usage": collector.get_token_usage,
+        "get_running_tasks": collector.get_running_tasks,
+        "get_error_logs": collector.get_error_logs,
+        "get_summary": collector.get_summary,
+    }
+    results = {name: measure(func, iterations) for name, func in methods.items()}
+
+    for name in app_module.COLLECTOR_INTERVALS:
+        app_module.scheduler.refresh(name)
+    client = app_module.app.test_client()
+    auth = "Basic " + base64.b64encode(
+        f"{app_module.AUTH_USERNAME}:{app_module.AUTH_PASSWORD}".encode()
+    ).decode()
+    headers = {"Authorization": auth, "Accept-Encoding": "gzip"}
+
+    for route in ROUTES:
+        def request(route=route):
+            resp = client.get(route, headers=headers)
+            assert resp.status_code == 200, f"{route}: {resp.status_code}"
+        results[f"GET {route}"] = measure(request, iterations)
+
+    app_module.pricing_mgr.close()
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "spec": spec.to_dict(),
+        "dataset": {k: v for k, v in dataset.items() if not k.endswith("_dir")},
+        "cold_ms": cold,
+        "benchmarks": results,
+    }
+
+
+def print_report(result: dict):
+    dataset = result["dataset"]
+    print(f"会话文件 {dataset['session_files']} 个 / {dataset['session_bytes'] / 1e6:.1f} MB，"
+          f"日志 {dataset['log_files']} 个 / {dataset['log_bytes'] / 1e6:.1f} MB")
+    print("\n冷启动（首次调用）:")
+    for name, ms in result["cold_ms"].items():
+        print(f"  {name:<28} {ms:10.1f} ms")
+    print(f"\n{'基准':<30} {'吞吐/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, stats in result["benchmarks"].items():
+        print(f"{name:<30} {stats['throughput_per_s']:>10} "
+              f"{stats['p50_ms']:>10.3f} {stats['p99_ms']:>10.3f}")
+
+
+def compare(result: dict, baseline_file: str, threshold: float) -> bool:
+    """与基线结果对比 p50，返回是否存在超过阈值的回归"""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\n对比基线 {baseline['meta'].get('commit')} ({baseline_file}):")
+    regressed = False
+    for name, stats in result["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name)
+        if not old or not old["p50_ms"]:
+            continue
+        ratio = stats["p50_ms"] / old["p50_ms"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  <-- 回归"
+            regressed = True
+        print(f"  {name:<30} {old['p50_ms']:>10.3f} -> {stats['p50_ms']:>10.3f} ms "
+              f"(x{ratio:.2f}){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenClaw Monitor 基准测试")
+    parser.add_argument("--agents", type=int, default=1)
+    parser.add_argument("--sessions", type=int, default=200, help="每个 agent 的会话数")
+    parser.add_argument("--lines", type=int, default=200, help="每个会话的行数")
+    parser.add_argument("--log-files", type=int, default=4)
+    parser.add_argument("--log-kb", type=int, default=1024)
+    parser.add_argument("--models", default=None, help="逗号分隔的模型列表")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", help="结果 JSON 路径（默认 benchmarks/results/<时间>-<提交>.json）")
+    parser.add_argument("--compare", help="与之对比的基线结果 JSON")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="p50 超过基线的该倍数时视为回归（退出码 1）")
+    parser.add_argument("--keep", action="store_true", help="保留生成的合成目录")
+    args = parser.parse_args()
+
+    spec = SyntheticSpec(
+        agents=args.agents,
+        sessions_per_agent=args.sessions,
+        lines_per_session=args.lines,
+        log_files=args.log_files,
+        log_file_kb=args.log_kb,
+    )
+    if args.models:
+        spec.models = args.models.split(",")
+
+    home = tempfile.mkdtemp(prefix="openclaw-bench-")
+    try:
+        result = run(spec, args.iterations, home)
+    finally:
+        if args.keep:
+            print(f"合成目录: {home}")
+        else:
+            shutil.rmtree(home, ignore_errors=True)
+
+    print_report(result)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"{datetime.now():%Y%m%d-%H%M%S}-{result['meta']['commit'] or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"\n结果已保存: {output}")
+
+    if args.compare and compare(result, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
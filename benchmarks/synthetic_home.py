@@ -0,0 +1,160 @@
+"""
+OpenClaw Monitor - 合成 ~/.openclaw 目录生成器
+按给定规模生成 agents/*/sessions 会话文件和错误日志，供基准测试使用
+
+用法：python benchmarks/synthetic_home.py /tmp/bench-home --agents 2 --sessions 200
+"""
+
+import os
+import json
+import random
+import argparse
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timedelta
+from typing import List
+
+
+DEFAULT_MODELS = ["gpt-4o", "claude-3-5-sonnet", "deepseek-chat", "kimi-k2.5", "qwen-max"]
+
+LOG_MESSAGES = [
+    "INFO request completed in {n}ms",
+    "DEBUG heartbeat ok",
+    "ERROR upstream timeout after {n}ms",
+    "WARN connection refused by provider, retry {n}",
+    "ERROR invalid api key for provider #{n}",
+    "INFO tool call finished",
+]
+
+
+@dataclass
+class SyntheticSpec:
+    """合成数据规模"""
+    agents: int = 1
+    sessions_per_agent: int = 200
+    lines_per_session: int = 200
+    usage_ratio: float = 0.2          # 用量记录占全部行的比例
+    tool_output_bytes: int = 2048     # 工具输出行的大小
+    log_files: int = 4
+    log_file_kb: int = 1024
+    days: int = 30                    # 会话时间分布在最近多少天内
+    active_sessions: int = 5          # 最近 1 小时内仍在写入的会话数
+    models: List[str] = field(default_factory=lambda: list(DEFAULT_MODELS))
+    seed: int = 42
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _session_lines(rng: random.Random, spec: SyntheticSpec, start: datetime):
+    model = rng.choice(spec.models)
+    yield json.dumps({"type": "session", "id": "s", "timestamp": start.isoformat()})
+    yield json.dumps({"type": "model_change", "modelId": model})
+    when = start
+    filler = "x" * spec.tool_output_bytes
+    for _ in range(spec.lines_per_session - 2):
+        when += timedelta(seconds=rng.randint(1, 30))
+        roll = rng.random()
+        if roll < 0.02:
+            model = rng.choice(spec.models)
+            yield json.dumps({"type": "model_change", "modelId": model})
+        elif roll < 0.02 + spec.usage_ratio:
+            input_tokens = rng.randint(200, 8000)
+            output_tokens = rng.randint(20, 1500)
+            yield json.dumps({
+                "type": "message",
+                "timestamp": when.isoformat(),
+                "message": {
+                    "role": "assistant",
+                    "model": model,
+                    "content": [{"type": "text", "text": "done"}],
+                    "usage": {
+                        "input": input_tokens,
+                        "output": output_tokens,
+                        "totalTokens": input_tokens + output_tokens
+                    }
+                }
+            })
+        else:
+            yield json.dumps({
+                "type": "message",
+                "timestamp": when.isoformat(),
+                "message": {"role": "toolResult", "content": [{"type": "text", "text": filler}]}
+            })
+
+
+def generate_home(root: str, spec: SyntheticSpec, log_dir: str = None) -> dict:
+    """在 root 下生成 .openclaw 目录，返回生成结果的统计信息
+
+    log_dir 为错误日志目录（默认 root/tmp-openclaw，对应真实环境的 /tmp/openclaw）。
+    """
+    rng = random.Random(spec.seed)
+    now = datetime.now()
+    openclaw_dir = os.path.join(root, ".openclaw")
+    log_dir = log_dir or os.path.join(root, "tmp-openclaw")
+    stats = {"session_files": 0, "session_bytes": 0, "log_files": 0, "log_bytes": 0}
+
+    os.makedirs(openclaw_dir, exist_ok=True)
+    with open(os.path.join(openclaw_dir, "openclaw.json"), "w") as f:
+        json.dump({"gateway": {"port": 18789}}, f)
+
+    for agent in range(spec.agents):
+        name = "main" if agent == 0 else f"agent-{agent}"
+        sessions_dir = os.path.join(openclaw_dir, "agents", name, "sessions")
+        os.makedirs(sessions_dir, exist_ok=True)
+        for index in range(spec.sessions_per_agent):
+            active = agent == 0 and index < spec.active_sessions
+            age = timedelta(minutes=rng.randint(1, 30)) if active \
+                else timedelta(minutes=rng.randint(90, spec.days * 24 * 60))
+            start = now - age - timedelta(minutes=30)
+            path = os.path.join(sessions_dir, f"{rng.getrandbits(64):016x}-{index:05d}.jsonl")
+            with open(path, "w") as f:
+                for line in _session_lines(rng, spec, start):
+                    f.write(line + "\n")
+            mtime = (now - age).timestamp()
+            os.utime(path, (mtime, mtime))
+            stats["session_files"] += 1
+            stats["session_bytes"] += os.path.getsize(path)
+
+    os.makedirs(log_dir, exist_ok=True)
+    for index in range(spec.log_files):
+        path = os.path.join(log_dir, f"openclaw-{index}.log")
+        target = spec.log_file_kb * 1024
+        written = 0
+        with open(path, "w") as f:
+            while written < target:
+                message = rng.choice(LOG_MESSAGES).format(n=rng.randint(1, 50))
+                line = f"{now.isoformat()} {message}\n"
+                f.write(line)
+                written += len(line)
+        stats["log_files"] += 1
+        stats["log_bytes"] += written
+
+    stats["openclaw_dir"] = openclaw_dir
+    stats["log_dir"] = log_dir
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成 ~/.openclaw 目录")
+    parser.add_argument("root")
+    parser.add_argument("--agents", type=int, default=1)
+    parser.add_argument("--sessions", type=int, default=200, help="每个 agent 的会话数")
+    parser.add_argument("--lines", type=int, default=200, help="每个会话的行数")
+    parser.add_argument("--log-files", type=int, default=4)
+    parser.add_argument("--log-kb", type=int, default=1024)
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS))
+    args = parser.parse_args()
+
+    spec = SyntheticSpec(
+        agents=args.agents,
+        sessions_per_agent=args.sessions,
+        lines_per_session=args.lines,
+        log_files=args.log_files,
+        log_file_kb=args.log_kb,
+        models=args.models.split(",")
+    )
+    print(json.dumps(generate_home(args.root, spec), indent=2))
+
+
+if __name__ == "__main__":
+    main()
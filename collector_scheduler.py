@@ -0,0 +1,149 @@
+"""
+OpenClaw Monitor - Collector Scheduler
+后台刷新调度器：每个收集器在自己的线程中按各自间隔运行，
+结果发布为不可变快照，API 只需读取最新快照；
+数据真正变化时递增版本号并唤醒等待者（用于 SSE 推送）
+"""
+
+import time
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, Optional
+
+from metrics import Histogram
+
+
+class CollectorScheduler:
+    """后台收集器调度器
+
+    每次收集完成后都生成一个新的快照映射并整体替换引用（copy-on-write），
+    读取方拿到的快照不会再被修改，因此读取无需加锁。
+    只有收集结果与上一次不同时才递增 version，等待变化的一方
+    （wait_for_change）不会被内容相同的刷新唤醒。
+    """
+
+    def __init__(self):
+        self._collectors: Dict[str, dict] = {}
+        # 每个收集器的耗时直方图和失败次数（供 /metrics 输出）
+        self.durations: Dict[str, Histogram] = {}
+        self.failures: Dict[str, int] = {}
+        self._snapshot: Mapping[str, Mapping] = MappingProxyType({})
+        self._publish_lock = threading.Lock()
+        self._changed = threading.Condition(self._publish_lock)
+        self.version = 0
+        self._stop_event = threading.Event()
+        self._threads = []
+        self.running = False
+
+    def register(self, name: str, func: Callable[[], object], interval: float,
+                 fingerprint: Optional[Callable[[object], object]] = None,
+                 notify: bool = True):
+        """注册收集器，interval 为刷新间隔（秒）
+
+        fingerprint 把收集结果映射为用于判断“是否变化”的稳定部分（去掉采样时间等
+        每次都会变的字段），默认比较整个结果；notify 为 False 的收集器只更新快照，
+        数据变化时不递增 version（不在概览推送中的数据，如系统指标）。
+        """
+        self._collectors[name] = {
+            "func": func,
+            "interval": interval,
+            "fingerprint": fingerprint,
+            "notify": notify,
+            "wake": threading.Event()
+        }
+        self.durations[name] = Histogram()
+        self.failures[name] = 0
+
+    def start(self):
+        """启动所有收集器线程（重复调用无副作用）"""
+        with self._publish_lock:
+            if self.running:
+                return
+            self.running = True
+            self._stop_event.clear()
+
+        for name, collector in self._collectors.items():
+            thread = threading.Thread(
+                target=self._run,
+                args=(name, collector["func"], collector["interval"], collector["wake"]),
+                name=f"collector-{name}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """停止所有收集器线程"""
+        self._stop_event.set()
+        for collector in self._collectors.values():
+            collector["wake"].set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.running = False
+
+    def refresh(self, name: str):
+        """立即同步运行一次指定收集器"""
+        self._collect(name, self._collectors[name]["func"])
+
+    def trigger(self, name: str):
+        """提前唤醒指定收集器的后台线程，立即运行一次（未启动时忽略）"""
+        collector = self._collectors.get(name)
+        if collector is not None:
+            collector["wake"].set()
+
+    def _run(self, name: str, func: Callable[[], object], interval: float,
+             wake: threading.Event):
+        while not self._stop_event.is_set():
+            # 先清除再收集：收集期间到来的 trigger 会让下一轮立即开始
+            wake.clear()
+            self._collect(name, func)
+            wake.wait(interval)
+
+    def _collect(self, name: str, func: Callable[[], object]):
+        started = time.time()
+        try:
+            data, error = func(), None
+        except Exception as e:
+            print(f"收集器 {name} 运行失败: {e}")
+            self.failures[name] += 1
+            previous = self._snapshot.get(name)
+            data, error = (previous["data"] if previous else None), str(e)
+
+        now = time.time()
+        self.durations[name].observe(now - started)
+        collector = self._collectors[name]
+        fingerprint = collector["fingerprint"] or (lambda value: value)
+        with self._publish_lock:
+            previous = self._snapshot.get(name)
+            changed = previous is None or fingerprint(previous["data"]) != fingerprint(data)
+            entry = MappingProxyType({
+                "data": data,
+                "updated_at": now,
+                "changed_at": now if changed else previous["changed_at"],
+                "duration": now - started,
+                "error": error
+            })
+            self._snapshot = MappingProxyType({**self._snapshot, name: entry})
+            if changed and collector["notify"]:
+                self.version += 1
+                self._changed.notify_all()
+
+    def wait_for_change(self, version: Optional[int],
+                        timeout: Optional[float] = None) -> int:
+        """等待快照版本变为不同于 version 的值，返回当前版本
+
+        version 为 None 时立即返回；超时未变化时返回原版本。
+        """
+        with self._changed:
+            if version is not None:
+                self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def snapshot(self) -> Mapping[str, Mapping]:
+        """返回当前快照：{收集器名: {data, updated_at, changed_at, duration, error}}"""
+        return self._snapshot
+
+    def get(self, name: str) -> Optional[Mapping]:
+        """返回单个收集器的最新快照项，尚未收集时返回 None"""
+        return self._snapshot.get(name)
@@ -4,20 +4,69 @@ OpenClaw Monitor - Data Collector
 """
 
 import os
+import copy
 import json
 import glob
+import itertools
 import psutil
 import socket
 import platform
+import shutil
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import requests
 
+from session_index import (
+    SessionIndex, iter_lines_reversed, parse_line, MODEL_CHANGE_MARKER, SESSION_SUFFIXES
+)
+from session_query import query_sessions, session_metadata
+from line_index import LineIndexCache
+from archives import (
+    ARCHIVE_SUFFIXES, ArchiveCache, archive_supported, is_archive, read_archive_lines
+)
+from token_ledger import TokenLedger
+from system_sampler import SystemSampler
+from log_scanner import LogScanner
+from file_watcher import FileWatcher
+from metrics import timed
+
 
 class OpenClawCollector:
     """OpenClaw 数据收集器"""
     
+    # 查找任务模型时最多从会话文件末尾倒读的字节数
+    TASK_TAIL_MAX_BYTES = 4 * 1024 * 1024
+    
+    # Gateway 默认端口（可用 OPENCLAW_GATEWAY_PORT 或 openclaw.json 的 gateway.port 覆盖）
+    GATEWAY_DEFAULT_PORT = 18789
+    # 找不到 Gateway 进程时，两次全量扫描之间的最小间隔（秒）
+    GATEWAY_RESCAN_INTERVAL = 60
+    
+    # 最新版本查询：npm registry 地址和缓存有效期（秒），可用环境变量覆盖
+    NPM_REGISTRY = "https://registry.npmjs.org"
+    VERSION_CHECK_TTL = 6 * 3600
+    
+    # 会话详情每页的默认 / 最大行数
+    SESSION_PAGE_LIMIT = 100
+    SESSION_PAGE_MAX = 1000
+    
+    # 并行刷新各 agent 会话索引的线程数
+    AGENT_REFRESH_WORKERS = 4
+    
+    # get_summary 各部分的截止时间（秒）：超时的部分返回上一次的结果并标记
+    SUMMARY_DEADLINES = {
+        "version": 3.0,
+        "gateway": 2.0,
+        "system": 1.0,
+        "tasks": 3.0,
+        "token_usage": 5.0,
+        "errors": 3.0
+    }
+    
     def __init__(self):
         self.home_dir = os.path.expanduser("~")
         self.openclaw_dir = os.path.join(self.home_dir, ".openclaw")
@@ -26,14 +75,157 @@ class OpenClawCollector:
         self.agents_dir = os.path.join(self.openclaw_dir, "agents")
         self.logs_dir = os.path.join(self.openclaw_dir, "logs")
         self.tmp_logs = "/tmp/openclaw"
+        self.state_dir = os.path.join(self.home_dir, ".openclaw-monitor")
+        try:
+            self.ledger = TokenLedger(
+                os.path.join(self.state_dir, "token_ledger.db")
+            )
+        except Exception as e:
+            print(f"打开 Token 账本失败: {e}，回退到按文件统计")
+            self.ledger = None
+        # 压缩归档（会话与日志）的解析结果，按内容哈希永久缓存
+        self.archive_cache = ArchiveCache(os.path.join(self.state_dir, "archive_cache.json"))
+        # 冷启动回填的进程数，默认等于 CPU 核数，设为 1 关闭并行
+        backfill_workers = os.environ.get("MONITOR_BACKFILL_WORKERS")
+        self.backfill_workers = int(backfill_workers) if backfill_workers else None
+        # 每个 agent 一个独立的增量索引，按需创建；main 沿用原来的状态文件
+        self.session_indexes: Dict[str, SessionIndex] = {}
+        self._agent_lock = threading.Lock()
+        self._agent_pool = None
+        self.session_index = self._get_session_index("main")
+        # 会话详情的行偏移索引（按需建立，随文件增长增量扩展）
+        self.line_indexes = LineIndexCache()
+        self.gateway_port = self._resolve_gateway_port()
+        self.gateway_pidfile = os.environ.get(
+            "OPENCLAW_GATEWAY_PIDFILE",
+            os.path.join(self.openclaw_dir, "gateway.pid")
+        )
+        self._gateway_proc = None
+        self._gateway_last_scan = 0.0
+        self.system_sampler = SystemSampler()
+        self.log_scanner = LogScanner(archive_cache=self.archive_cache)
+        
+        # 文件监视：会话和日志目录的变化立即标记为脏文件，
+        # MONITOR_FILE_WATCH=off 关闭，=poll 强制使用轮询
+        watch_mode = os.environ.get("MONITOR_FILE_WATCH", "auto").lower()
+        self.file_watch_enabled = watch_mode not in ("0", "off", "false", "no")
+        self.watcher = FileWatcher(use_inotify=watch_mode != "poll")
+        self.watcher.watch(os.path.join(self.agents_dir, "*", "sessions"), "sessions",
+                           SESSION_SUFFIXES)
+        self.watcher.watch(self.tmp_logs, "logs", (".log",) + ARCHIVE_SUFFIXES)
+        
+        # 版本检查缓存
+        self.npm_registry = os.environ.get(
+            "OPENCLAW_NPM_REGISTRY", self.NPM_REGISTRY
+        ).rstrip('/')
+        self.version_check_ttl = float(
+            os.environ.get("OPENCLAW_VERSION_CHECK_TTL", self.VERSION_CHECK_TTL)
+        )
+        # 离线模式：从不访问网络（适用于隔离网络环境）
+        self.offline = os.environ.get("MONITOR_OFFLINE", "").lower() in ("1", "true", "yes")
+        self._local_version = None  # (binary 路径, mtime, 版本)
+        self._latest_version = None
+        self._latest_checked = None
+        self._latest_refreshing = False
+        self._version_lock = threading.Lock()
+        
+        # get_summary 并发收集：线程池、各部分上一次的结果和仍在运行的任务
+        self._summary_pool = None
+        self._summary_last: Dict[str, object] = {}
+        self._summary_inflight: Dict[str, object] = {}
+        self._summary_lock = threading.Lock()
+    
+    def _resolve_gateway_port(self) -> int:
+        """Gateway 端口：环境变量 > openclaw.json > 默认值"""
+        env_port = os.environ.get("OPENCLAW_GATEWAY_PORT")
+        if env_port:
+            try:
+                return int(env_port)
+            except ValueError:
+                print(f"无效的 OPENCLAW_GATEWAY_PORT: {env_port}")
+        try:
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                port = json.load(f).get("gateway", {}).get("port")
+                if port:
+                    return int(port)
+        except Exception:
+            pass
+        return self.GATEWAY_DEFAULT_PORT
     
+    @timed("version.local")
+    def _get_local_version(self) -> Optional[str]:
+        """执行 openclaw --version，结果按可执行文件路径和 mtime 缓存"""
+        binary = shutil.which("openclaw")
+        if binary is None:
+            return None
+        try:
+            mtime = os.path.getmtime(binary)
+        except OSError:
+            return None
+        
+        cached = self._local_version
+        if cached is not None and cached[0] == binary and cached[1] == mtime:
+            return cached[2]
+        
+        version = None
+        try:
+            result = subprocess.run(
+                [binary, "--version"],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            if result.returncode == 0:
+                version = result.stdout.strip()
+        except Exception:
+            pass
+        # 失败也缓存，二进制不变就不再重复启动子进程
+        self._local_version = (binary, mtime, version)
+        return version
+    
+    @timed("version.npm_latest")
+    def refresh_latest_version(self) -> Optional[str]:
+        """同步查询 npm registry 上的最新版本并更新缓存"""
+        try:
+            resp = requests.get(f"{self.npm_registry}/openclaw/latest", timeout=5)
+            latest = resp.json().get("version")
+            if latest:
+                self._latest_version = latest
+        except Exception as e:
+            print(f"查询最新版本失败: {e}")
+        finally:
+            # 失败同样记录检查时间，避免在 TTL 内反复超时
+            self._latest_checked = datetime.now()
+            self._latest_refreshing = False
+        return self._latest_version
+    
+    def _schedule_latest_refresh(self):
+        """缓存过期时在后台线程刷新最新版本，不阻塞调用方"""
+        if self.offline:
+            return
+        with self._version_lock:
+            if self._latest_refreshing:
+                return
+            checked = self._latest_checked
+            if checked is not None and \
+                    (datetime.now() - checked).total_seconds() < self.version_check_ttl:
+                return
+            self._latest_refreshing = True
+        threading.Thread(
+            target=self.refresh_latest_version,
+            name="openclaw-version-check",
+            daemon=True
+        ).start()
+    
+    @timed("version")
     def get_openclaw_version(self) -> dict:
-        """获取 OpenClaw 版本信息"""
+        """获取 OpenClaw 版本信息（本地版本按 mtime 缓存，最新版本按 TTL 缓存并后台刷新）"""
         version_info = {
             "current": "unknown",
             "latest": "unknown",
             "update_available": False,
-            "last_checked": None
+            "last_checked": None,
+            "offline": self.offline
         }
         
         try:
@@ -44,76 +236,119 @@ class OpenClawCollector:
                     version_info["current"] = config.get("meta", {}).get("lastTouchedVersion", "unknown")
             
             # 尝试执行命令获取版本
-            try:
-                result = subprocess.run(
-                    ["openclaw", "--version"],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                if result.returncode == 0:
-                    version_info["current"] = result.stdout.strip()
-            except:
-                pass
+            local_version = self._get_local_version()
+            if local_version:
+                version_info["current"] = local_version
             
-            # 检查最新版本（npm registry）
-            try:
-                resp = requests.get(
-                    "https://registry.npmjs.org/openclaw/latest",
-                    timeout=5
-                )
-                latest = resp.json().get("version", "unknown")
-                version_info["latest"] = latest
-                version_info["update_available"] = latest != version_info["current"]
-                version_info["last_checked"] = datetime.now().isoformat()
-            except:
-                pass
+            # 检查最新版本（npm registry），始终返回缓存值
+            self._schedule_latest_refresh()
+            if self._latest_version:
+                version_info["latest"] = self._latest_version
+                version_info["update_available"] = \
+                    self._latest_version != version_info["current"]
+            if self._latest_checked:
+                version_info["last_checked"] = self._latest_checked.isoformat()
                 
         except Exception as e:
             print(f"获取版本信息失败: {e}")
         
         return version_info
     
+    @timed("gateway.find_process")
+    def _find_gateway_process(self) -> Optional[psutil.Process]:
+        """全量查找 Gateway 进程：pidfile → 端口归属 → 命令行匹配"""
+        # 1. pidfile
+        try:
+            with open(self.gateway_pidfile, 'r') as f:
+                return psutil.Process(int(f.read().strip()))
+        except Exception:
+            pass
+        
+        # 2. 监听该端口的进程（只枚举 TCP 连接）
+        try:
+            for conn in psutil.net_connections(kind='tcp'):
+                if (conn.status == psutil.CONN_LISTEN
+                        and conn.laddr and conn.laddr.port == self.gateway_port
+                        and conn.pid):
+                    return psutil.Process(conn.pid)
+        except (psutil.AccessDenied, psutil.NoSuchProcess, OSError):
+            pass
+        
+        # 3. 命令行匹配（排除监控面板自身）
+        own_pid = os.getpid()
+        for proc in psutil.process_iter(['pid', 'cmdline']):
+            try:
+                cmdline = ' '.join(proc.info['cmdline'] or []).lower()
+                if (proc.pid != own_pid and 'openclaw' in cmdline
+                        and 'openclaw-monitor' not in cmdline):
+                    return proc
+            except (psutil.AccessDenied, psutil.NoSuchProcess):
+                continue
+        return None
+    
+    def _get_gateway_process(self) -> Optional[psutil.Process]:
+        """返回缓存的 Gateway 进程，仅在进程消失后才重新全量查找"""
+        proc = self._gateway_proc
+        # is_running() 同时校验 pid 存在且 create_time 未变（防止 pid 复用）
+        if proc is not None and proc.is_running():
+            return proc
+        
+        # 缓存的进程刚刚退出时立即重扫；一直找不到时限制重扫频率
+        self._gateway_proc = None
+        now = time.time()
+        if proc is None and now - self._gateway_last_scan < self.GATEWAY_RESCAN_INTERVAL:
+            return None
+        self._gateway_last_scan = now
+        self._gateway_proc = self._find_gateway_process()
+        return self._gateway_proc
+    
+    @timed("gateway.listening")
+    def _gateway_listening(self, proc: Optional[psutil.Process]) -> bool:
+        """端口是否在监听：优先查看该进程自己的连接，否则尝试本地连接"""
+        if proc is not None:
+            try:
+                connections = getattr(proc, 'net_connections', None) or proc.connections
+                for conn in connections(kind='tcp'):
+                    if (conn.status == psutil.CONN_LISTEN
+                            and conn.laddr.port == self.gateway_port):
+                        return True
+            except (psutil.AccessDenied, psutil.NoSuchProcess):
+                pass
+        try:
+            with socket.create_connection(("127.0.0.1", self.gateway_port), timeout=0.5):
+                return True
+        except OSError:
+            return False
+    
+    @timed("gateway")
     def get_gateway_status(self) -> dict:
         """获取 Gateway 状态"""
         status = {
             "online": False,
             "version": "unknown",
-            "port": 18789,
+            "port": self.gateway_port,
+            "pid": None,
             "uptime_seconds": 0,
+            "start_time": None,
             "last_error": None
         }
         
         try:
-            # 检查端口是否监听
-            for conn in psutil.net_connections():
-                if conn.laddr.port == 18789:
-                    status["online"] = True
-                    break
-            
-            # 尝试获取 Gateway 信息
-            try:
-                resp = requests.get("http://127.0.0.1:18789/health", timeout=2)
-                if resp.status_code == 200:
-                    status["online"] = True
-            except:
-                pass
+            proc = self._get_gateway_process()
+            status["online"] = self._gateway_listening(proc)
             
-            # 获取进程运行时间
-            for proc in psutil.process_iter(['pid', 'name', 'create_time', 'cmdline']):
-                try:
-                    if 'openclaw' in ' '.join(proc.info['cmdline'] or []).lower():
-                        create_time = datetime.fromtimestamp(proc.info['create_time'])
-                        status["uptime_seconds"] = (datetime.now() - create_time).total_seconds()
-                        break
-                except:
-                    continue
+            # 获取进程运行时间（start_time 不随时间变化，用于判断数据是否变化）
+            if proc is not None:
+                status["pid"] = proc.pid
+                status["start_time"] = proc.create_time()
+                status["uptime_seconds"] = time.time() - status["start_time"]
                     
         except Exception as e:
             status["last_error"] = str(e)
         
         return status
     
+    @timed("system")
     def get_system_info(self) -> dict:
         """获取系统信息"""
         try:
@@ -124,27 +359,34 @@ class OpenClawCollector:
             except:
                 ip = "127.0.0.1"
             
+            # CPU / 内存 / 磁盘取采样线程的最新样本，不在请求线程里阻塞
+            sample = self.system_sampler.latest()
+            if sample is None:
+                self.system_sampler.sample()
+                sample = self.system_sampler.latest()
+            
             # 获取 CPU 信息
+            cpu_freq = psutil.cpu_freq()
             cpu_info = {
                 "count": psutil.cpu_count(),
-                "percent": psutil.cpu_percent(interval=1),
-                "freq": psutil.cpu_freq().current if psutil.cpu_freq() else 0
+                "percent": sample["cpu_percent"],
+                "per_core": sample["per_cpu"],
+                "freq": cpu_freq.current if cpu_freq else 0,
+                "load_avg": [sample["load_1"], sample["load_5"], sample["load_15"]]
             }
             
             # 获取内存信息
-            mem = psutil.virtual_memory()
             mem_info = {
-                "total_gb": round(mem.total / (1024**3), 2),
-                "available_gb": round(mem.available / (1024**3), 2),
-                "percent": mem.percent
+                "total_gb": round(sample["memory_total"] / (1024**3), 2),
+                "available_gb": round(sample["memory_available"] / (1024**3), 2),
+                "percent": sample["memory_percent"]
             }
             
             # 获取磁盘信息
-            disk = psutil.disk_usage('/')
             disk_info = {
-                "total_gb": round(disk.total / (1024**3), 2),
-                "free_gb": round(disk.free / (1024**3), 2),
-                "percent": disk.percent
+                "total_gb": round(sample["disk_total"] / (1024**3), 2),
+                "free_gb": round(sample["disk_free"] / (1024**3), 2),
+                "percent": sample["disk_percent"]
             }
             
             return {
@@ -156,75 +398,199 @@ class OpenClawCollector:
                 "cpu": cpu_info,
                 "memory": mem_info,
                 "disk": disk_info,
-                "boot_time": datetime.fromtimestamp(psutil.boot_time()).isoformat()
+                "boot_time": datetime.fromtimestamp(psutil.boot_time()).isoformat(),
+                "sampled_at": datetime.fromtimestamp(sample["timestamp"]).isoformat()
             }
         except Exception as e:
             return {"error": str(e)}
     
-    def get_running_tasks(self) -> dict:
-        """获取运行中的任务"""
+    def _agent_sessions_dir(self, agent: str) -> str:
+        return os.path.join(self.agents_dir, agent, "sessions")
+    
+    def discover_agents(self) -> List[str]:
+        """列出 agents/ 下带 sessions 目录的 agent（main 排在最前）"""
+        try:
+            with os.scandir(self.agents_dir) as entries:
+                agents = sorted(
+                    entry.name for entry in entries
+                    if entry.is_dir() and os.path.isdir(self._agent_sessions_dir(entry.name))
+                )
+        except OSError:
+            return []
+        if "main" in agents:
+            agents.remove("main")
+            agents.insert(0, "main")
+        return agents
+    
+    def _get_session_index(self, agent: str) -> SessionIndex:
+        """取某个 agent 的会话索引，不存在时创建（游标各自保存在独立的状态文件中）"""
+        with self._agent_lock:
+            index = self.session_indexes.get(agent)
+            if index is None:
+                state_name = "session_index.json" if agent == "main" \
+                    else f"session_index.{agent}.json"
+                index = SessionIndex(
+                    os.path.join(self.state_dir, state_name),
+                    ledger=self.ledger,
+                    workers=self.backfill_workers,
+                    agent=agent,
+                    archive_cache=self.archive_cache
+                )
+                self.session_indexes[agent] = index
+            return index
+    
+    def refresh_session_indexes(self, agents: List[str]) -> Dict[str, Dict[str, dict]]:
+        """增量刷新给定 agent 的会话索引，返回 {agent: {路径: 游标}}
+        
+        文件监视器运行时每个 agent 只检查自己目录下的脏文件，没有变化的
+        agent 几乎没有开销；多个 agent 在线程池中并行刷新。
+        """
+        def refresh(agent):
+            sessions_dir = self._agent_sessions_dir(agent)
+            return self._get_session_index(agent).refresh(
+                sessions_dir, self.watcher.take_dirty(sessions_dir)
+            )
+        
+        if len(agents) <= 1:
+            return {agent: refresh(agent) for agent in agents}
+        with self._agent_lock:
+            if self._agent_pool is None:
+                self._agent_pool = ThreadPoolExecutor(
+                    max_workers=self.AGENT_REFRESH_WORKERS,
+                    thread_name_prefix="agent-index"
+                )
+            pool = self._agent_pool
+        futures = {agent: pool.submit(refresh, agent) for agent in agents}
+        return {agent: future.result() for agent, future in futures.items()}
+    
+    def backfill_progress(self) -> dict:
+        """各 agent 最近一次并行回填的进度及合计"""
+        with self._agent_lock:
+            indexes = dict(self.session_indexes)
+        agents = {name: index.backfill_progress() for name, index in indexes.items()}
+        return {
+            "running": any(progress["running"] for progress in agents.values()),
+            "files_total": sum(progress["files_total"] for progress in agents.values()),
+            "files_done": sum(progress["files_done"] for progress in agents.values()),
+            "agents": agents
+        }
+    
+    def session_cursors(self, agents: List[str]) -> Dict[str, Dict[str, dict]]:
+        """各 agent 当前的会话游标
+        
+        文件监视器运行时（只需处理脏文件）或索引尚未建立时增量刷新；
+        否则直接读取内存中的索引，由后台的 Token 收集器保持更新。
+        """
+        stale = [
+            agent for agent in agents
+            if self.watcher.running or self._get_session_index(agent).refreshed_at is None
+        ]
+        cursors = self.refresh_session_indexes(stale)
+        for agent in agents:
+            if agent not in cursors:
+                cursors[agent] = self._get_session_index(agent).snapshot(
+                    self._agent_sessions_dir(agent)
+                )
+        return cursors
+    
+    @timed("sessions")
+    def list_sessions(self, params: Dict[str, str]) -> dict:
+        """按条件分页列出会话（参数见 session_query.query_sessions）"""
+        now = time.time()
+        sessions = [
+            session_metadata(path, cursor, agent, now)
+            for agent, cursors in self.session_cursors(self._select_agents(params.get("agent"))).items()
+            for path, cursor in cursors.items()
+        ]
+        return query_sessions(sessions, params)
+    
+    def _find_session_file(self, session_id: str, agent: Optional[str]) -> Optional[tuple]:
+        """按会话 id 查找文件，返回 (agent, 路径)；未指定 agent 时按 discover_agents 顺序查找
+
+        未压缩的文件优先（与会话索引一致），其次是当前环境能解压的归档。
+        """
+        if not session_id or session_id.startswith(".") or os.path.basename(session_id) != session_id:
+            return None
+        for name in self._select_agents(agent):
+            for suffix in SESSION_SUFFIXES:
+                path = os.path.join(self._agent_sessions_dir(name), f"{session_id}{suffix}")
+                if os.path.isfile(path) and (not is_archive(path) or archive_supported(path)):
+                    return name, path
+        return None
+    
+    @timed("session_detail")
+    def get_session_detail(self, session_id: str, agent: Optional[str] = None,
+                           offset: int = 0, limit: Optional[int] = None) -> Optional[dict]:
+        """会话元数据和第 offset 行起的一页记录；offset 为负数时从末尾倒数
+        
+        行偏移索引按需建立并缓存，之后只扫描新追加的部分；读取任意一页
+        只需按偏移从 mmap 中切出对应的行。压缩归档无法 mmap，流式解压读取。
+        会话不存在时返回 None。
+        """
+        found = self._find_session_file(session_id, agent)
+        if found is None:
+            return None
+        agent, path = found
+        limit = max(1, min(limit or self.SESSION_PAGE_LIMIT, self.SESSION_PAGE_MAX))
+        
+        sessions_dir = self._agent_sessions_dir(agent)
+        cursor = self._get_session_index(agent).refresh(sessions_dir, [path]).get(path)
+        try:
+            if is_archive(path):
+                total, offset, lines = read_archive_lines(path, offset, limit)
+            else:
+                line_index = self.line_indexes.get(path)
+                if offset < 0:
+                    offset = max(0, line_index.update() + offset)
+                total, lines = line_index.read(offset, limit)
+        except (OSError, EOFError) as e:
+            # 文件在读取前消失，或归档已损坏
+            if not isinstance(e, FileNotFoundError):
+                print(f"读取会话文件失败 {path}: {e}")
+            self.line_indexes.discard(path)
+            return None
+        
+        records = []
+        for number, line in enumerate(lines, offset):
+            try:
+                records.append({"line": number, "record": parse_line(line)})
+            except ValueError:
+                records.append({"line": number, "raw": line.decode("utf-8", "replace")})
+        
+        end = offset + len(lines)
+        return {
+            "session": session_metadata(path, cursor, agent, time.time()) if cursor else None,
+            "offset": offset,
+            "limit": limit,
+            "total_lines": total,
+            "next_offset": end if end < total else None,
+            "records": records
+        }
+    
+    def _select_agents(self, agent: Optional[str]) -> List[str]:
+        agents = self.discover_agents()
+        if agent is None:
+            return agents
+        return [name for name in agents if name == agent]
+    
+    @timed("tasks")
+    def get_running_tasks(self, agent: Optional[str] = None) -> dict:
+        """获取运行中的任务（所有 agent，或只看 agent 指定的一个）"""
         tasks = {
             "running": 0,
             "pending": 0,
             "completed_24h": 0,
-            "tasks": []
+            "tasks": [],
+            "agents": []
         }
         
         try:
-            sessions_dir = os.path.join(self.agents_dir, "main", "sessions")
-            if not os.path.exists(sessions_dir):
-                return tasks
-            
             now = datetime.now()
-            
-            for session_file in glob.glob(f"{sessions_dir}/*.jsonl"):
-                try:
-                    # 获取文件修改时间
-                    mtime = datetime.fromtimestamp(os.path.getmtime(session_file))
-                    
-                    # 读取最后几行判断状态
-                    with open(session_file, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                        if not lines:
-                            continue
-                        
-                        # 解析最后一条记录
-                        try:
-                            last_record = json.loads(lines[-1])
-                        except:
-                            continue
-                        
-                        # 简单的状态判断
-                        is_active = (now - mtime).total_seconds() < 3600  # 1小时内活跃
-                        
-                        # 提取模型信息
-                        model = "unknown"
-                        for line in reversed(lines):
-                            try:
-                                record = json.loads(line)
-                                if record.get("type") == "model_change":
-                                    model = record.get("modelId", "unknown")
-                                    break
-                            except:
-                                continue
-                        
-                        task_info = {
-                            "id": os.path.basename(session_file).replace('.jsonl', '')[:8],
-                            "file": os.path.basename(session_file),
-                            "model": model,
-                            "status": "running" if is_active else "completed",
-                            "last_active": mtime.isoformat(),
-                            "duration_minutes": int((now - mtime).total_seconds() / 60)
-                        }
-                        
-                        if is_active:
-                            tasks["running"] += 1
-                            tasks["tasks"].append(task_info)
-                        elif (now - mtime).total_seconds() < 86400:  # 24小时内
-                            tasks["completed_24h"] += 1
-                            
-                except Exception as e:
-                    continue
+            for name in self._select_agents(agent):
+                counts = self._scan_agent_tasks(name, now, tasks["tasks"])
+                tasks["running"] += counts["running"]
+                tasks["completed_24h"] += counts["completed_24h"]
+                tasks["agents"].append({"agent": name, **counts})
             
             # 按时间排序
             tasks["tasks"].sort(key=lambda x: x["last_active"], reverse=True)
@@ -234,86 +600,156 @@ class OpenClawCollector:
         
         return tasks
     
-    def get_token_usage(self, days: int = 7) -> dict:
-        """获取 Token 使用统计"""
+    def _scan_agent_tasks(self, agent: str, now: datetime, task_list: List[dict]) -> dict:
+        """扫描一个 agent 的会话目录，把活跃任务追加到 task_list，返回计数"""
+        counts = {"running": 0, "completed_24h": 0}
+        sessions_dir = self._agent_sessions_dir(agent)
+        # 尾部找不到 model_change 时沿用会话索引游标记录的模型
+        cursors = self._get_session_index(agent).snapshot(sessions_dir)
+        for session_file in glob.glob(f"{sessions_dir}/*.jsonl"):
+            try:
+                # 获取文件修改时间
+                mtime = datetime.fromtimestamp(os.path.getmtime(session_file))
+                age_seconds = (now - mtime).total_seconds()
+                
+                # 24 小时之外的会话不读取内容
+                if age_seconds >= 86400:
+                    continue
+                
+                # 简单的状态判断
+                is_active = age_seconds < 3600  # 1小时内活跃
+                
+                # 从文件末尾倒序读取：最后一条记录必须可解析（总是完整读出），
+                # 活跃会话继续向前找最近的 model_change（受 TASK_TAIL_MAX_BYTES 限制）
+                lines = iter_lines_reversed(
+                    session_file, max_bytes=self.TASK_TAIL_MAX_BYTES
+                )
+                last_line = next(lines, None)
+                if last_line is None:
+                    continue
+                try:
+                    parse_line(last_line)
+                except ValueError:
+                    continue
+                
+                if not is_active:
+                    counts["completed_24h"] += 1
+                    continue
+                
+                # 提取模型信息
+                model = None
+                for record_line in itertools.chain([last_line], lines):
+                    if MODEL_CHANGE_MARKER not in record_line:
+                        continue
+                    try:
+                        record = parse_line(record_line)
+                    except ValueError:
+                        continue
+                    if record.get("type") == "model_change":
+                        model = record.get("modelId", "unknown")
+                        break
+                lines.close()
+                if model is None:
+                    model = cursors.get(session_file, {}).get("model", "unknown")
+                
+                counts["running"] += 1
+                task_list.append({
+                    "id": os.path.basename(session_file).replace('.jsonl', '')[:8],
+                    "agent": agent,
+                    "file": os.path.basename(session_file),
+                    "model": model,
+                    "status": "running",
+                    "last_active": mtime.isoformat(),
+                    "duration_minutes": int(age_seconds / 60)
+                })
+                        
+            except Exception as e:
+                continue
+        return counts
+    
+    @staticmethod
+    def _empty_usage() -> dict:
+        return {"input": 0, "output": 0, "total": 0, "cost": 0, "models": {}}
+    
+    @staticmethod
+    def _add_usage(target: dict, model: str, tokens: dict):
+        """把一个模型的 token 数累加到汇总项及其按模型拆分中"""
+        target["input"] += tokens["input"]
+        target["output"] += tokens["output"]
+        target["total"] += tokens["total"]
+        per_model = target["models"].setdefault(
+            model, {"input": 0, "output": 0, "total": 0}
+        )
+        per_model["input"] += tokens["input"]
+        per_model["output"] += tokens["output"]
+        per_model["total"] += tokens["total"]
+    
+    @timed("token_usage")
+    def get_token_usage(self, days: int = 7, agent: Optional[str] = None) -> dict:
+        """获取 Token 使用统计（按天、按模型、按 agent 拆分）
+
+        agent 指定时只刷新并统计该 agent 的会话。
+        """
         usage = {
-            "today": {"input": 0, "output": 0, "total": 0, "cost": 0},
-            "week": {"input": 0, "output": 0, "total": 0, "cost": 0},
-            "month": {"input": 0, "output": 0, "total": 0, "cost": 0},
+            "today": self._empty_usage(),
+            "week": self._empty_usage(),
+            "month": self._empty_usage(),
             "daily": [],
+            "models": [],
+            "agents": [],
             "total_sessions": 0
         }
         
         try:
-            sessions_dir = os.path.join(self.agents_dir, "main", "sessions")
-            if not os.path.exists(sessions_dir):
+            agents = self._select_agents(agent)
+            if not agents:
                 return usage
             
             today = datetime.now().date()
             daily_data = {}
+            window = self._empty_usage()
+            per_agent = {}
             total_sessions = 0
             
-            for session_file in glob.glob(f"{sessions_dir}/*.jsonl"):
-                try:
-                    file_date = datetime.fromtimestamp(
-                        os.path.getmtime(session_file)
-                    ).date()
+            # 增量刷新各 agent 的游标索引，只解析新追加的内容（同时写入账本）
+            cursors_by_agent = self.refresh_session_indexes(agents)
+            
+            if self.ledger is not None:
+                return self._token_usage_from_ledger(usage, days, agent)
+            
+            for name, cursors in cursors_by_agent.items():
+                agent_usage = per_agent[name] = {**self._empty_usage(), "sessions": 0}
+                for cursor in cursors.values():
+                    file_date = datetime.fromtimestamp(cursor["mtime"]).date()
                     
-                    # 只读取最近的数据
+                    # 只统计最近的数据
                     if (today - file_date).days > days:
                         continue
                     
                     date_str = file_date.isoformat()
                     if date_str not in daily_data:
-                        daily_data[date_str] = {"input": 0, "output": 0, "total": 0, "cost": 0}
-                    
-                    # 解析文件中的 token 使用
-                    session_input = 0
-                    session_output = 0
+                        daily_data[date_str] = self._empty_usage()
                     
-                    with open(session_file, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            try:
-                                record = json.loads(line)
-                                if record.get("type") == "message":
-                                    message = record.get("message", {})
-                                    if message.get("role") == "assistant":
-                                        usage_data = message.get("usage", {})
-                                        if usage_data:
-                                            # 支持多种格式
-                                            input_tokens = usage_data.get("input", 0) or usage_data.get("input_tokens", 0)
-                                            output_tokens = usage_data.get("output", 0) or usage_data.get("output_tokens", 0)
-                                            total_tokens = usage_data.get("totalTokens", 0) or (input_tokens + output_tokens)
-                                            
-                                            session_input += input_tokens
-                                            session_output += output_tokens
-                                            
-                                            # 累加到每日统计
-                                            daily_data[date_str]["input"] += input_tokens
-                                            daily_data[date_str]["output"] += output_tokens
-                                            daily_data[date_str]["total"] += total_tokens
-                            except:
-                                continue
+                    # 旧版游标没有按模型拆分，整体归入当前模型
+                    models = cursor.get("models") or (
+                        {cursor.get("model", "unknown"): cursor} if cursor["total"] else {}
+                    )
+                    for model, tokens in models.items():
+                        self._add_usage(daily_data[date_str], model, tokens)
+                        self._add_usage(window, model, tokens)
+                        self._add_usage(agent_usage, model, tokens)
                     
-                    if session_input > 0 or session_output > 0:
+                    if cursor["input"] > 0 or cursor["output"] > 0:
                         total_sessions += 1
-                                
-                except Exception as e:
-                    continue
-            
-            # 汇总数据
-            today_str = today.isoformat()
-            for date_str, data in daily_data.items():
-                if date_str == today_str:
-                    usage["today"] = data
-                usage["week"]["input"] += data["input"]
-                usage["week"]["output"] += data["output"]
-                usage["week"]["total"] += data["total"]
-                usage["month"]["input"] += data["input"]
-                usage["month"]["output"] += data["output"]
-                usage["month"]["total"] += data["total"]
+                        agent_usage["sessions"] += 1
             
+            # 汇总数据（按文件统计时周 / 月即整个查询窗口；各自独立，定价时不会重复累加）
+            usage["today"] = daily_data.get(today.isoformat(), usage["today"])
+            usage["week"] = window
+            usage["month"] = copy.deepcopy(window)
             usage["total_sessions"] = total_sessions
+            usage["models"] = self._model_list(window)
+            usage["agents"] = self._agent_list(per_agent)
             
             # 转换为列表格式用于图表
             usage["daily"] = [
@@ -326,72 +762,155 @@ class OpenClawCollector:
         
         return usage
     
+    @staticmethod
+    def _agent_list(per_agent: Dict[str, dict]) -> List[dict]:
+        return sorted(
+            ({"agent": name, **data} for name, data in per_agent.items()),
+            key=lambda x: x["total"],
+            reverse=True
+        )
+    
+    @staticmethod
+    def _model_list(window: dict) -> List[dict]:
+        return sorted(
+            ({"model": model, **tokens} for model, tokens in window["models"].items()),
+            key=lambda x: x["total"],
+            reverse=True
+        )
+    
+    @timed("token_usage.ledger_query")
+    def _token_usage_from_ledger(self, usage: dict, days: int,
+                                 agent: Optional[str] = None) -> dict:
+        """从 SQLite 账本的 (天, 模型) 汇总表单次查询 Token 统计（按记录时间归属日期）"""
+        now = datetime.now()
+        today = now.date()
+        since = (today - timedelta(days=days)).isoformat()
+        today_str = today.isoformat()
+        week_start = (today - timedelta(days=6)).isoformat()
+        month_start = (today - timedelta(days=29)).isoformat()
+        
+        daily_data = {}
+        window = self._empty_usage()
+        for row in self.ledger.daily_by_model(min(since, month_start), agent):
+            day, model = row["day"], row["model"]
+            if day >= since:
+                if day not in daily_data:
+                    daily_data[day] = self._empty_usage()
+                self._add_usage(daily_data[day], model, row)
+                self._add_usage(window, model, row)
+            if day == today_str:
+                self._add_usage(usage["today"], model, row)
+            if day >= week_start:
+                self._add_usage(usage["week"], model, row)
+            if day >= month_start:
+                self._add_usage(usage["month"], model, row)
+        
+        usage["models"] = self._model_list(window)
+        usage["total_sessions"] = self.ledger.session_count(since, agent)
+        
+        per_agent = {}
+        sessions = self.ledger.session_counts_by_agent(since)
+        for row in self.ledger.totals_by_agent(since):
+            name = row["agent"]
+            if agent is not None and name != agent:
+                continue
+            if name not in per_agent:
+                per_agent[name] = {**self._empty_usage(), "sessions": sessions.get(name, 0)}
+            self._add_usage(per_agent[name], row["model"], row)
+        usage["agents"] = self._agent_list(per_agent)
+        usage["daily"] = [
+            {"date": d, **data}
+            for d, data in sorted(daily_data.items())
+        ]
+        since_hour = (now - timedelta(hours=23)).strftime("%Y-%m-%dT%H")
+        usage["hourly"] = [
+            {"hour": row.pop("hour"), **row}
+            for row in self.ledger.hourly(since_hour, agent)
+        ]
+        return usage
+    
+    @timed("errors")
     def get_error_logs(self, days: int = 7) -> List[dict]:
-        """获取错误日志"""
+        """获取错误日志（增量扫描，只处理新追加的日志内容）"""
         errors = []
-        error_patterns = [
-            "error", "fail", "timeout", "refused", "blocked",
-            "invalid", "expired", "unauthorized", "exception"
-        ]
         
         try:
-            # 检查日志文件
-            log_files = []
-            
-            # /tmp/openclaw 日志
-            if os.path.exists(self.tmp_logs):
-                log_files.extend(glob.glob(f"{self.tmp_logs}/*.log"))
-            
-            # 读取日志
-            now = datetime.now()
-            error_counts = {}
-            
-            for log_file in log_files:
-                try:
-                    mtime = datetime.fromtimestamp(os.path.getmtime(log_file))
-                    if (now - mtime).days > days:
-                        continue
-                    
-                    with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                        for line in f:
-                            line_lower = line.lower()
-                            for pattern in error_patterns:
-                                if pattern in line_lower:
-                                    # 提取错误信息
-                                    error_key = line.strip()[:100]
-                                    if error_key in error_counts:
-                                        error_counts[error_key]["count"] += 1
-                                    else:
-                                        error_counts[error_key] = {
-                                            "message": line.strip()[:200],
-                                            "count": 1,
-                                            "time": mtime.isoformat(),
-                                            "level": "error" if "error" in line_lower else "warning"
-                                        }
-                                    break
-                except:
-                    continue
+            # 文件监视器在运行时只处理变化过的日志文件
+            dirty = self.watcher.take_dirty(self.tmp_logs)
+            if dirty is not None:
+                self.log_scanner.refresh(dirty, complete=False)
+            else:
+                # /tmp/openclaw 日志及轮转后压缩的归档（*.log.gz、*.log.1.gz 等）
+                log_files = []
+                if os.path.exists(self.tmp_logs):
+                    log_files.extend(glob.glob(f"{self.tmp_logs}/*.log"))
+                    for suffix in ARCHIVE_SUFFIXES:
+                        log_files.extend(glob.glob(f"{self.tmp_logs}/*.log*{suffix}"))
+                self.log_scanner.refresh(log_files)
             
-            # 转换为列表并排序
-            errors = sorted(
-                error_counts.values(),
-                key=lambda x: x["count"],
-                reverse=True
-            )[:10]  # 只返回前 10 个
+            # 只返回前 10 个
+            errors = self.log_scanner.top_errors(days, limit=10)
             
         except Exception as e:
             print(f"获取错误日志失败: {e}")
         
         return errors
     
-    def get_summary(self) -> dict:
-        """获取完整汇总数据"""
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "version": self.get_openclaw_version(),
-            "gateway": self.get_gateway_status(),
-            "system": self.get_system_info(),
-            "tasks": self.get_running_tasks(),
-            "token_usage": self.get_token_usage(),
-            "errors": self.get_error_logs()
+    @timed("summary")
+    def get_summary(self, deadlines: Optional[Dict[str, float]] = None) -> dict:
+        """获取完整汇总数据：各部分并发收集，每部分有独立的截止时间
+
+        超时或出错的部分返回上一次成功的结果（没有则为 None），并在 sections
+        中标记 timed_out / stale，不会拖慢或中断整个汇总。
+        /api/summary 读取后台调度器的快照，不经过这里；本方法供不运行调度器的
+        调用方（如 benchmarks/run_benchmarks.py）一次性同步获取完整汇总。
+        """
+        deadlines = {**self.SUMMARY_DEADLINES, **(deadlines or {})}
+        sources = {
+            "version": self.get_openclaw_version,
+            "gateway": self.get_gateway_status,
+            "system": self.get_system_info,
+            "tasks": self.get_running_tasks,
+            "token_usage": self.get_token_usage,
+            "errors": self.get_error_logs
         }
+        
+        with self._summary_lock:
+            if self._summary_pool is None:
+                self._summary_pool = ThreadPoolExecutor(
+                    max_workers=len(sources), thread_name_prefix="summary"
+                )
+            futures = {}
+            for name, func in sources.items():
+                # 上一次超时的任务仍在运行时直接复用，同一部分最多一个在途任务
+                future = self._summary_inflight.get(name)
+                if future is not None and future.done() and future.exception() is None:
+                    # 上次超时但随后完成的结果：先记为最近一次成功结果
+                    self._summary_last[name] = future.result()
+                if future is None or future.done():
+                    future = self._summary_pool.submit(func)
+                    self._summary_inflight[name] = future
+                futures[name] = future
+        
+        started = time.monotonic()
+        summary = {"timestamp": datetime.now().isoformat()}
+        sections = {}
+        for name, future in futures.items():
+            remaining = max(0.0, started + deadlines[name] - time.monotonic())
+            status = {"timed_out": False, "stale": False, "error": None}
+            try:
+                data = future.result(timeout=remaining)
+                self._summary_last[name] = data
+            except FutureTimeoutError:
+                status["timed_out"] = True
+                data = self._summary_last.get(name)
+                status["stale"] = data is not None
+            except Exception as e:
+                status["error"] = str(e)
+                data = self._summary_last.get(name)
+                status["stale"] = data is not None
+            summary[name] = data
+            sections[name] = status
+        
+        summary["sections"] = sections
+        return summary
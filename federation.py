@@ -0,0 +1,334 @@
+"""
+OpenClaw Monitor - Federation
+聚合模式：并发请求多台主机上的 OpenClaw Monitor（peer），合并为全局视图
+
+所有 peer 共用一个带连接池的 requests.Session（keep-alive），每个 peer 的结果
+按路径缓存；请求超时或失败的 peer 返回上一次的缓存数据并标记 stale，
+不会拖慢整个页面。
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def parse_peers(spec: str) -> List[Tuple[str, str]]:
+    """解析 peer 列表：逗号分隔的 [名称=]URL，省略名称时使用 host:port"""
+    peers = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, url = item.partition("=")
+        if not sep or "://" in name:
+            name, url = "", item
+        url = url.strip().rstrip("/")
+        name = name.strip() or urlsplit(url).netloc
+        if any(name == existing for existing, _ in peers):
+            raise ValueError(f"重复的 peer 名称: {name}")
+        peers.append((name, url))
+    return peers
+
+
+class FederationClient:
+    """peer 监控实例的并发客户端
+
+    fetch() 对所有 peer 并发请求同一路径，最多等待 timeout 秒：
+    - 缓存未过期（cache_ttl 内）的 peer 不发请求；
+    - 过期的 peer 带 If-None-Match 重新请求，304 时沿用缓存数据；
+    - 超时或失败的 peer 返回上一次的数据，stale 为 True 并附带 error；
+      仍在进行中的请求会被下一次 fetch 复用，不会重复堆积。
+    """
+
+    # 每个 peer 的请求超时（秒）
+    DEFAULT_TIMEOUT = 3.0
+    # 结果缓存有效期（秒）
+    DEFAULT_CACHE_TTL = 5.0
+    # 并发请求的线程数上限
+    MAX_WORKERS = 16
+
+    def __init__(self, peers: List[Tuple[str, str]], auth: Optional[Tuple[str, str]] = None,
+                 timeout: float = DEFAULT_TIMEOUT, cache_ttl: float = DEFAULT_CACHE_TTL):
+        self.peers = dict(peers)
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.session = requests.Session()
+        self.session.auth = auth
+        self.session.headers["Accept-Encoding"] = "gzip"
+        adapter = HTTPAdapter(pool_connections=max(1, len(self.peers)),
+                              pool_maxsize=4)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(
+            max_workers=min(self.MAX_WORKERS, max(1, len(self.peers)) * 2),
+            thread_name_prefix="federation"
+        )
+        self._cache: Dict[Tuple[str, str], dict] = {}
+        self._inflight: Dict[Tuple[str, str], object] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, default_auth: Optional[Tuple[str, str]] = None) -> Optional["FederationClient"]:
+        """由 MONITOR_PEERS 等环境变量创建；未配置 peer 时返回 None"""
+        spec = os.environ.get("MONITOR_PEERS", "")
+        peers = parse_peers(spec)
+        if not peers:
+            return None
+        username = os.environ.get("MONITOR_PEER_USERNAME")
+        password = os.environ.get("MONITOR_PEER_PASSWORD")
+        auth = (username, password) if username and password else default_auth
+        return cls(
+            peers,
+            auth=auth,
+            timeout=float(os.environ.get("MONITOR_PEER_TIMEOUT", cls.DEFAULT_TIMEOUT)),
+            cache_ttl=float(os.environ.get("MONITOR_PEER_CACHE_TTL", cls.DEFAULT_CACHE_TTL))
+        )
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.session.close()
+
+    def _request(self, name: str, path: str) -> dict:
+        """请求一个 peer，返回新的缓存项（在线程池中执行）"""
+        key = (name, path)
+        cached = self._cache.get(key)
+        headers = {}
+        if cached is not None and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        started = time.perf_counter()
+        resp = self.session.get(self.peers[name] + path, headers=headers, timeout=self.timeout)
+        latency = round((time.perf_counter() - started) * 1000, 1)
+        if resp.status_code == 304 and cached is not None:
+            data = cached["data"]
+        else:
+            resp.raise_for_status()
+            data = resp.json()
+        entry = {
+            "data": data,
+            "etag": resp.headers.get("ETag"),
+            "fetched_at": time.time(),
+            "latency_ms": latency,
+            "error": None
+        }
+        with self._lock:
+            self._cache[key] = entry
+        return entry
+
+    def fetch(self, path: str, hosts: Optional[List[str]] = None) -> Dict[str, dict]:
+        """并发请求各 peer 的 path，返回 {peer: {data, fetched_at, latency_ms, stale, error}}"""
+        names = [name for name in self.peers if hosts is None or name in hosts]
+        now = time.time()
+        futures = {}
+        results = {}
+        with self._lock:
+            for name in names:
+                key = (name, path)
+                cached = self._cache.get(key)
+                if cached is not None and cached["error"] is None \
+                        and now - cached["fetched_at"] < self.cache_ttl:
+                    results[name] = cached
+                    continue
+                future = self._inflight.get(key)
+                if future is None or future.done():
+                    future = self._pool.submit(self._request, name, path)
+                    self._inflight[key] = future
+                futures[name] = future
+
+        if futures:
+            wait(futures.values(), timeout=self.timeout)
+
+        for name, future in futures.items():
+            key = (name, path)
+            if future.done() and future.exception() is None:
+                results[name] = future.result()
+                continue
+            error = "timeout" if not future.done() else str(future.exception())
+            with self._lock:
+                cached = self._cache.get(key)
+                # 失败也记录下来，避免在缓存有效期内把它当作新数据
+                if cached is not None:
+                    cached = self._cache[key] = {**cached, "error": error}
+            results[name] = cached or {
+                "data": None, "etag": None, "fetched_at": None,
+                "latency_ms": None, "error": error
+            }
+
+        return {
+            name: {
+                "data": results[name]["data"],
+                "fetched_at": results[name]["fetched_at"],
+                "latency_ms": results[name]["latency_ms"],
+                "stale": results[name]["error"] is not None,
+                "error": results[name]["error"]
+            }
+            for name in names
+        }
+
+
+def _host_status(result: dict) -> dict:
+    return {
+        "stale": result["stale"],
+        "error": result["error"],
+        "fetched_at": result["fetched_at"],
+        "latency_ms": result["latency_ms"]
+    }
+
+
+def _add_cost(target: dict, source: dict, currency: str):
+    """按币种累加成本：各 peer 的显示币种可能不同，不能直接相加"""
+    if source.get("cost") is None:
+        return
+    costs = target.setdefault("costs", {})
+    costs[currency] = costs.get(currency, 0) + source["cost"]
+
+
+def _add_tokens(target: dict, source: dict, currency: str):
+    """累加 input / output / total、按币种的成本以及按模型拆分"""
+    for field in ("input", "output", "total"):
+        target[field] = target.get(field, 0) + (source.get(field) or 0)
+    _add_cost(target, source, currency)
+    for model, tokens in (source.get("models") or {}).items():
+        per_model = target.setdefault("models", {}).setdefault(
+            model, {"input": 0, "output": 0, "total": 0, "costs": {}}
+        )
+        for field in ("input", "output", "total"):
+            per_model[field] += tokens.get(field, 0)
+        _add_cost(per_model, tokens, currency)
+
+
+def _settle_costs(target: dict):
+    """只有一种币种时 cost 为合计；币种不一致时 cost 为 None，按币种的合计见 costs"""
+    costs = target.setdefault("costs", {})
+    if len(costs) > 1:
+        target["cost"] = None
+    else:
+        target["cost"] = round(sum(costs.values()), 6)
+    for per_model in (target.get("models") or {}).values():
+        _settle_costs(per_model)
+
+
+def _empty_tokens() -> dict:
+    return {"input": 0, "output": 0, "total": 0, "costs": {}, "models": {}}
+
+
+def merge_token_usage(results: Dict[str, dict]) -> dict:
+    """合并各 peer 的 /api/token-usage：全局合计 + hosts 按主机拆分
+
+    成本按各 peer 的币种分别合计（costs）；所有 peer 币种相同时 cost / currency
+    与单机接口一致，否则 cost 与 currency 为 None，currencies 列出涉及的币种。
+    """
+    merged = {
+        "today": _empty_tokens(),
+        "week": _empty_tokens(),
+        "month": _empty_tokens(),
+        "daily": [],
+        "models": [],
+        "total_sessions": 0,
+        "currency": None,
+        "currencies": [],
+        "hosts": []
+    }
+    daily: Dict[str, dict] = {}
+    models: Dict[str, dict] = {}
+    currencies = set()
+    for name, result in results.items():
+        usage = result["data"] or {}
+        currency = usage.get("currency") or "unknown"
+        if usage:
+            currencies.add(currency)
+        for period in ("today", "week", "month"):
+            _add_tokens(merged[period], usage.get(period) or {}, currency)
+        for day in usage.get("daily", []):
+            _add_tokens(daily.setdefault(day["date"], _empty_tokens()), day, currency)
+        for entry in usage.get("models", []):
+            target = models.setdefault(entry["model"], {"input": 0, "output": 0, "total": 0, "costs": {}})
+            for field in ("input", "output", "total"):
+                target[field] += entry.get(field) or 0
+            _add_cost(target, entry, currency)
+        merged["total_sessions"] += usage.get("total_sessions", 0)
+        week = usage.get("week") or {}
+        merged["hosts"].append({
+            "host": name,
+            "input": week.get("input", 0),
+            "output": week.get("output", 0),
+            "total": week.get("total", 0),
+            "cost": week.get("cost", 0),
+            "currency": usage.get("currency"),
+            "sessions": usage.get("total_sessions", 0),
+            **_host_status(result)
+        })
+    merged["daily"] = [{"date": day, **data} for day, data in sorted(daily.items())]
+    merged["models"] = sorted(
+        ({"model": model, **tokens} for model, tokens in models.items()),
+        key=lambda x: x["total"], reverse=True
+    )
+    for target in [merged["today"], merged["week"], merged["month"],
+                   *merged["daily"], *merged["models"]]:
+        _settle_costs(target)
+    merged["currencies"] = sorted(currencies)
+    if len(currencies) == 1:
+        merged["currency"] = merged["currencies"][0]
+    return merged
+
+
+def merge_tasks(results: Dict[str, dict]) -> dict:
+    """合并各 peer 的 /api/tasks：任务带上 host 字段"""
+    merged = {"running": 0, "pending": 0, "completed_24h": 0, "tasks": [], "hosts": []}
+    for name, result in results.items():
+        tasks = result["data"] or {}
+        for field in ("running", "pending", "completed_24h"):
+            merged[field] += tasks.get(field, 0)
+        merged["tasks"].extend({**task, "host": name} for task in tasks.get("tasks", []))
+        merged["hosts"].append({
+            "host": name,
+            "running": tasks.get("running", 0),
+            "completed_24h": tasks.get("completed_24h", 0),
+            **_host_status(result)
+        })
+    merged["tasks"].sort(key=lambda x: x.get("last_active", ""), reverse=True)
+    return merged
+
+
+def merge_summaries(results: Dict[str, dict]) -> dict:
+    """合并各 peer 的 /api/summary：全局计数 + 每台主机的概要"""
+    hosts = []
+    fleet = {
+        "hosts_total": len(results),
+        "hosts_reachable": 0,
+        "gateways_online": 0,
+        "running_tasks": 0,
+        "tokens_today": 0,
+        "errors": 0
+    }
+    for name, result in results.items():
+        summary = result["data"] or {}
+        gateway = summary.get("gateway") or {}
+        system = summary.get("system") or {}
+        tasks = summary.get("tasks") or {}
+        today = (summary.get("token_usage") or {}).get("today") or {}
+        errors = summary.get("errors") or []
+        if not result["stale"]:
+            fleet["hosts_reachable"] += 1
+        fleet["gateways_online"] += bool(gateway.get("online"))
+        fleet["running_tasks"] += tasks.get("running", 0)
+        fleet["tokens_today"] += today.get("total", 0)
+        fleet["errors"] += len(errors)
+        hosts.append({
+            "host": name,
+            "gateway_online": bool(gateway.get("online")),
+            "version": (summary.get("version") or {}).get("current"),
+            "cpu_percent": (system.get("cpu") or {}).get("percent"),
+            "memory_percent": (system.get("memory") or {}).get("percent"),
+            "running_tasks": tasks.get("running", 0),
+            "tokens_today": today.get("total", 0),
+            "errors": len(errors),
+            "timestamp": summary.get("timestamp"),
+            **_host_status(result)
+        })
+    return {**fleet, "hosts": hosts}
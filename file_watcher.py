@@ -0,0 +1,326 @@
+"""
+OpenClaw Monitor - File Watcher
+目录变更监视器：Linux 上使用 inotify，其它平台或 inotify 不可用时
+退回 os.scandir 轮询；精确记录哪些文件发生了变化，供增量解析器只处理
+脏文件，并在变化后立即通知调度器刷新
+"""
+
+import os
+import sys
+import glob
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+# 变更事件：(目录, 文件名)；文件名为 None 表示整个目录需要全量重扫
+Change = Tuple[str, Optional[str]]
+
+
+class InotifyBackend:
+    """基于 inotify 的事件源（通过 ctypes 调用 libc，无第三方依赖）"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+
+    def add(self, directory: str) -> bool:
+        wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            print(f"无法监视目录 {directory}: {os.strerror(ctypes.get_errno())}")
+            return False
+        self._dirs[wd] = directory
+        return True
+
+    def remove(self, directory: str):
+        for wd, path in list(self._dirs.items()):
+            if path == directory:
+                self._rm_watch(self.fd, wd)
+                del self._dirs[wd]
+
+    def wait(self, timeout: float) -> List[Change]:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changes: List[Change] = []
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, pos)
+            name = data[pos + EVENT_HEADER.size:pos + EVENT_HEADER.size + length]
+            pos += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出：无法知道丢了哪些，所有目录全量重扫
+                changes.extend((directory, None) for directory in self._dirs.values())
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                self._dirs.pop(wd, None)
+                changes.append((directory, None))
+                continue
+            name = name.rstrip(b"\0")
+            if name:
+                changes.append((directory, os.fsdecode(name)))
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingBackend:
+    """轮询事件源：定期 os.scandir 比较 (inode, size, mtime)"""
+
+    def __init__(self, stop_event: threading.Event):
+        self._stop_event = stop_event
+        self._state: Dict[str, Dict[str, tuple]] = {}
+
+    @staticmethod
+    def _scan(directory: str) -> Optional[Dict[str, tuple]]:
+        state = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    state[entry.name] = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+        return state
+
+    def add(self, directory: str) -> bool:
+        state = self._scan(directory)
+        if state is None:
+            return False
+        self._state[directory] = state
+        return True
+
+    def remove(self, directory: str):
+        self._state.pop(directory, None)
+
+    def wait(self, timeout: float) -> List[Change]:
+        self._stop_event.wait(timeout)
+        changes: List[Change] = []
+        for directory, previous in list(self._state.items()):
+            current = self._scan(directory)
+            if current is None:
+                del self._state[directory]
+                changes.append((directory, None))
+                continue
+            for name in previous.keys() | current.keys():
+                if previous.get(name) != current.get(name):
+                    changes.append((directory, name))
+            self._state[directory] = current
+        return changes
+
+    def close(self):
+        self._state.clear()
+
+
+class FileWatcher:
+    """目录变更监视器
+
+    watch() 注册一个目录 glob 模式（如 agents/*/sessions）及其分组名；
+    后台线程定期展开模式，新出现的目录加入监视。收到事件后记录脏文件，
+    短暂合并后以变化的分组集合调用 on_change。
+
+    take_dirty() 取出并清空某目录的脏文件集合；目录未被可靠监视（监视器
+    未运行、刚加入、事件溢出）时返回 None，调用方应全量扫描。
+    """
+
+    # 轮询模式的扫描间隔（秒）
+    POLL_INTERVAL = 1.0
+    # 收到事件后继续合并事件的时间（秒），避免连续写入引发多次刷新；
+    # 持续写入时最迟 MAX_DELAY 秒后通知一次
+    DEBOUNCE = 0.2
+    MAX_DELAY = 0.8
+    # 重新展开目录模式的间隔（秒），用于发现新的 agent 目录
+    RESCAN_INTERVAL = 5.0
+
+    def __init__(self, use_inotify: bool = True):
+        self.use_inotify = use_inotify
+        self.on_change: Optional[Callable[[Set[str]], None]] = None
+        self.backend_name = None
+        self._patterns: List[Tuple[str, str, str]] = []
+        self._groups: Dict[str, Tuple[str, str]] = {}
+        self._dirty: Dict[str, Set[str]] = {}
+        self._full: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._backend = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def watch(self, pattern: str, group: str, suffix: Union[str, Tuple[str, ...]] = ""):
+        """监视匹配 pattern 的目录中以 suffix（或其中任一后缀）结尾的文件"""
+        self._patterns.append((pattern, group, suffix))
+
+    def start(self):
+        """启动监视线程（重复调用无副作用）"""
+        if self.running:
+            return
+        self._backend = self._create_backend()
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="file-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """停止监视线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+        with self._lock:
+            self._groups.clear()
+            self._dirty.clear()
+            self._full.clear()
+
+    def _create_backend(self):
+        if self.use_inotify and sys.platform.startswith("linux"):
+            try:
+                backend = InotifyBackend()
+                self.backend_name = "inotify"
+                return backend
+            except (OSError, AttributeError) as e:
+                print(f"inotify 不可用（{e}），改为轮询")
+        self.backend_name = "polling"
+        return PollingBackend(self._stop_event)
+
+    def take_dirty(self, directory: str) -> Optional[Set[str]]:
+        """取出某目录下变化过的文件路径；需要全量扫描时返回 None"""
+        with self._lock:
+            if (not self.running or directory not in self._groups
+                    or directory in self._full):
+                self._full.discard(directory)
+                self._dirty.pop(directory, None)
+                return None
+            return self._dirty.pop(directory, set())
+
+    def _sync_directories(self) -> Set[str]:
+        """展开目录模式，加入新目录、移除已消失的目录，返回新增目录所属分组"""
+        wanted: Dict[str, Tuple[str, str]] = {}
+        for pattern, group, suffix in self._patterns:
+            for directory in glob.glob(pattern):
+                if os.path.isdir(directory):
+                    wanted.setdefault(directory, (group, suffix))
+
+        changed_groups = set()
+        with self._lock:
+            for directory in list(self._groups):
+                if directory not in wanted:
+                    self._backend.remove(directory)
+                    del self._groups[directory]
+                    self._dirty.pop(directory, None)
+            for directory, (group, suffix) in wanted.items():
+                if directory in self._groups:
+                    continue
+                if self._backend.add(directory):
+                    self._groups[directory] = (group, suffix)
+                    self._full.add(directory)
+                    changed_groups.add(group)
+        return changed_groups
+
+    def _record(self, changes: Iterable[Change]) -> Set[str]:
+        """记录脏文件，返回受影响的分组"""
+        groups = set()
+        with self._lock:
+            for directory, name in changes:
+                watched = self._groups.get(directory)
+                if watched is None:
+                    continue
+                group, suffix = watched
+                if name is None:
+                    self._full.add(directory)
+                    if not os.path.isdir(directory):
+                        del self._groups[directory]
+                elif name.endswith(suffix):
+                    self._dirty.setdefault(directory, set()).add(
+                        os.path.join(directory, name)
+                    )
+                else:
+                    continue
+                groups.add(group)
+        return groups
+
+    def _run(self):
+        next_sync = 0.0
+        pending: Set[str] = set()
+        pending_since = 0.0
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            if now >= next_sync:
+                new_groups = self._sync_directories()
+                next_sync = now + self.RESCAN_INTERVAL
+            else:
+                new_groups = set()
+
+            try:
+                timeout = self.DEBOUNCE if pending else self.POLL_INTERVAL
+                new_groups |= self._record(self._backend.wait(timeout))
+            except Exception as e:
+                print(f"文件监视失败: {e}")
+                self._stop_event.wait(self.POLL_INTERVAL)
+                continue
+
+            if new_groups:
+                if not pending:
+                    pending_since = time.monotonic()
+                pending |= new_groups
+                # 连续写入时继续合并，但最多延迟 MAX_DELAY
+                if time.monotonic() - pending_since < self.MAX_DELAY:
+                    continue
+            if pending:
+                groups, pending = pending, set()
+                if self.on_change is not None:
+                    try:
+                        self.on_change(groups)
+                    except Exception as e:
+                        print(f"文件变更回调失败: {e}")
@@ -0,0 +1,101 @@
+"""
+OpenClaw Monitor - Line Index
+会话文件的行偏移索引：记录每一行的起始字节偏移，通过 mmap 随机读取
+任意一段行；文件追加内容后只扫描新增部分，截断或轮转时重建
+"""
+
+import os
+import mmap
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Tuple
+
+
+class LineIndex:
+    """单个文件的行偏移索引
+
+    starts 保存每个完整行（以换行结尾）的起始偏移，end 为最后一个完整行
+    之后的偏移；末尾写了一半的行要等写完后才计入。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.inode = None
+        self.starts = array("Q")
+        self.end = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _update(self, f) -> int:
+        """扫描 end 之后新增的内容，返回当前文件大小"""
+        st = os.fstat(f.fileno())
+        if st.st_ino != self.inode or st.st_size < self.end:
+            # 新文件、轮转或截断：重建
+            self.inode = st.st_ino
+            self.starts = array("Q")
+            self.end = 0
+        if st.st_size == self.end:
+            return st.st_size
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = self.end
+            find = mm.find
+            starts = self.starts
+            while True:
+                newline = find(b"\n", pos)
+                if newline < 0:
+                    break
+                starts.append(pos)
+                pos = newline + 1
+            self.end = pos
+        return st.st_size
+
+    def update(self) -> int:
+        """把索引扩展到文件当前末尾，返回完整行数"""
+        with self._lock, open(self.path, "rb") as f:
+            self._update(f)
+            return len(self.starts)
+
+    def read(self, start: int, count: int) -> Tuple[int, List[bytes]]:
+        """更新索引后读取第 start 行起的最多 count 行（不含换行），返回 (总行数, 行列表)"""
+        with self._lock, open(self.path, "rb") as f:
+            self._update(f)
+            total = len(self.starts)
+            stop = min(total, start + count)
+            if start >= stop:
+                return total, []
+            starts = self.starts
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                lines = []
+                for i in range(start, stop):
+                    end = starts[i + 1] if i + 1 < total else self.end
+                    lines.append(mm[starts[i]:end - 1])
+            return total, lines
+
+
+class LineIndexCache:
+    """按路径缓存 LineIndex（LRU），索引随文件增长增量扩展"""
+
+    MAX_FILES = 64
+
+    def __init__(self, max_files: int = MAX_FILES):
+        self.max_files = max_files
+        self._indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> LineIndex:
+        with self._lock:
+            index = self._indexes.get(path)
+            if index is None:
+                index = self._indexes[path] = LineIndex(path)
+                while len(self._indexes) > self.max_files:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(path)
+            return index
+
+    def discard(self, path: str):
+        with self._lock:
+            self._indexes.pop(path, None)
@@ -0,0 +1,210 @@
+"""
+OpenClaw Monitor - Log Scanner
+增量错误日志扫描器：记录每个日志文件的字节偏移，只处理新追加的内容，
+所有错误关键字合并成一个预编译正则单次匹配，并在内存中维护累计计数
+"""
+
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from metrics import timed
+from archives import archive_supported, has_uncompressed_copy, is_archive, open_archive
+
+
+ERROR_PATTERNS = (
+    "error", "fail", "timeout", "refused", "blocked",
+    "invalid", "expired", "unauthorized", "exception"
+)
+
+# 单个正则交替匹配全部关键字（忽略大小写，直接作用于 bytes）
+ERROR_RE = re.compile(
+    b"|".join(re.escape(p.encode()) for p in ERROR_PATTERNS), re.IGNORECASE
+)
+
+
+class LogScanner:
+    """错误日志增量扫描器
+
+    每个文件保存 inode、已处理偏移以及该文件的错误计数；文件被截断或
+    轮转时从头重新计数，被删除的文件从内存中移除。
+
+    压缩归档（如轮转后的 *.log.1.gz）整体解析一次；传入 archive_cache 时
+    计数按内容哈希永久缓存，重启后也不必重新解压。
+    """
+
+    # 每个文件最多保留的不同错误条目数，超出后只保留出现次数最多的一半
+    MAX_KEYS_PER_FILE = 5000
+
+    def __init__(self, archive_cache=None):
+        self.archive_cache = archive_cache
+        self.files: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_state(st: os.stat_result) -> dict:
+        return {
+            "inode": st.st_ino,
+            "offset": 0,
+            "size": 0,
+            "mtime": st.st_mtime,
+            "errors": {},
+            "patterns": {}
+        }
+
+    @timed("log_scanner.refresh")
+    def refresh(self, log_files: Iterable[str], complete: bool = True):
+        """增量处理给定日志文件的新内容
+
+        complete 为 True 时 log_files 是全部日志文件，不在其中的文件被移除；
+        为 False 时只是变化过的文件（来自文件监视器），其余文件保持不变。
+        """
+        with self._lock:
+            seen = set()
+            archived = False
+            for log_file in log_files:
+                archive = is_archive(log_file)
+                if archive and (not archive_supported(log_file)
+                                or has_uncompressed_copy(log_file)):
+                    continue
+                try:
+                    st = os.stat(log_file)
+                except OSError:
+                    self.files.pop(log_file, None)
+                    continue
+                seen.add(log_file)
+
+                state = self.files.get(log_file)
+                if archive:
+                    if state is None or state["inode"] != st.st_ino \
+                            or state["size"] != st.st_size or state["mtime"] != st.st_mtime:
+                        archived |= self._load_archive(log_file, st)
+                    continue
+                if (state is None
+                        or state["inode"] != st.st_ino
+                        or st.st_size < state["offset"]):
+                    # 新文件、轮转或截断：从头开始
+                    state = self._new_state(st)
+                    self.files[log_file] = state
+
+                if st.st_size != state["size"] or st.st_mtime != state["mtime"]:
+                    try:
+                        self._scan_file(log_file, state, st.st_mtime)
+                    except OSError:
+                        continue
+                    state["size"] = st.st_size
+                    state["mtime"] = st.st_mtime
+
+            if complete:
+                for path in list(self.files):
+                    if path not in seen:
+                        del self.files[path]
+        if archived and self.archive_cache is not None:
+            self.archive_cache.save()
+
+    def _load_archive(self, path: str, st: os.stat_result) -> bool:
+        """解析（或从缓存恢复）一个归档的错误计数，返回是否写入了新的缓存"""
+        digest = None
+        if self.archive_cache is not None:
+            try:
+                digest = self.archive_cache.digest(path, st)
+            except OSError:
+                return False
+            cached = self.archive_cache.get("log", digest)
+            if cached is not None:
+                self.files[path] = {**self._new_state(st), **cached,
+                                    "size": st.st_size, "mtime": st.st_mtime}
+                return False
+
+        state = self._new_state(st)
+        try:
+            self._scan_file(path, state, st.st_mtime, archive=True)
+        except (OSError, EOFError) as e:
+            print(f"解析日志归档失败 {path}: {e}")
+            return False
+        state["size"] = st.st_size
+        self.files[path] = state
+        if digest is None:
+            return False
+        self.archive_cache.put("log", digest, {
+            "offset": state["offset"],
+            "errors": state["errors"],
+            "patterns": state["patterns"]
+        })
+        return True
+
+    def _scan_file(self, path: str, state: dict, mtime: float, archive: bool = False):
+        """从偏移处读取新追加的完整行并累加错误计数（归档从头流式解压）"""
+        errors = state["errors"]
+        patterns = state["patterns"]
+        seen_at = datetime.fromtimestamp(mtime).isoformat()
+        offset = state["offset"]
+
+        with (open_archive(path) if archive else open(path, 'rb')) as f:
+            if offset:
+                f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n") and not archive:
+                    # 末尾写了一半的行：等下次写完再处理
+                    break
+                offset += len(line)
+
+                match = ERROR_RE.search(line)
+                if match is None:
+                    continue
+
+                pattern = match.group().lower().decode()
+                patterns[pattern] = patterns.get(pattern, 0) + 1
+
+                # 提取错误信息
+                text = line.decode('utf-8', errors='ignore').strip()
+                error_key = text[:100]
+                entry = errors.get(error_key)
+                if entry is not None:
+                    entry["count"] += 1
+                    entry["time"] = seen_at
+                else:
+                    errors[error_key] = {
+                        "message": text[:200],
+                        "count": 1,
+                        "time": seen_at,
+                        "level": "error" if "error" in text.lower() else "warning"
+                    }
+
+        state["offset"] = offset
+        if len(errors) > self.MAX_KEYS_PER_FILE:
+            keep = sorted(errors.items(), key=lambda kv: kv[1]["count"], reverse=True)
+            state["errors"] = dict(keep[:self.MAX_KEYS_PER_FILE // 2])
+
+    def _recent_files(self, days: int) -> List[dict]:
+        now = datetime.now()
+        return [
+            state for state in self.files.values()
+            if (now - datetime.fromtimestamp(state["mtime"])).days <= days
+        ]
+
+    def top_errors(self, days: int = 7, limit: int = 10) -> List[dict]:
+        """最近 days 天内有更新的文件中出现次数最多的错误"""
+        with self._lock:
+            merged: Dict[str, dict] = {}
+            for state in self._recent_files(days):
+                for key, entry in state["errors"].items():
+                    current = merged.get(key)
+                    if current is None:
+                        merged[key] = dict(entry)
+                    else:
+                        current["count"] += entry["count"]
+                        current["time"] = max(current["time"], entry["time"])
+
+        return sorted(merged.values(), key=lambda x: x["count"], reverse=True)[:limit]
+
+    def pattern_counts(self, days: int = 7) -> Dict[str, int]:
+        """按关键字统计的错误行数"""
+        counts = {pattern: 0 for pattern in ERROR_PATTERNS}
+        with self._lock:
+            for state in self._recent_files(days):
+                for pattern, count in state["patterns"].items():
+                    counts[pattern] = counts.get(pattern, 0) + count
+        return counts
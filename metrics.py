@@ -0,0 +1,307 @@
+"""
+OpenClaw Monitor - Prometheus Metrics
+进程内指标与 Prometheus 文本格式（exposition format 0.0.4）输出：
+所有指标都来自已在内存中维护的状态，抓取时不会触发任何文件扫描；
+另含收集器方法的耗时埋点（滚动窗口统计 + 单请求内的调用记录）
+"""
+
+import time
+import bisect
+import threading
+from collections import deque
+from functools import wraps
+from typing import Deque, Dict, List, Mapping, Optional, Sequence, Tuple
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 收集器耗时直方图的桶上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """线程安全的累计直方图（固定桶）"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[Tuple[str, int]], float, int]:
+        """返回 ([(le, 累计次数)...], 总和, 总次数)，le 包含 +Inf"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            cumulative.append((format_value(bound), running))
+        return cumulative, total, running
+
+
+class TimingRegistry:
+    """各操作耗时统计：累计直方图 + 最近 WINDOW 次的滚动窗口（用于 p50 / p99）"""
+
+    WINDOW = 256
+
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self.histograms: Dict[str, Histogram] = {}
+        self._recent: Dict[str, Deque[float]] = {}
+        self._last: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+                self._recent[name] = deque(maxlen=self.window)
+            self._recent[name].append(seconds)
+            self._last[name] = time.time()
+        histogram.observe(seconds)
+
+    def histogram_map(self) -> Dict[str, Histogram]:
+        """各操作直方图的副本（可在其它线程继续记录时安全遍历）"""
+        with self._lock:
+            return dict(self.histograms)
+
+    def summary(self) -> Dict[str, dict]:
+        """{操作名: {count, mean_ms, p50_ms, p99_ms, max_ms, last_ms, last_at}}"""
+        with self._lock:
+            recent = {name: list(samples) for name, samples in self._recent.items()}
+            last_at = dict(self._last)
+        result = {}
+        for name, samples in sorted(recent.items()):
+            _, total, count = self.histograms[name].snapshot()
+            ordered = sorted(samples)
+            result[name] = {
+                "count": count,
+                "mean_ms": round(total / count * 1000, 3) if count else 0,
+                "p50_ms": round(ordered[(len(ordered) - 1) // 2] * 1000, 3),
+                "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+                "last_ms": round(samples[-1] * 1000, 3),
+                "last_at": last_at[name]
+            }
+        return result
+
+
+# 全局耗时统计；当前线程正在处理请求时，同时记录到该请求的调用列表
+TIMINGS = TimingRegistry()
+_request_local = threading.local()
+
+
+def begin_request_timings():
+    """开始记录当前线程（一个请求）内的埋点调用"""
+    _request_local.entries = []
+
+
+def end_request_timings() -> List[Tuple[str, float]]:
+    """结束记录，返回本请求内的 [(操作名, 秒)]"""
+    entries = getattr(_request_local, "entries", None) or []
+    _request_local.entries = None
+    return entries
+
+
+def timed(name: str):
+    """耗时埋点装饰器：记录到 TIMINGS，处理请求时也记入该请求"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                TIMINGS.record(name, elapsed)
+                entries = getattr(_request_local, "entries", None)
+                if entries is not None:
+                    entries.append((name, elapsed))
+        return wrapper
+    return decorator
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape_label(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsWriter:
+    """按指标族输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def family(self, name: str, metric_type: str, help_text: str):
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {metric_type}")
+
+    def sample(self, name: str, value: float, labels: Optional[Mapping[str, object]] = None):
+        if labels:
+            label_text = ",".join(
+                f'{key}="{escape_label(val)}"' for key, val in labels.items()
+            )
+            name = f"{name}{{{label_text}}}"
+        self._lines.append(f"{name} {format_value(value)}")
+
+    def histogram(self, name: str, histogram: Histogram, labels: Mapping[str, object]):
+        buckets, total, count = histogram.snapshot()
+        for le, cumulative in buckets:
+            self.sample(f"{name}_bucket", cumulative, {**labels, "le": le})
+        self.sample(f"{name}_sum", total, labels)
+        self.sample(f"{name}_count", count, labels)
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+def _write_collectors(writer: MetricsWriter, snapshot: Mapping[str, Mapping],
+                      durations: Mapping[str, Histogram], failures: Mapping[str, int]):
+    writer.family("openclaw_monitor_collector_duration_seconds", "histogram",
+                  "Time spent running each background collector")
+    for name, histogram in sorted(durations.items()):
+        writer.histogram("openclaw_monitor_collector_duration_seconds",
+                         histogram, {"collector": name})
+
+    writer.family("openclaw_monitor_collector_failures_total", "counter",
+                  "Collector runs that raised an error")
+    for name in sorted(durations):
+        writer.sample("openclaw_monitor_collector_failures_total",
+                      failures.get(name, 0), {"collector": name})
+
+    writer.family("openclaw_monitor_collector_last_run_timestamp_seconds", "gauge",
+                  "Unix time of the last collector run")
+    for name, entry in sorted(snapshot.items()):
+        writer.sample("openclaw_monitor_collector_last_run_timestamp_seconds",
+                      entry["updated_at"], {"collector": name})
+
+
+def _write_gateway(writer: MetricsWriter, gateway: Optional[Mapping]):
+    if not gateway:
+        return
+    writer.family("openclaw_gateway_up", "gauge", "Whether the OpenClaw gateway is listening")
+    writer.sample("openclaw_gateway_up", bool(gateway.get("online")))
+    start_time = gateway.get("start_time")
+    writer.family("openclaw_gateway_uptime_seconds", "gauge", "Gateway process uptime")
+    writer.sample("openclaw_gateway_uptime_seconds", time.time() - start_time if start_time else 0)
+
+
+def _write_version(writer: MetricsWriter, version: Optional[Mapping]):
+    if not version:
+        return
+    writer.family("openclaw_version_info", "gauge", "Installed and latest OpenClaw versions")
+    writer.sample("openclaw_version_info", 1, {
+        "current": version.get("current", "unknown"),
+        "latest": version.get("latest", "unknown")
+    })
+    writer.family("openclaw_update_available", "gauge", "Whether a newer OpenClaw release exists")
+    writer.sample("openclaw_update_available", bool(version.get("update_available")))
+
+
+def _write_tasks(writer: MetricsWriter, tasks: Optional[Mapping]):
+    if not tasks:
+        return
+    writer.family("openclaw_tasks_running", "gauge", "Sessions active within the last hour")
+    writer.sample("openclaw_tasks_running", tasks.get("running", 0))
+    writer.family("openclaw_tasks_completed_24h", "gauge",
+                  "Sessions last active between 1 and 24 hours ago")
+    writer.sample("openclaw_tasks_completed_24h", tasks.get("completed_24h", 0))
+
+
+def _write_tokens(writer: MetricsWriter, usage: Optional[Mapping]):
+    if not usage:
+        return
+    writer.family("openclaw_tokens_total", "counter", "Tokens used per model and day")
+    for day in usage.get("daily", []):
+        for model, tokens in sorted(day.get("models", {}).items()):
+            for kind in ("input", "output"):
+                writer.sample("openclaw_tokens_total", tokens.get(kind, 0), {
+                    "model": model, "day": day["date"], "type": kind
+                })
+    writer.family("openclaw_sessions", "gauge", "Sessions with token usage in the window")
+    writer.sample("openclaw_sessions", usage.get("total_sessions", 0))
+
+
+def _write_errors(writer: MetricsWriter, pattern_counts: Optional[Mapping[str, int]]):
+    if pattern_counts is None:
+        return
+    # 最近 7 天的滚动值，会随旧日志滑出窗口而减小，因此是 gauge 而不是 counter
+    writer.family("openclaw_log_errors_7d", "gauge",
+                  "Error log lines per matched keyword over the last 7 days")
+    for pattern, count in sorted(pattern_counts.items()):
+        writer.sample("openclaw_log_errors_7d", count, {"pattern": pattern})
+
+
+# (指标名, 采样字段, 说明)
+SYSTEM_GAUGES = (
+    ("openclaw_system_cpu_percent", "cpu_percent", "Host CPU utilisation"),
+    ("openclaw_system_memory_percent", "memory_percent", "Host memory utilisation"),
+    ("openclaw_system_memory_total_bytes", "memory_total", "Host memory size"),
+    ("openclaw_system_memory_available_bytes", "memory_available", "Host memory available"),
+    ("openclaw_system_disk_percent", "disk_percent", "Disk utilisation"),
+    ("openclaw_system_disk_total_bytes", "disk_total", "Disk size"),
+    ("openclaw_system_disk_free_bytes", "disk_free", "Disk free space"),
+)
+
+
+def _write_system(writer: MetricsWriter, sample: Optional[Mapping]):
+    if not sample:
+        return
+    for name, field, help_text in SYSTEM_GAUGES:
+        writer.family(name, "gauge", help_text)
+        writer.sample(name, sample[field])
+
+    writer.family("openclaw_system_load", "gauge", "Load average")
+    for period in ("1", "5", "15"):
+        writer.sample("openclaw_system_load", sample[f"load_{period}"], {"period": period + "m"})
+
+    writer.family("openclaw_system_cpu_core_percent", "gauge", "Per-core CPU utilisation")
+    for core, percent in enumerate(sample.get("per_cpu", [])):
+        writer.sample("openclaw_system_cpu_core_percent", percent, {"core": core})
+
+
+def render_metrics(snapshot: Mapping[str, Mapping],
+                   durations: Mapping[str, Histogram],
+                   failures: Mapping[str, int],
+                   system_sample: Optional[Mapping] = None,
+                   error_patterns: Optional[Mapping[str, int]] = None,
+                   operations: Optional[Mapping[str, Histogram]] = None) -> str:
+    """由调度器快照和内存状态生成 /metrics 响应体"""
+    writer = MetricsWriter()
+
+    def data(name):
+        entry = snapshot.get(name)
+        return entry["data"] if entry else None
+
+    _write_collectors(writer, snapshot, durations, failures)
+    if operations:
+        writer.family("openclaw_monitor_operation_duration_seconds", "histogram",
+                      "Time spent in instrumented collector methods")
+        for name, histogram in sorted(operations.items()):
+            writer.histogram("openclaw_monitor_operation_duration_seconds",
+                             histogram, {"operation": name})
+    _write_gateway(writer, data("gateway"))
+    _write_version(writer, data("version"))
+    _write_tasks(writer, data("tasks"))
+    _write_tokens(writer, data("token_usage"))
+    _write_errors(writer, error_patterns)
+    _write_system(writer, system_sample)
+    return writer.render()
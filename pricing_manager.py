@@ -5,10 +5,45 @@ OpenClaw Monitor - Token Pricing Manager
 
 import json
 import os
+import re
+import atexit
+import threading
 from datetime import datetime
-from typing import Dict, Optional, List
+from functools import wraps
+from typing import Dict, Optional, List, Tuple
 import requests
 
+# Bedrock 风格的 provider 前缀（"anthropic.claude-..."、"us.anthropic.claude-..."），
+# 只匹配纯字母段，避免误伤 "kimi-k2.5"、"gpt-4.1" 这类带版本号的模型名
+_DOTTED_PROVIDER_PREFIX = re.compile(r"^(?:[a-z]+\.)+")
+
+
+def _synchronized(method):
+    """装饰器：在配置锁内执行，避免并发请求交错修改配置"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class _TrieNode:
+    """模型别名前缀树节点"""
+    
+    __slots__ = ("children", "key", "best_alias", "best_key")
+    
+    def __init__(self):
+        self.children = {}
+        self.key = None
+        self.best_alias = None
+        self.best_key = None
+    
+    def offer(self, alias: str, key: str):
+        """记录子树中最短（同长按字典序）的别名"""
+        if self.best_alias is None or (len(alias), alias) < (len(self.best_alias), self.best_alias):
+            self.best_alias = alias
+            self.best_key = key
+
 
 class PricingManager:
     """Token 定价管理器"""
@@ -80,15 +115,28 @@ class PricingManager:
         }
     }
     
+    # 模型名解析结果缓存的最大条目数
+    RESOLVE_CACHE_SIZE = 4096
+    
+    # 写入延迟（秒）：这段时间内的多次修改合并为一次写盘
+    SAVE_DELAY = 0.5
+    
     def __init__(self):
         os.makedirs(self.CONFIG_DIR, exist_ok=True)
+        self.config_file = self.CONFIG_FILE
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._save_timer = None
         self.config = self._load_config()
+        self._build_index()
+        # 进程退出前写入尚未落盘的修改
+        atexit.register(self.flush)
     
     def _load_config(self) -> dict:
         """加载定价配置"""
-        if os.path.exists(self.CONFIG_FILE):
+        if os.path.exists(self.config_file):
             try:
-                with open(self.CONFIG_FILE, 'r', encoding='utf-8') as f:
+                with open(self.config_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception as e:
                 print(f"加载定价配置失败: {e}，使用默认配置")
@@ -107,33 +155,173 @@ class PricingManager:
             "models": self.DEFAULT_PRICING.copy(),
             "history": []
         }
-        self._save_config(config)
+        self._write_config(json.dumps(config, indent=2, ensure_ascii=False))
         return config
     
-    def _save_config(self, config: dict):
-        """保存配置到文件"""
+    def _write_config(self, data: str):
+        """原子写入配置文件：先写临时文件再 rename，崩溃时不会留下半个文件"""
+        tmp_file = f"{self.config_file}.tmp"
         try:
-            with open(self.CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.config_file)
         except Exception as e:
             print(f"保存定价配置失败: {e}")
     
+    def _save_config(self, config: dict):
+        """标记配置待保存（write-behind）：SAVE_DELAY 内的多次修改只写一次"""
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+    
+    def flush(self):
+        """立即写入尚未落盘的修改"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._write_config(json.dumps(self.config, indent=2, ensure_ascii=False))
+    
+    def close(self):
+        """写入未保存的修改并取消退出钩子"""
+        self.flush()
+        atexit.unregister(self.flush)
+    
+    @staticmethod
+    def _normalize_model_name(model_name: str) -> str:
+        """规范化模型名：小写并去掉 provider 前缀
+
+        支持 "moonshot/kimi-k2.5" → "kimi-k2.5" 和
+        "anthropic.claude-3-haiku-20240307-v1:0" → "claude-3-haiku-20240307-v1:0"；
+        非字符串（如记录里的 "modelId": null）规范化为空串。
+        """
+        if not isinstance(model_name, str):
+            return ""
+        name = model_name.strip().lower().rsplit("/", 1)[-1]
+        return _DOTTED_PROVIDER_PREFIX.sub("", name)
+    
+    def _build_index(self):
+        """重建模型名解析索引（每次定价变更后调用）
+
+        - 精确匹配：配置中的原始模型名
+        - 别名：规范化后的模型名，冲突时取原始名最短者（同长按字典序）
+        - 前缀树：用于最长前缀匹配（"gpt-4o-mini-2024-07-18" → "gpt-4o-mini"），
+          以及查询名是某个别名前缀时的确定性补全
+        """
+        models = self.config.get("models", {})
+        aliases = {}
+        for key in sorted(models, key=lambda k: (len(k), k)):
+            if key == "default":
+                continue
+            aliases.setdefault(self._normalize_model_name(key), key)
+        
+        trie = _TrieNode()
+        for alias, key in aliases.items():
+            node = trie
+            for ch in alias:
+                node = node.children.setdefault(ch, _TrieNode())
+                node.offer(alias, key)
+            node.key = key
+        
+        self._aliases = aliases
+        self._trie = trie
+        self._resolve_cache = {}
+    
+    def _resolve_model_key(self, model_name: str) -> Optional[str]:
+        """把任意模型名解析为配置中的模型名，找不到返回 None"""
+        alias = self._normalize_model_name(model_name)
+        if not alias:
+            return None
+        if alias in self._aliases:
+            return self._aliases[alias]
+        
+        node = self._trie
+        longest_prefix = None
+        for ch in alias:
+            node = node.children.get(ch)
+            if node is None:
+                break
+            if node.key is not None:
+                longest_prefix = node.key
+        else:
+            # 查询名是某些别名的前缀：取子树中最短的别名
+            if longest_prefix is None:
+                return node.best_key
+        return longest_prefix
+    
     def get_model_pricing(self, model_name: str) -> dict:
         """获取模型定价"""
         models = self.config.get("models", {})
         
+        # 缺失或非字符串的模型名直接用默认定价
+        if not isinstance(model_name, str):
+            return models.get("default", self.DEFAULT_PRICING["default"])
+        
         # 精确匹配
         if model_name in models:
             return models[model_name]
         
-        # 模糊匹配（如 "moonshot/kimi-k2.5" 匹配 "kimi-k2.5"）
-        for key, value in models.items():
-            if model_name in key or key in model_name:
-                return value
+        # 索引匹配（结果缓存，定价变更时清空）
+        cache = self._resolve_cache
+        if model_name in cache:
+            key = cache[model_name]
+        else:
+            key = self._resolve_model_key(model_name)
+            if len(cache) >= self.RESOLVE_CACHE_SIZE:
+                cache.clear()
+            cache[model_name] = key
+        if key is not None and key in models:
+            return models[key]
         
         # 返回默认
         return models.get("default", self.DEFAULT_PRICING["default"])
     
+    def _apply_model_pricing(self, model_name: str, input_price: float,
+                             output_price: float, currency: str = None,
+                             provider: str = "", reason: str = ""):
+        """写入一个模型的定价并记录历史（不重建索引、不保存，由调用方统一处理）"""
+        old_pricing = self.get_model_pricing(model_name)
+        
+        if model_name not in self.config["models"]:
+            self.config["models"][model_name] = {}
+        
+        # 记录旧值
+        old_input = old_pricing.get("input_per_1k", 0)
+        old_output = old_pricing.get("output_per_1k", 0)
+        
+        # 更新配置
+        self.config["models"][model_name].update({
+            "input_per_1k": float(input_price),
+            "output_per_1k": float(output_price),
+            "currency": currency or old_pricing.get("currency", "USD"),
+            "provider": provider or old_pricing.get("provider", "Unknown"),
+            "last_updated": datetime.now().isoformat()
+        })
+        
+        # 记录历史
+        if old_input != input_price or old_output != output_price:
+            self.config["history"].append({
+                "date": datetime.now().isoformat(),
+                "model": model_name,
+                "old_input": old_input,
+                "new_input": float(input_price),
+                "old_output": old_output,
+                "new_output": float(output_price),
+                "currency": currency or old_pricing.get("currency", "USD"),
+                "reason": reason or "手动修改"
+            })
+            # 只保留最近 50 条历史
+            self.config["history"] = self.config["history"][-50:]
+    
+    @_synchronized
     def update_model_pricing(self, model_name: str, 
                             input_price: float, 
                             output_price: float,
@@ -142,49 +330,21 @@ class PricingManager:
                             reason: str = "") -> bool:
         """更新模型定价"""
         try:
-            old_pricing = self.get_model_pricing(model_name)
-            
-            if model_name not in self.config["models"]:
-                self.config["models"][model_name] = {}
-            
-            # 记录旧值
-            old_input = old_pricing.get("input_per_1k", 0)
-            old_output = old_pricing.get("output_per_1k", 0)
-            
-            # 更新配置
-            self.config["models"][model_name].update({
-                "input_per_1k": float(input_price),
-                "output_per_1k": float(output_price),
-                "currency": currency or old_pricing.get("currency", "USD"),
-                "provider": provider or old_pricing.get("provider", "Unknown"),
-                "last_updated": datetime.now().isoformat()
-            })
-            
-            # 记录历史
-            if old_input != input_price or old_output != output_price:
-                self.config["history"].append({
-                    "date": datetime.now().isoformat(),
-                    "model": model_name,
-                    "old_input": old_input,
-                    "new_input": float(input_price),
-                    "old_output": old_output,
-                    "new_output": float(output_price),
-                    "currency": currency or old_pricing.get("currency", "USD"),
-                    "reason": reason or "手动修改"
-                })
-                # 只保留最近 50 条历史
-                self.config["history"] = self.config["history"][-50:]
-            
+            self._apply_model_pricing(model_name, input_price, output_price,
+                                      currency, provider, reason)
+            self._build_index()
             self._save_config(self.config)
             return True
         except Exception as e:
             print(f"更新定价失败: {e}")
             return False
     
+    @_synchronized
     def delete_model_pricing(self, model_name: str) -> bool:
         """删除模型定价"""
         if model_name in self.config["models"] and model_name != "default":
             del self.config["models"][model_name]
+            self._build_index()
             self._save_config(self.config)
             return True
         return False
@@ -192,38 +352,43 @@ class PricingManager:
     def calculate_cost(self, model: str, input_tokens: int, 
                       output_tokens: int) -> dict:
         """计算 Token 成本"""
-        pricing = self.get_model_pricing(model)
-        
-        input_cost_orig = (input_tokens / 1000) * pricing["input_per_1k"]
-        output_cost_orig = (output_tokens / 1000) * pricing["output_per_1k"]
-        total_orig = input_cost_orig + output_cost_orig
-        
-        model_currency = pricing["currency"]
+        return self.calculate_costs([(model, input_tokens, output_tokens)])[0]
+    
+    def calculate_costs(self, items: List[Tuple[str, int, int]]) -> List[dict]:
+        """批量计算成本：items 为 (模型, 输入 tokens, 输出 tokens)
+
+        每个不同的模型只解析一次定价，显示货币和汇率也只读取一次。
+        """
         display_currency = self.config.get("currency", "CNY")
+        resolved = {}
+        results = []
         
-        # 货币转换
-        if model_currency != display_currency:
-            rate = self._get_exchange_rate(model_currency, display_currency)
-            input_cost = input_cost_orig * rate
-            output_cost = output_cost_orig * rate
-            total = total_orig * rate
-        else:
-            input_cost = input_cost_orig
-            output_cost = output_cost_orig
-            total = total_orig
-            rate = 1.0
+        for model, input_tokens, output_tokens in items:
+            if model not in resolved:
+                pricing = self.get_model_pricing(model)
+                resolved[model] = (
+                    pricing,
+                    self._get_exchange_rate(pricing["currency"], display_currency)
+                )
+            pricing, rate = resolved[model]
+            
+            input_cost_orig = (input_tokens / 1000) * pricing["input_per_1k"]
+            output_cost_orig = (output_tokens / 1000) * pricing["output_per_1k"]
+            total_orig = input_cost_orig + output_cost_orig
+            
+            results.append({
+                "input_cost": round(input_cost_orig * rate, 6),
+                "output_cost": round(output_cost_orig * rate, 6),
+                "total_cost": round(total_orig * rate, 6),
+                "currency": display_currency,
+                "model": model,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "original_currency": pricing["currency"],
+                "exchange_rate": rate
+            })
         
-        return {
-            "input_cost": round(input_cost, 6),
-            "output_cost": round(output_cost, 6),
-            "total_cost": round(total, 6),
-            "currency": display_currency,
-            "model": model,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "original_currency": model_currency,
-            "exchange_rate": rate
-        }
+        return results
     
     def _get_exchange_rate(self, from_currency: str, to_currency: str) -> float:
         """获取汇率"""
@@ -239,6 +404,7 @@ class PricingManager:
         
         return 1.0
     
+    @_synchronized
     def set_display_currency(self, currency: str) -> bool:
         """设置显示货币"""
         if currency in ["CNY", "USD"]:
@@ -268,10 +434,11 @@ class PricingManager:
                     result["source"] = "default"
             
             if rate and rate > 0:
-                self.config["exchange_rate"]["USD_TO_CNY"] = float(rate)
-                self.config["exchange_rate"]["CNY_TO_USD"] = round(1 / float(rate), 6)
-                self.config["exchange_rate"]["last_updated"] = datetime.now().isoformat()
-                self._save_config(self.config)
+                with self._lock:
+                    self.config["exchange_rate"]["USD_TO_CNY"] = float(rate)
+                    self.config["exchange_rate"]["CNY_TO_USD"] = round(1 / float(rate), 6)
+                    self.config["exchange_rate"]["last_updated"] = datetime.now().isoformat()
+                    self._save_config(self.config)
                 result["success"] = True
                 result["rate"] = float(rate)
         except Exception as e:
@@ -279,6 +446,34 @@ class PricingManager:
         
         return result
     
+    @_synchronized
+    def import_pricing(self, models: Dict[str, dict], reason: str = "") -> int:
+        """批量导入模型定价，返回成功导入的数量
+
+        整批写入后只重建一次解析索引、只安排一次保存。
+        """
+        imported = 0
+        for model_name, pricing in models.items():
+            try:
+                input_price = float(pricing["input_per_1k"])
+                output_price = float(pricing["output_per_1k"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            try:
+                self._apply_model_pricing(
+                    model_name, input_price, output_price,
+                    pricing.get("currency"), pricing.get("provider", ""),
+                    reason or "批量导入"
+                )
+            except Exception as e:
+                print(f"导入定价失败 {model_name}: {e}")
+                continue
+            imported += 1
+        if imported:
+            self._build_index()
+            self._save_config(self.config)
+        return imported
+    
     def get_all_pricing(self) -> dict:
         """获取所有定价信息"""
         return {
@@ -288,6 +483,7 @@ class PricingManager:
             "history": self.config.get("history", [])[-20:]  # 最近 20 条
         }
     
+    @_synchronized
     def reset_to_default(self) -> bool:
         """重置为默认定价"""
         try:
@@ -298,6 +494,7 @@ class PricingManager:
                 "action": "reset_to_default",
                 "reason": "用户重置"
             })
+            self._build_index()
             self._save_config(self.config)
             return True
         except Exception as e:
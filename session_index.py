@@ -0,0 +1,519 @@
+"""
+OpenClaw Monitor - Session Index
+会话 JSONL 文件的增量游标索引：记录每个文件已解析到的字节偏移，
+每次刷新只解析新追加的内容；首次启动需要全量解析大量文件时，
+按进程池分片并行回填
+"""
+
+import os
+import json
+import glob
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics import timed
+from archives import (
+    ARCHIVE_SUFFIXES, archive_supported, has_uncompressed_copy, is_archive,
+    open_archive, strip_archive_suffix
+)
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，未安装时使用标准库 json
+    orjson = None
+
+
+# 只有包含这些标记的行才可能是用量记录或模型切换记录，其余行（多为
+# 体积很大的工具输出）不需要解码
+USAGE_MARKER = b'"usage"'
+MODEL_CHANGE_MARKER = b'model_change'
+
+# 会话文件及其压缩归档（*.jsonl.gz / *.jsonl.zst）
+SESSION_SUFFIXES = (".jsonl",) + tuple(".jsonl" + suffix for suffix in ARCHIVE_SUFFIXES)
+
+
+def session_id(path: str) -> str:
+    """会话 id：文件名去掉 .jsonl 和压缩后缀"""
+    name = os.path.basename(strip_archive_suffix(path))
+    return name[:-len(".jsonl")] if name.endswith(".jsonl") else name
+
+
+def ledger_source(path: str) -> str:
+    """写入账本的来源：归档按压缩前的路径记录，解压后的行偏移与原文件一致，
+    因此原文件压缩后重新解析也不会重复计数"""
+    return strip_archive_suffix(path)
+
+
+def parse_line(line: bytes):
+    """解析一行 JSON（bytes）：安装了 orjson 时优先使用，无法解析时抛出 ValueError"""
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except ValueError:
+            # orjson 不接受 NaN 等非标准写法，交给标准库再试一次
+            pass
+    return json.loads(line)
+
+
+def is_candidate(line: bytes) -> bool:
+    """字节级预过滤：行内是否可能含有用量或模型切换记录"""
+    return USAGE_MARKER in line or MODEL_CHANGE_MARKER in line
+
+
+def extract_usage(record: dict) -> Optional[dict]:
+    """从一条会话记录中提取 assistant 的 token 用量，没有则返回 None"""
+    if record.get("type") != "message":
+        return None
+    message = record.get("message", {})
+    if message.get("role") != "assistant":
+        return None
+    usage_data = message.get("usage", {})
+    if not usage_data:
+        return None
+
+    # 支持多种格式
+    input_tokens = usage_data.get("input", 0) or usage_data.get("input_tokens", 0)
+    output_tokens = usage_data.get("output", 0) or usage_data.get("output_tokens", 0)
+    total_tokens = usage_data.get("totalTokens", 0) or (input_tokens + output_tokens)
+    return {
+        "input": input_tokens,
+        "output": output_tokens,
+        "total": total_tokens,
+        "model": message.get("model")
+    }
+
+
+def iter_lines_reversed(path: str, block_size: int = 64 * 1024,
+                        max_bytes: Optional[int] = None):
+    """从文件末尾按块向前读取，逐行倒序产出（bytes，跳过空行）
+
+    max_bytes 限制最多读取的字节数，超过后停止（未读完的行被丢弃），
+    因此内存和 I/O 只与读取的尾部大小相关，与文件大小无关。
+    最后一行（第一个产出的行）总是完整读出，即使它本身超过 max_bytes。
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        remainder = b""
+        consumed = 0
+        yielded = False
+
+        while pos > 0:
+            if max_bytes is not None and consumed >= max_bytes and yielded:
+                return
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            block = f.read(size) + remainder
+            consumed += size
+
+            lines = block.split(b"\n")
+            # 第一段可能是被块边界截断的行，留到下一块拼接
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line.strip():
+                    yielded = True
+                    yield line
+
+        if remainder.strip():
+            yield remainder
+
+
+def record_datetime(record: dict, fallback: float) -> datetime:
+    """记录的本地时间：优先 timestamp 字段（ISO 或毫秒时间戳），否则用 fallback"""
+    ts = record.get("timestamp") or record.get("message", {}).get("timestamp")
+    try:
+        if isinstance(ts, (int, float)):
+            return datetime.fromtimestamp(ts / 1000 if ts > 1e11 else ts)
+        if isinstance(ts, str):
+            parsed = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone().replace(tzinfo=None)
+            return parsed
+    except (ValueError, OverflowError, OSError):
+        pass
+    return datetime.fromtimestamp(fallback)
+
+
+def scan_session_file(path: str, cursor: dict, with_rows: bool = False) -> List[dict]:
+    """从游标偏移处流式解析新追加的行，原地累加到 cursor
+
+    with_rows 为 True 时返回每条用量记录（供 TokenLedger 写入），否则返回空列表。
+    压缩归档流式解压后从头解析。模块级函数，可以直接交给进程池执行。
+    """
+    offset = cursor["offset"]
+    session = session_id(path)
+    fallback_mtime = os.path.getmtime(path)
+    model = cursor.get("model", "unknown")
+    rows = []
+    first_record = last_record = None
+
+    with (open_archive(path) if is_archive(path) else open(path, 'rb')) as f:
+        if offset:
+            f.seek(offset)
+        for line in f:
+            line_offset = offset
+            if line.endswith(b"\n") and not is_candidate(line):
+                offset += len(line)
+                continue
+            try:
+                record = parse_line(line)
+            except ValueError:
+                if not line.endswith(b"\n"):
+                    # 末尾写了一半的行：等下次写完再解析
+                    break
+                record = None
+            offset += len(line)
+
+            try:
+                if record.get("type") == "model_change":
+                    model = record.get("modelId", model)
+                    continue
+                usage = extract_usage(record)
+            except Exception:
+                continue
+            if not usage:
+                continue
+
+            if first_record is None:
+                first_record = record
+            last_record = record
+            cursor["input"] += usage["input"]
+            cursor["output"] += usage["output"]
+            cursor["total"] += usage["total"]
+            cursor["records"] += 1
+
+            # 按模型拆分的累计值
+            record_model = usage["model"] or model
+            per_model = cursor.setdefault("models", {}).setdefault(
+                record_model, {"input": 0, "output": 0, "total": 0}
+            )
+            per_model["input"] += usage["input"]
+            per_model["output"] += usage["output"]
+            per_model["total"] += usage["total"]
+
+            if with_rows:
+                when = record_datetime(record, fallback_mtime)
+                rows.append({
+                    "offset": line_offset,
+                    "session": session,
+                    "model": record_model,
+                    "ts": when.isoformat(),
+                    "day": when.strftime("%Y-%m-%d"),
+                    "hour": when.strftime("%Y-%m-%dT%H"),
+                    "input": usage["input"],
+                    "output": usage["output"],
+                    "total": usage["total"]
+                })
+
+    cursor["offset"] = offset
+    cursor["model"] = model
+    # 会话的首次 / 最近一次用量时间（只解析首尾两条记录的时间戳）
+    if first_record is not None:
+        if not cursor.get("first_at"):
+            cursor["first_at"] = record_datetime(first_record, fallback_mtime).isoformat()
+        cursor["last_at"] = record_datetime(last_record, fallback_mtime).isoformat()
+    return rows
+
+
+# 待解析文件：(路径, 游标, 文件大小, mtime)
+PendingScan = Tuple[str, dict, int, float]
+
+
+def _scan_shard(shard: List[PendingScan], with_rows: bool) -> List[Tuple[str, dict, List[dict]]]:
+    """进程池 worker：解析一组文件，返回 (路径, 更新后的游标, 账本记录)"""
+    results = []
+    for path, cursor, size, mtime in shard:
+        try:
+            rows = scan_session_file(path, cursor, with_rows)
+        except (OSError, EOFError):
+            continue
+        cursor["size"] = size
+        cursor["mtime"] = mtime
+        results.append((path, cursor, rows))
+    return results
+
+
+class SessionIndex:
+    """会话文件游标索引
+
+    每个文件保存一个游标：inode、上次看到的大小、已解析的字节偏移以及
+    截至该偏移的 token 累计值。文件被截断或轮转（inode 变化）时从头重建，
+    被删除的文件直接从索引中移除。
+
+    传入 ledger 时，解析出的每条用量记录同时写入 TokenLedger；文件删除后
+    账本中的历史记录保留，截断 / 轮转时先清掉该文件的旧记录再重新写入。
+    agent 为该索引所属的 agent 名，写入账本的记录都带上这个维度。
+
+    压缩归档（*.jsonl.gz / *.jsonl.zst）视为不可变：解析一次后游标不再变化；
+    传入 archive_cache 时解析结果按内容哈希永久缓存，游标丢失后也不必重新解压。
+    """
+
+    # 需要从头解析的文件达到该数量时才启用进程池回填
+    BACKFILL_MIN_FILES = 16
+    # 每个 worker 分到的分片数（分片越多，大小不均时负载越均衡）
+    SHARDS_PER_WORKER = 4
+
+    def __init__(self, state_file: Optional[str] = None, ledger=None,
+                 workers: Optional[int] = None, agent: str = "main",
+                 archive_cache=None):
+        self.state_file = state_file
+        self.ledger = ledger
+        self.agent = agent
+        self.archive_cache = archive_cache
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.cursors: Dict[str, dict] = {}
+        # 最近一次 refresh() 完成的时间，None 表示本进程内尚未扫描过
+        self.refreshed_at: Optional[float] = None
+        self.progress = {
+            "running": False,
+            "files_total": 0,
+            "files_done": 0,
+            "workers": 0,
+            "started_at": None,
+            "finished_at": None
+        }
+        self._lock = threading.Lock()
+        if ledger is None or not ledger.created:
+            self._load_state()
+
+    def _load_state(self):
+        """从磁盘加载游标"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                self.cursors = json.load(f).get("files", {})
+        except Exception as e:
+            print(f"加载会话索引失败: {e}，将重新扫描")
+            self.cursors = {}
+
+    def _save_state(self):
+        """原子写入游标（临时文件 + rename）"""
+        if not self.state_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({"files": self.cursors}, f)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            print(f"保存会话索引失败: {e}")
+
+    @staticmethod
+    def _new_cursor(st: os.stat_result) -> dict:
+        return {
+            "inode": st.st_ino,
+            "size": 0,
+            "offset": 0,
+            "mtime": st.st_mtime,
+            "input": 0,
+            "output": 0,
+            "total": 0,
+            "records": 0,
+            "model": "unknown",
+            "models": {},
+            "first_at": None,
+            "last_at": None
+        }
+
+    @timed("session_index.refresh")
+    def refresh(self, sessions_dir: str,
+                changed_files: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """增量刷新目录下的 *.jsonl 文件，返回 {路径: 游标} 的副本
+
+        changed_files 为文件监视器给出的变化文件时只检查这些文件；
+        为 None 时列出整个目录（并移除已删除文件的游标）。
+        """
+        with self._lock:
+            changed = False
+            seen = set()
+            pending: List[PendingScan] = []
+            full_listing = changed_files is None
+            archives: Dict[str, os.stat_result] = {}
+            if full_listing:
+                candidates = [
+                    path for suffix in SESSION_SUFFIXES
+                    for path in glob.glob(f"{sessions_dir}/*{suffix}")
+                ]
+            else:
+                candidates = [path for path in changed_files if path.endswith(SESSION_SUFFIXES)]
+
+            for session_file in candidates:
+                archive = is_archive(session_file)
+                if archive and (not archive_supported(session_file)
+                                or has_uncompressed_copy(session_file)):
+                    continue
+                try:
+                    st = os.stat(session_file)
+                except OSError:
+                    if self.cursors.pop(session_file, None) is not None:
+                        changed = True
+                    continue
+                seen.add(session_file)
+
+                cursor = self.cursors.get(session_file)
+                if archive and cursor is not None and cursor["inode"] == st.st_ino \
+                        and cursor["size"] == st.st_size and cursor["mtime"] == st.st_mtime:
+                    # 归档不会再变化
+                    continue
+                if archive and cursor is not None and self._same_archive(session_file, cursor, st):
+                    # 只是 stat 变了（touch、覆盖复制、从备份恢复），内容相同：账本不动
+                    cursor.update(inode=st.st_ino, size=st.st_size, mtime=st.st_mtime)
+                    changed = True
+                    continue
+                if (cursor is None
+                        or cursor["inode"] != st.st_ino
+                        or st.st_size < cursor["offset"]
+                        or archive):
+                    # 新文件、轮转或截断：从头开始
+                    if cursor is not None and self.ledger is not None:
+                        self.ledger.remove_source(ledger_source(session_file))
+                    changed = True
+                    # 已删除账本记录时必须重新解析写入，不能只从缓存恢复游标
+                    if archive and cursor is None and self._restore_archive(session_file, st):
+                        continue
+                    cursor = self._new_cursor(st)
+                    self.cursors[session_file] = cursor
+
+                if st.st_size != cursor["size"] or st.st_mtime != cursor["mtime"]:
+                    pending.append((session_file, cursor, st.st_size, st.st_mtime))
+                    if archive:
+                        archives[session_file] = st
+
+            if pending:
+                self._scan_pending(pending)
+                changed = True
+            if archives:
+                self._cache_archives(archives)
+
+            # 移除已删除文件（仅限本目录）
+            prefix = os.path.join(sessions_dir, "")
+            if full_listing:
+                for path in list(self.cursors):
+                    if path.startswith(prefix) and path not in seen:
+                        del self.cursors[path]
+                        changed = True
+
+            if changed:
+                self._save_state()
+            self.refreshed_at = time.time()
+
+            return self._copy_cursors(prefix)
+
+    def _copy_cursors(self, prefix: str) -> Dict[str, dict]:
+        return {
+            path: dict(cursor)
+            for path, cursor in self.cursors.items()
+            if path.startswith(prefix)
+        }
+
+    def snapshot(self, sessions_dir: str) -> Dict[str, dict]:
+        """不扫描文件，直接返回目录下当前的游标副本"""
+        with self._lock:
+            return self._copy_cursors(os.path.join(sessions_dir, ""))
+
+    def _same_archive(self, path: str, cursor: dict, st: os.stat_result) -> bool:
+        """归档内容是否与解析游标时相同（按内容哈希比较）"""
+        if self.archive_cache is None or not cursor.get("digest"):
+            return False
+        try:
+            return self.archive_cache.digest(path, st) == cursor["digest"]
+        except OSError:
+            return False
+
+    def _restore_archive(self, path: str, st: os.stat_result) -> bool:
+        """从归档缓存恢复游标；账本刚建立（需要逐条记录）时不使用缓存"""
+        if self.archive_cache is None or (self.ledger is not None and self.ledger.created):
+            return False
+        digest = self.archive_cache.digest(path, st)
+        cached = self.archive_cache.get("session", digest)
+        if cached is None:
+            return False
+        cached.update(inode=st.st_ino, size=st.st_size, mtime=st.st_mtime, digest=digest)
+        self.cursors[path] = cached
+        return True
+
+    def _cache_archives(self, archives: Dict[str, os.stat_result]):
+        """把新解析的归档游标按内容哈希写入缓存"""
+        if self.archive_cache is None:
+            return
+        for path, st in archives.items():
+            cursor = self.cursors.get(path)
+            if cursor is None:
+                continue
+            try:
+                digest = self.archive_cache.digest(path, st)
+            except OSError:
+                continue
+            cursor["digest"] = digest
+            self.archive_cache.put("session", digest, cursor)
+        self.archive_cache.save()
+
+    def _scan_pending(self, pending: List[PendingScan]):
+        """解析有变化的文件；大量文件需要从头解析时（冷启动）并行回填"""
+        full_scans = sum(1 for _, cursor, _, _ in pending if cursor["offset"] == 0)
+        if self.workers <= 1 or full_scans < self.BACKFILL_MIN_FILES:
+            for path, cursor, size, mtime in pending:
+                self._scan_file(path, cursor)
+                cursor["size"] = size
+                cursor["mtime"] = mtime
+            return
+
+        workers = min(self.workers, len(pending))
+        self.progress = {
+            "running": True,
+            "files_total": len(pending),
+            "files_done": 0,
+            "workers": workers,
+            "started_at": time.time(),
+            "finished_at": None
+        }
+        try:
+            self._scan_parallel(pending, workers)
+        finally:
+            self.progress["running"] = False
+            self.progress["finished_at"] = time.time()
+
+    def _scan_parallel(self, pending: List[PendingScan], workers: int):
+        """按文件大小轮流分片交给进程池，在本进程合并游标并写入账本"""
+        shard_count = min(len(pending), workers * self.SHARDS_PER_WORKER)
+        shards: List[List[PendingScan]] = [[] for _ in range(shard_count)]
+        by_size = sorted(pending, key=lambda item: item[2], reverse=True)
+        for i, item in enumerate(by_size):
+            shards[i % shard_count].append(item)
+
+        with_rows = self.ledger is not None
+        # spawn：调用方是多线程服务，fork 可能继承被其他线程持有的锁
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {
+                pool.submit(_scan_shard, shard, with_rows): shard
+                for shard in shards
+            }
+            for future in as_completed(futures):
+                for path, cursor, rows in future.result():
+                    self.cursors[path] = cursor
+                    if rows:
+                        self.ledger.ingest(ledger_source(path), rows, self.agent)
+                self.progress["files_done"] += len(futures[future])
+
+    def _scan_file(self, path: str, cursor: dict):
+        """在本进程解析一个文件的新增内容并写入账本"""
+        try:
+            rows = scan_session_file(path, cursor, self.ledger is not None)
+        except (OSError, EOFError) as e:
+            # 文件在解析途中消失，或归档已损坏
+            print(f"解析会话文件失败 {path}: {e}")
+            return
+        if rows:
+            self.ledger.ingest(ledger_source(path), rows, self.agent)
+
+    def backfill_progress(self) -> dict:
+        """最近一次并行回填的进度"""
+        return dict(self.progress)
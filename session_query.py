@@ -0,0 +1,169 @@
+"""
+OpenClaw Monitor - Session Query
+会话列表查询：由会话索引的游标生成会话元数据，在内存中过滤、排序，
+并用不透明游标（上一页最后一项的排序键）分页，翻页结果不受新会话插入影响
+"""
+
+import os
+import json
+import base64
+import bisect
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from archives import is_archive
+from session_index import session_id as path_session_id
+
+
+# 最近活跃时间在该秒数内的会话视为 running（与任务列表一致）
+RUNNING_WINDOW = 3600
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# 可排序字段 -> 空值时的替代值（保证同一字段的排序键类型一致）
+SORT_FIELDS = {
+    "last_active": "",
+    "started_at": "",
+    "total": 0,
+    "input": 0,
+    "output": 0,
+    "records": 0,
+    "size": 0,
+}
+
+STATUSES = ("running", "completed")
+
+
+def session_metadata(path: str, cursor: dict, agent: str, now: float) -> dict:
+    """由一个游标生成会话元数据"""
+    mtime = cursor["mtime"]
+    session_id = path_session_id(path)
+    return {
+        "id": session_id,
+        "key": f"{agent}/{session_id}",
+        "agent": agent,
+        "file": os.path.basename(path),
+        "model": cursor.get("model", "unknown"),
+        "models": sorted(cursor.get("models") or {}),
+        "input": cursor["input"],
+        "output": cursor["output"],
+        "total": cursor["total"],
+        "records": cursor["records"],
+        "size": cursor["size"],
+        "archived": is_archive(path),
+        "started_at": cursor.get("first_at"),
+        "last_active": datetime.fromtimestamp(mtime).isoformat(),
+        "status": "running" if now - mtime < RUNNING_WINDOW else "completed"
+    }
+
+
+def encode_cursor(sort_key: Tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(sort_key)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple:
+    """解码游标为 (排序值, 会话键)；格式不对时抛出 ValueError"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        decoded = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(decoded, list) or len(decoded) != 2 or not isinstance(decoded[1], str):
+        raise ValueError("Invalid cursor")
+    return decoded[0], decoded[1]
+
+
+def _parse_bound(value: Optional[str], upper: bool) -> Optional[str]:
+    """日期范围边界转为可与 ISO 时间字符串比较的值；只给日期的上界包含整天"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
+    if upper and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.isoformat()
+
+
+def _parse_int(value: Optional[str], name: str) -> Optional[int]:
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}: {value}")
+
+
+def query_sessions(sessions: List[dict], params: Dict[str, str]) -> dict:
+    """按查询参数过滤、排序、分页
+
+    参数：model、status、agent、since / until（最近活跃时间，ISO 日期或时间）、
+    min_tokens / max_tokens（总 token）、sort、order（asc / desc）、limit、cursor。
+    参数不合法时抛出 ValueError。
+    """
+    sort = params.get("sort") or "last_active"
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"Invalid sort: {sort}")
+    order = params.get("order") or "desc"
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Invalid order: {order}")
+    status = params.get("status")
+    if status and status not in STATUSES:
+        raise ValueError(f"Invalid status: {status}")
+    limit = _parse_int(params.get("limit"), "limit") or DEFAULT_LIMIT
+    limit = max(1, min(limit, MAX_LIMIT))
+    since = _parse_bound(params.get("since"), upper=False)
+    until = _parse_bound(params.get("until"), upper=True)
+    min_tokens = _parse_int(params.get("min_tokens"), "min_tokens")
+    max_tokens = _parse_int(params.get("max_tokens"), "max_tokens")
+    model = params.get("model")
+    agent = params.get("agent")
+
+    matched = []
+    for session in sessions:
+        if model and model != session["model"] and model not in session["models"]:
+            continue
+        if status and session["status"] != status:
+            continue
+        if agent and session["agent"] != agent:
+            continue
+        if since and session["last_active"] < since:
+            continue
+        if until and session["last_active"] >= until:
+            continue
+        if min_tokens is not None and session["total"] < min_tokens:
+            continue
+        if max_tokens is not None and session["total"] > max_tokens:
+            continue
+        matched.append(session)
+
+    empty = SORT_FIELDS[sort]
+    keyed = sorted(
+        (((session[sort] if session[sort] is not None else empty, session["key"]), session)
+         for session in matched),
+        key=lambda item: item[0]
+    )
+    keys = [key for key, _ in keyed]
+
+    # 游标是上一页最后一项的排序键：升序取其后、降序取其前的项
+    if params.get("cursor"):
+        after = decode_cursor(params["cursor"])
+        # 排序值须与该字段同类型，否则与排序键比较时会抛出 TypeError
+        if not isinstance(after[0], type(empty)) or isinstance(after[0], bool):
+            raise ValueError("Invalid cursor")
+        if order == "asc":
+            page = keyed[bisect.bisect_right(keys, after):]
+        else:
+            page = keyed[:bisect.bisect_left(keys, after)][::-1]
+    else:
+        page = keyed if order == "asc" else keyed[::-1]
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        "sessions": [session for _, session in page],
+        "total": len(matched),
+        "next_cursor": encode_cursor(page[-1][0]) if has_more else None
+    }
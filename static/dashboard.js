@@ -5,6 +5,7 @@
 // 全局状态
 let currentTab = 'overview';
 let autoRefreshInterval = null;
+let eventSource = null;
 let usageChart = null;
 let currentCurrency = 'CNY';
 let pricingData = {};
@@ -113,56 +114,61 @@ async function loadSummaryData() {
     try {
         const resp = await fetch('/api/summary');
         const data = await resp.json();
-        
-        if (data.error) {
-            console.error('加载数据失败:', data.error);
-            return;
-        }
-        
-        // 更新 Gateway 状态
-        const gatewayStatus = document.getElementById('gateway-status');
-        if (data.gateway) {
-            const online = data.gateway.online;
-            gatewayStatus.textContent = online ? '🟢 在线' : '🔴 离线';
-            gatewayStatus.className = online ? 'card-value online' : 'card-value offline';
-            
-            const uptime = formatDuration(data.gateway.uptime_seconds);
-            document.getElementById('gateway-version').textContent = 
-                `运行: ${uptime}`;
-        }
-        
-        // 更新任务数
-        if (data.tasks) {
-            document.getElementById('running-tasks').textContent = data.tasks.running || 0;
-            document.getElementById('completed-tasks').textContent = 
-                data.tasks.completed_24h || 0;
-        }
-        
-        // 更新 Token 统计
-        if (data.token_usage) {
-            const today = data.token_usage.today || {};
-            const week = data.token_usage.week || {};
-            
-            document.getElementById('today-tokens').textContent = 
-                formatTokens(today.total || 0);
-            document.getElementById('week-tokens').textContent = 
-                formatTokens(week.total || 0);
-        }
-        
-        // 更新成本统计（需要定价数据）
-        updateCostDisplay(data.token_usage);
-        
-        // 更新会话统计
-        document.getElementById('total-sessions').textContent = 
-            data.token_usage?.total_sessions || '-';
-        document.getElementById('last-active').textContent = 
-            data.gateway?.online ? '刚刚' : '未知';
-        
+        renderSummary(data);
     } catch (e) {
         console.error('加载摘要数据失败:', e);
     }
 }
 
+function renderSummary(data) {
+    if (data.error) {
+        console.error('加载数据失败:', data.error);
+        return;
+    }
+    
+    // 更新 Gateway 状态
+    const gatewayStatus = document.getElementById('gateway-status');
+    if (data.gateway) {
+        const online = data.gateway.online;
+        gatewayStatus.textContent = online ? '🟢 在线' : '🔴 离线';
+        gatewayStatus.className = online ? 'card-value online' : 'card-value offline';
+        
+        // 数据不变时不会推送新的概览：由启动时间计算运行时长，而不是用快照里的 uptime_seconds
+        const startTime = data.gateway.start_time;
+        const uptime = formatDuration(
+            startTime ? Date.now() / 1000 - startTime : data.gateway.uptime_seconds);
+        document.getElementById('gateway-version').textContent = 
+            `运行: ${uptime}`;
+    }
+    
+    // 更新任务数
+    if (data.tasks) {
+        document.getElementById('running-tasks').textContent = data.tasks.running || 0;
+        document.getElementById('completed-tasks').textContent = 
+            data.tasks.completed_24h || 0;
+    }
+    
+    // 更新 Token 统计
+    if (data.token_usage) {
+        const today = data.token_usage.today || {};
+        const week = data.token_usage.week || {};
+        
+        document.getElementById('today-tokens').textContent = 
+            formatTokens(today.total || 0);
+        document.getElementById('week-tokens').textContent = 
+            formatTokens(week.total || 0);
+    }
+    
+    // 更新成本统计（需要定价数据）
+    updateCostDisplay(data.token_usage);
+    
+    // 更新会话统计
+    document.getElementById('total-sessions').textContent = 
+        data.token_usage?.total_sessions || '-';
+    document.getElementById('last-active').textContent = 
+        data.gateway?.online ? '刚刚' : '未知';
+}
+
 async function loadSystemData() {
     try {
         const resp = await fetch('/api/system');
@@ -241,32 +247,35 @@ async function loadTasksData() {
     try {
         const resp = await fetch('/api/tasks');
         const data = await resp.json();
-        
-        document.getElementById('task-running-count').textContent = data.running || 0;
-        document.getElementById('task-completed-count').textContent = data.completed_24h || 0;
-        
-        const taskList = document.getElementById('task-list');
-        
-        if (!data.tasks || data.tasks.length === 0) {
-            taskList.innerHTML = '<div class="empty-state">暂无运行中的任务</div>';
-            return;
-        }
-        
-        taskList.innerHTML = data.tasks.map(task => `
-            <div class="task-item">
-                <span class="task-status ${task.status}"></span>
-                <span class="task-id">${task.id}</span>
-                <span class="task-model">${task.model}</span>
-                <span class="task-time">${formatTime(task.last_active)}</span>
-                <span class="task-duration">${task.duration_minutes}分钟</span>
-            </div>
-        `).join('');
-        
+        renderTasks(data);
     } catch (e) {
         console.error('加载任务数据失败:', e);
     }
 }
 
+function renderTasks(data) {
+    document.getElementById('task-running-count').textContent = data.running || 0;
+    document.getElementById('task-completed-count').textContent = data.completed_24h || 0;
+    
+    const taskList = document.getElementById('task-list');
+    
+    if (!data.tasks || data.tasks.length === 0) {
+        taskList.innerHTML = '<div class="empty-state">暂无运行中的任务</div>';
+        return;
+    }
+    
+    taskList.innerHTML = data.tasks.map(task => `
+        <div class="task-item">
+            <span class="task-status ${task.status}"></span>
+            <span class="task-id">${task.id}</span>
+            <span class="task-agent">${task.agent || 'main'}</span>
+            <span class="task-model">${task.model}</span>
+            <span class="task-time">${formatTime(task.last_active)}</span>
+            <span class="task-duration">${task.duration_minutes}分钟</span>
+        </div>
+    `).join('');
+}
+
 async function loadLogsData() {
     try {
         const days = document.getElementById('log-days').value;
@@ -531,7 +540,18 @@ async function updateExchangeRate(auto = false) {
 
 // ========== 成本显示更新 ==========
 function updateCostDisplay(tokenUsage) {
-    if (!tokenUsage || !pricingData.models) return;
+    if (!tokenUsage) return;
+    
+    // 服务端已按模型定价计算成本
+    if (tokenUsage.currency) {
+        document.getElementById('today-cost').textContent = 
+            formatCurrency(tokenUsage.today?.cost || 0, tokenUsage.currency);
+        document.getElementById('week-cost').textContent = 
+            formatCurrency(tokenUsage.week?.cost || 0, tokenUsage.currency);
+        return;
+    }
+    
+    if (!pricingData.models) return;
     
     // 使用默认模型计算成本示例
     const defaultPricing = pricingData.models.default || {input_per_1k: 0.003, output_per_1k: 0.015, currency: 'USD'};
@@ -628,7 +648,37 @@ function renderUsageChart(dailyData) {
 }
 
 // ========== 自动刷新 ==========
+// 优先使用 SSE 推送（数据变化时才收到更新），不支持或连接失败时退回轮询
 function startAutoRefresh() {
+    if (window.EventSource) {
+        startEventStream();
+    } else {
+        startPolling();
+    }
+}
+
+function startEventStream() {
+    eventSource = new EventSource('/api/stream');
+    
+    eventSource.addEventListener('summary', (event) => {
+        const data = JSON.parse(event.data);
+        renderSummary(data);
+        if (currentTab === 'tasks' && data.tasks) {
+            renderTasks(data.tasks);
+        }
+    });
+    
+    eventSource.onerror = () => {
+        // 连接被关闭（如代理不支持长连接）时改为轮询
+        if (eventSource.readyState === EventSource.CLOSED) {
+            eventSource = null;
+            startPolling();
+        }
+    };
+}
+
+function startPolling() {
+    if (autoRefreshInterval) return;
     autoRefreshInterval = setInterval(() => {
         if (currentTab === 'overview') {
             loadSummaryData();
@@ -639,8 +689,13 @@ function startAutoRefresh() {
 }
 
 function stopAutoRefresh() {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
     if (autoRefreshInterval) {
         clearInterval(autoRefreshInterval);
+        autoRefreshInterval = null;
     }
 }
 
@@ -0,0 +1,142 @@
+"""
+OpenClaw Monitor - System Sampler
+后台系统指标采样器：按固定间隔采集 CPU、每核 CPU、内存、磁盘和负载，
+写入定长环形缓冲区（array 存储），读取最新值不会阻塞请求线程
+"""
+
+import time
+import threading
+from array import array
+from typing import Dict, List, Optional
+import psutil
+
+
+class SystemSampler:
+    """系统指标环形缓冲区采样器"""
+
+    # 默认每 5 秒采样一次，保留 1 小时
+    DEFAULT_INTERVAL = 5.0
+    DEFAULT_CAPACITY = 720
+
+    # 标量指标列（每列一个 array('d')）
+    FIELDS = (
+        "timestamp", "cpu_percent",
+        "memory_percent", "memory_total", "memory_available",
+        "disk_percent", "disk_total", "disk_free",
+        "load_1", "load_5", "load_15"
+    )
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL,
+                 capacity: int = DEFAULT_CAPACITY, disk_path: str = '/'):
+        self.interval = interval
+        self.capacity = capacity
+        self.disk_path = disk_path
+        self.cpu_count = psutil.cpu_count() or 1
+        self._columns = {name: array('d', bytes(8 * capacity)) for name in self.FIELDS}
+        # 每核 CPU 按 [样本][核] 展平存放
+        self._per_cpu = array('d', bytes(8 * capacity * self.cpu_count))
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # 预热：psutil 的非阻塞 cpu_percent 以上一次调用为基准
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+
+    def start(self):
+        """启动采样线程（重复调用无副作用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="system-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """停止采样线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"系统指标采样失败: {e}")
+            self._stop_event.wait(self.interval)
+
+    def sample(self):
+        """采集一个样本并写入环形缓冲区（非阻塞）"""
+        cpu_percent = psutil.cpu_percent(interval=None)
+        per_cpu = psutil.cpu_percent(interval=None, percpu=True)
+        mem = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        try:
+            load = psutil.getloadavg()
+        except (AttributeError, OSError):
+            load = (0.0, 0.0, 0.0)
+
+        values = {
+            "timestamp": time.time(),
+            "cpu_percent": cpu_percent,
+            "memory_percent": mem.percent,
+            "memory_total": mem.total,
+            "memory_available": mem.available,
+            "disk_percent": disk.percent,
+            "disk_total": disk.total,
+            "disk_free": disk.free,
+            "load_1": load[0],
+            "load_5": load[1],
+            "load_15": load[2]
+        }
+
+        with self._lock:
+            slot = self._next
+            for name, value in values.items():
+                self._columns[name][slot] = value
+            base = slot * self.cpu_count
+            for core in range(self.cpu_count):
+                self._per_cpu[base + core] = per_cpu[core] if core < len(per_cpu) else 0.0
+            self._next = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def _slots(self, count: int) -> List[int]:
+        """最近 count 个样本的槽位（从旧到新）"""
+        start = (self._next - count) % self.capacity
+        return [(start + i) % self.capacity for i in range(count)]
+
+    def latest(self) -> Optional[Dict[str, object]]:
+        """最新样本，尚无样本时返回 None"""
+        with self._lock:
+            if self._count == 0:
+                return None
+            slot = (self._next - 1) % self.capacity
+            sample = {name: column[slot] for name, column in self._columns.items()}
+            base = slot * self.cpu_count
+            sample["per_cpu"] = list(self._per_cpu[base:base + self.cpu_count])
+            return sample
+
+    def history(self, seconds: Optional[float] = None) -> Dict[str, list]:
+        """最近 seconds 秒内的样本，按列返回（便于前端绘图）"""
+        with self._lock:
+            slots = self._slots(self._count)
+            if seconds is not None:
+                cutoff = time.time() - seconds
+                timestamps = self._columns["timestamp"]
+                slots = [slot for slot in slots if timestamps[slot] >= cutoff]
+
+            result = {
+                name: [column[slot] for slot in slots]
+                for name, column in self._columns.items()
+            }
+            result["per_cpu"] = [
+                list(self._per_cpu[slot * self.cpu_count:(slot + 1) * self.cpu_count])
+                for slot in slots
+            ]
+        result["interval"] = self.interval
+        return result
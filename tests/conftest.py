@@ -0,0 +1,13 @@
+"""
+Shared pytest configuration
+
+Point HOME at a throwaway directory before any module under test is
+imported, so that nothing under test (app.create_app() creates
+PricingManager and OpenClawCollector) ever touches the real ~/.openclaw
+or ~/.openclaw-monitor.
+"""
+
+import os
+import tempfile
+
+os.environ["HOME"] = tempfile.mkdtemp(prefix="openclaw-monitor-test-")
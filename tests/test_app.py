@@ -0,0 +1,356 @@
+"""
+Tests for the Flask API in app.py
+"""
+
+import os
+import gzip
+import json
+import runpy
+import base64
+import pytest
+import tempfile
+import shutil
+
+import app as app_module
+from collector_scheduler import CollectorScheduler
+from data_collector import OpenClawCollector
+from pricing_manager import PricingManager
+
+
+AUTH = {
+    'Authorization': 'Basic ' + base64.b64encode(b'admin:admin123').decode()
+}
+
+
+def usage_record(model, input_tokens, output_tokens):
+    return {
+        "type": "message",
+        "message": {
+            "role": "assistant",
+            "model": model,
+            "usage": {"input": input_tokens, "output": output_tokens}
+        }
+    }
+
+
+class TestApi:
+    """Test cases for the JSON API"""
+
+    @pytest.fixture
+    def home_dir(self, monkeypatch):
+        temp_dir = tempfile.mkdtemp()
+        monkeypatch.setenv('HOME', temp_dir)
+        monkeypatch.setattr(PricingManager, 'CONFIG_DIR', os.path.join(temp_dir, 'monitor'))
+        monkeypatch.setattr(PricingManager, 'CONFIG_FILE',
+                            os.path.join(temp_dir, 'monitor', 'pricing.json'))
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def sessions_dir(self, home_dir):
+        path = os.path.join(home_dir, '.openclaw', 'agents', 'main', 'sessions')
+        os.makedirs(path)
+        return path
+
+    @pytest.fixture
+    def client(self, home_dir, sessions_dir, monkeypatch):
+        collector = OpenClawCollector()
+        scheduler = CollectorScheduler()
+        monkeypatch.setattr(app_module, 'data_collector', collector)
+        pricing_mgr = PricingManager()
+        monkeypatch.setattr(app_module, 'pricing_mgr', pricing_mgr)
+        monkeypatch.setattr(app_module, 'scheduler', scheduler)
+        # No background threads: tests refresh the snapshot by hand
+        monkeypatch.setattr(app_module, 'start_background', lambda: None)
+        scheduler.register('token_usage', collector.get_token_usage, 60)
+        scheduler.register('tasks', collector.get_running_tasks, 60)
+        yield app_module.app.test_client()
+        pricing_mgr.close()
+
+    def write_session(self, sessions_dir, name, records):
+        with open(os.path.join(sessions_dir, name), 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+    def test_spawned_worker_import_has_no_side_effects(self, monkeypatch):
+        """Test re-running app.py as a spawn worker's __mp_main__ builds no services"""
+        constructed = []
+        monkeypatch.setattr(OpenClawCollector, '__init__',
+                            lambda self: constructed.append('collector'))
+        monkeypatch.setattr(PricingManager, '__init__',
+                            lambda self: constructed.append('pricing'))
+
+        # multiprocessing's spawn start method runs the parent's main script this way
+        namespace = runpy.run_path(app_module.__file__, run_name='__mp_main__')
+        assert constructed == []
+        assert namespace['data_collector'] is None
+        assert namespace['scheduler'] is None
+
+    def test_requires_auth(self, client):
+        assert client.get('/api/token-usage').status_code == 401
+        assert client.get('/api/health').status_code == 200
+
+    def test_agent_filters(self, client, home_dir, sessions_dir):
+        """Test tasks and token usage can be narrowed to one agent"""
+        other_dir = os.path.join(home_dir, '.openclaw', 'agents', 'coder', 'sessions')
+        os.makedirs(other_dir)
+        self.write_session(sessions_dir, 'a.jsonl', [usage_record('gpt-4o', 1000, 1000)])
+        self.write_session(other_dir, 'b.jsonl', [usage_record('gpt-4o', 10, 10)])
+
+        data = client.get('/api/token-usage?agent=coder', headers=AUTH).get_json()
+        assert data['week']['input'] == 10
+        assert [a['agent'] for a in data['agents']] == ['coder']
+        assert data['agents'][0]['cost'] > 0
+
+        all_tasks = client.get('/api/tasks', headers=AUTH).get_json()
+        assert all_tasks['running'] == 2
+        tasks = client.get('/api/tasks?agent=coder', headers=AUTH).get_json()
+        assert tasks['running'] == 1
+        assert [t['agent'] for t in tasks['tasks']] == ['coder']
+
+        assert client.get('/api/tasks?agent=nope', headers=AUTH).status_code == 404
+
+    def test_sessions_endpoint(self, client, sessions_dir):
+        """Test the session listing is filtered, paginated and validated"""
+        for i in range(3):
+            record = usage_record('gpt-4o' if i else 'deepseek-chat', 100 * (i + 1), 10)
+            record['timestamp'] = f'2026-03-0{i + 1}T10:00:00'
+            self.write_session(sessions_dir, f's{i}.jsonl', [record])
+
+        data = client.get('/api/sessions?sort=total&order=asc&limit=2', headers=AUTH).get_json()
+        assert data['total'] == 3
+        assert [s['id'] for s in data['sessions']] == ['s0', 's1']
+        assert data['sessions'][0]['started_at'] == '2026-03-01T10:00:00'
+        assert data['sessions'][0]['agent'] == 'main'
+
+        rest = client.get(f'/api/sessions?sort=total&order=asc&limit=2&cursor={data["next_cursor"]}',
+                          headers=AUTH).get_json()
+        assert [s['id'] for s in rest['sessions']] == ['s2']
+        assert rest['next_cursor'] is None
+
+        filtered = client.get('/api/sessions?model=deepseek-chat', headers=AUTH).get_json()
+        assert [s['id'] for s in filtered['sessions']] == ['s0']
+        assert client.get('/api/sessions?sort=bogus', headers=AUTH).status_code == 400
+        bad_cursor = base64.urlsafe_b64encode(b'[200, 7]').decode()
+        assert client.get(f'/api/sessions?sort=total&cursor={bad_cursor}',
+                          headers=AUTH).status_code == 400
+
+    def test_session_detail(self, client, sessions_dir):
+        """Test a session's records are paged by line number"""
+        records = [{"type": "message", "n": i} for i in range(250)]
+        records[10] = usage_record('gpt-4o', 100, 10)
+        self.write_session(sessions_dir, 'long.jsonl', records)
+        with open(os.path.join(sessions_dir, 'long.jsonl'), 'a') as f:
+            f.write('not json\n')
+
+        data = client.get('/api/sessions/long?offset=200&limit=20', headers=AUTH).get_json()
+        assert data['total_lines'] == 251
+        assert [r['line'] for r in data['records']] == list(range(200, 220))
+        assert data['records'][0]['record']['n'] == 200
+        assert data['next_offset'] == 220
+        assert data['session']['input'] == 100
+
+        tail = client.get('/api/sessions/long?offset=-2', headers=AUTH).get_json()
+        assert tail['records'][0]['record']['n'] == 249
+        assert tail['records'][1] == {"line": 250, "raw": "not json"}
+        assert tail['next_offset'] is None
+
+        assert client.get('/api/sessions/missing', headers=AUTH).status_code == 404
+        assert client.get('/api/sessions/..', headers=AUTH).status_code == 404
+        assert client.get('/api/sessions/long?offset=x', headers=AUTH).status_code == 400
+
+    def test_archived_session_detail(self, client, sessions_dir):
+        """Test a compressed session listed by /api/sessions can be opened"""
+        records = [{"type": "message", "n": i} for i in range(30)]
+        records[0] = usage_record('gpt-4o', 100, 10)
+        with gzip.open(os.path.join(sessions_dir, 'old.jsonl.gz'), 'wt') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+        listed = client.get('/api/sessions', headers=AUTH).get_json()['sessions']
+        assert [(s['id'], s['archived']) for s in listed] == [('old', True)]
+
+        data = client.get('/api/sessions/old?offset=10&limit=5', headers=AUTH).get_json()
+        assert data['session']['archived'] is True
+        assert data['session']['input'] == 100
+        assert data['total_lines'] == 30
+        assert [r['record']['n'] for r in data['records']] == [10, 11, 12, 13, 14]
+        assert data['next_offset'] == 15
+
+        tail = client.get('/api/sessions/old?offset=-3&limit=2', headers=AUTH).get_json()
+        assert tail['offset'] == 27
+        assert [r['record']['n'] for r in tail['records']] == [27, 28]
+
+    def test_fleet_requires_peers(self, client, monkeypatch):
+        """Test fleet endpoints are only served in federation mode"""
+        monkeypatch.setattr(app_module, 'federation', None)
+        assert client.get('/api/fleet/summary', headers=AUTH).status_code == 404
+
+    def test_token_usage_costs_without_ledger(self, client, sessions_dir):
+        """Test week and month are priced once each when counting per file"""
+        app_module.data_collector.ledger = None
+        self.write_session(sessions_dir, 'a.jsonl', [usage_record('gpt-4o', 1000, 1000)])
+
+        data = client.get('/api/token-usage', headers=AUTH).get_json()
+        model_cost = data['models'][0]['cost']
+        assert model_cost > 0
+        assert data['today']['cost'] == pytest.approx(model_cost)
+        assert data['week']['cost'] == pytest.approx(model_cost)
+        assert data['month']['cost'] == pytest.approx(model_cost)
+
+    def test_token_usage_costs_per_model(self, client, sessions_dir):
+        """Test each model is priced with its own rates"""
+        self.write_session(sessions_dir, 'a.jsonl', [
+            usage_record('gpt-4o', 1000, 1000),
+            usage_record('deepseek-chat', 1000, 1000),
+        ])
+
+        data = client.get('/api/token-usage', headers=AUTH).get_json()
+        models = {m['model']: m for m in data['models']}
+        assert set(models) == {'gpt-4o', 'deepseek-chat'}
+        assert models['gpt-4o']['cost'] > models['deepseek-chat']['cost']
+
+        today = data['daily'][-1]
+        assert set(today['models']) == {'gpt-4o', 'deepseek-chat'}
+        assert today['cost'] == pytest.approx(
+            models['gpt-4o']['cost'] + models['deepseek-chat']['cost'], abs=1e-5
+        )
+        assert data['today']['cost'] == pytest.approx(today['cost'], abs=1e-5)
+
+    def test_summary_costs_do_not_mutate_snapshot(self, client, sessions_dir):
+        """Test pricing the summary leaves the shared snapshot untouched"""
+        self.write_session(sessions_dir, 'a.jsonl', [usage_record('gpt-4o', 1000, 0)])
+        app_module.scheduler.refresh('token_usage')
+
+        data = client.get('/api/summary', headers=AUTH).get_json()
+        assert data['token_usage']['today']['cost'] > 0
+        assert 0 <= data['snapshot_age']['token_usage'] < 60
+        snapshot = app_module.scheduler.get('token_usage')['data']
+        assert 'cost' not in snapshot['models'][0]
+
+    def test_pricing_import(self, client):
+        """Test bulk pricing import endpoint"""
+        resp = client.post('/api/pricing/import', headers=AUTH, json={
+            "models": {"bulk-model": {"input_per_1k": 0.1, "output_per_1k": 0.2}}
+        })
+        assert resp.get_json() == {"success": True, "imported": 1}
+        assert client.post('/api/pricing/import', headers=AUTH, json={}).status_code == 400
+
+    def test_stream_pushes_on_change(self, client, sessions_dir):
+        """Test the SSE stream sends a summary on connect and after changes"""
+        app_module.scheduler.refresh('token_usage')
+        resp = client.get('/api/stream', headers=AUTH, buffered=False)
+        assert resp.mimetype == 'text/event-stream'
+        events = iter(resp.response)
+        try:
+            assert next(events).startswith(b'retry:')
+            first = next(events).decode()
+            assert first.startswith('id: ') and 'event: summary' in first
+            data = json.loads(first.split('data: ', 1)[1])
+            assert data['token_usage']['today']['total'] == 0
+
+            self.write_session(sessions_dir, 'a.jsonl', [usage_record('gpt-4o', 10, 5)])
+            app_module.scheduler.refresh('token_usage')
+            second = next(events).decode()
+            data = json.loads(second.split('data: ', 1)[1])
+            assert data['token_usage']['today']['total'] == 15
+        finally:
+            resp.close()
+
+    def test_unchanged_recollect_keeps_etag(self, client, sessions_dir):
+        """Test re-collecting every section without file changes still returns 304"""
+        collector = app_module.data_collector
+        collector.offline = True
+        scheduler = app_module.scheduler
+        scheduler.register('version', collector.get_openclaw_version, 60,
+                           fingerprint=app_module.stable_view('version'))
+        scheduler.register('gateway', collector.get_gateway_status, 60,
+                           fingerprint=app_module.stable_view('gateway'))
+        scheduler.register('system', collector.get_system_info, 60,
+                           fingerprint=app_module.stable_view('system'), notify=False)
+        self.write_session(sessions_dir, 'a.jsonl', [usage_record('gpt-4o', 10, 5)])
+        for name in ('version', 'gateway', 'system', 'tasks', 'token_usage'):
+            scheduler.refresh(name)
+        first = client.get('/api/summary', headers=AUTH)
+        etag = first.headers['ETag']
+        version = scheduler.version
+        # Volatile fields stay in the payload; they are only left out of the ETag
+        data = first.get_json()
+        assert 'cpu' in data['system']
+        assert 'uptime_seconds' in data['gateway'] and 'start_time' in data['gateway']
+
+        collector.system_sampler.sample()
+        for name in ('version', 'gateway', 'system', 'tasks', 'token_usage'):
+            scheduler.refresh(name)
+        assert scheduler.version == version
+        resp = client.get('/api/summary', headers={**AUTH, 'If-None-Match': etag})
+        assert resp.status_code == 304
+
+    def test_conditional_get_returns_304(self, client):
+        """Test unchanged JSON responses revalidate with a 304"""
+        app_module.scheduler.refresh('token_usage')
+        first = client.get('/api/summary', headers=AUTH)
+        etag = first.headers['ETag']
+        assert etag.startswith('W/')
+        assert client.get('/api/summary', headers=AUTH).headers['ETag'] == etag
+
+        resp = client.get('/api/summary', headers={**AUTH, 'If-None-Match': etag})
+        assert resp.status_code == 304
+        assert resp.data == b''
+
+        pricing_etag = client.get('/api/pricing', headers=AUTH).headers['ETag']
+        client.post('/api/pricing/import', headers=AUTH, json={
+            "models": {"bulk-model": {"input_per_1k": 0.1, "output_per_1k": 0.2}}
+        })
+        resp = client.get('/api/pricing', headers={**AUTH, 'If-None-Match': pricing_etag})
+        assert resp.status_code == 200
+
+    def test_gzip_compression(self, client):
+        """Test large JSON responses are gzip-compressed when accepted"""
+        resp = client.get('/api/pricing', headers={**AUTH, 'Accept-Encoding': 'gzip'})
+        assert resp.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in resp.headers['Vary']
+        data = json.loads(gzip.decompress(resp.data))
+        assert data == client.get('/api/pricing', headers=AUTH).get_json()
+
+    def test_metrics_served_from_snapshot(self, client, sessions_dir, monkeypatch):
+        """Test /metrics renders in-memory state without rescanning files"""
+        self.write_session(sessions_dir, 'a.jsonl', [usage_record('gpt-4o', 10, 5)])
+        app_module.scheduler.refresh('token_usage')
+
+        def fail(*args, **kwargs):
+            raise AssertionError("scrape must not scan session files")
+
+        monkeypatch.setattr(app_module.data_collector.session_index, 'refresh', fail)
+        resp = client.get('/metrics', headers=AUTH)
+        assert resp.status_code == 200
+        assert resp.content_type.startswith('text/plain; version=0.0.4')
+        text = resp.get_data(as_text=True)
+        assert 'openclaw_tokens_total{model="gpt-4o"' in text
+        assert 'openclaw_monitor_collector_duration_seconds_bucket{collector="token_usage",le="+Inf"} 1' in text
+
+    def test_server_timing_and_debug_timings(self, client, sessions_dir):
+        """Test instrumented collector calls surface in Server-Timing and debug timings"""
+        self.write_session(sessions_dir, 'a.jsonl', [usage_record('gpt-4o', 10, 5)])
+        resp = client.get('/api/token-usage', headers=AUTH)
+        header = resp.headers['Server-Timing']
+        assert 'token_usage;dur=' in header
+        assert 'session_index.refresh;dur=' in header
+        assert 'total;dur=' in header
+
+        app_module.scheduler.refresh('tasks')
+        header = client.get('/api/summary', headers=AUTH).headers['Server-Timing']
+        assert 'collector.tasks;dur=' in header
+
+        timings = client.get('/api/debug/timings', headers=AUTH).get_json()
+        assert timings['operations']['token_usage']['count'] >= 1
+        assert 'tasks' in timings['collectors']
+
+    def test_profile_mode(self, client):
+        """Test ?profile=1 returns the hottest functions instead of the payload"""
+        data = client.get('/api/token-usage?profile=1', headers=AUTH).get_json()
+        assert data['path'] == '/api/token-usage'
+        assert data['status'] == 200
+        functions = data['profile']['functions']
+        assert functions and any('get_token_usage' in row['function'] for row in functions)
+        assert client.get('/api/token-usage?profile=1').status_code == 401
@@ -0,0 +1,74 @@
+"""
+Tests for archives module
+"""
+
+import os
+import gzip
+import pytest
+import tempfile
+import shutil
+import archives
+from archives import (
+    ArchiveCache, open_archive, strip_archive_suffix, archive_supported, read_archive_lines
+)
+
+
+class TestArchives:
+    """Test cases for archive helpers and ArchiveCache"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def archive(self, temp_dir):
+        path = os.path.join(temp_dir, 'a.jsonl.gz')
+        with gzip.open(path, 'wb') as f:
+            f.write(b'one\ntwo\n')
+        return path
+
+    def test_open_and_names(self, archive):
+        """Test streaming decompression and suffix handling"""
+        with open_archive(archive) as f:
+            assert list(f) == [b'one\n', b'two\n']
+        assert strip_archive_suffix(archive).endswith('a.jsonl')
+        assert strip_archive_suffix('x.log') == 'x.log'
+        assert archive_supported('x.zst') == (archives.zstandard is not None)
+
+    def test_read_archive_lines(self, archive):
+        """Test a page of lines is read from the front or counted back from the end"""
+        assert read_archive_lines(archive, 0, 1) == (2, 0, [b'one'])
+        assert read_archive_lines(archive, 1, 10) == (2, 1, [b'two'])
+        assert read_archive_lines(archive, -1, 10) == (2, 1, [b'two'])
+        assert read_archive_lines(archive, -5, 1) == (2, 0, [b'one'])
+        assert read_archive_lines(archive, 5, 1) == (2, 5, [])
+
+    def test_digest_is_cached_by_stat(self, archive, monkeypatch):
+        """Test the content hash is only recomputed when the file changes"""
+        cache = ArchiveCache()
+        digest = cache.digest(archive, os.stat(archive))
+
+        calls = []
+        monkeypatch.setattr(archives, 'file_digest', lambda path: calls.append(path) or 'new')
+        assert cache.digest(archive, os.stat(archive)) == digest
+        assert calls == []
+
+        with gzip.open(archive, 'wb') as f:
+            f.write(b'changed\n')
+        assert cache.digest(archive, os.stat(archive)) == 'new'
+
+    def test_results_persist_by_content(self, temp_dir, archive):
+        """Test results survive a restart and follow the content, not the path"""
+        state_file = os.path.join(temp_dir, 'state', 'cache.json')
+        cache = ArchiveCache(state_file)
+        digest = cache.digest(archive, os.stat(archive))
+        cache.put('session', digest, {"total": 5})
+        cache.save()
+
+        moved = os.path.join(temp_dir, 'b.jsonl.gz')
+        os.rename(archive, moved)
+        reloaded = ArchiveCache(state_file)
+        assert reloaded.get('session', reloaded.digest(moved, os.stat(moved))) == {"total": 5}
+        assert reloaded.get('log', digest) is None
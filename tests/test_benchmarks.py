@@ -0,0 +1,42 @@
+"""
+Tests for the benchmark helpers
+"""
+
+import os
+import glob
+import pytest
+import tempfile
+import shutil
+from benchmarks.synthetic_home import SyntheticSpec, generate_home
+from benchmarks.run_benchmarks import percentile
+from session_index import SessionIndex
+
+
+class TestSyntheticHome:
+    """Test cases for the synthetic ~/.openclaw generator"""
+
+    @pytest.fixture
+    def root(self):
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def test_generates_requested_layout(self, root):
+        spec = SyntheticSpec(agents=2, sessions_per_agent=3, lines_per_session=40,
+                             log_files=1, log_file_kb=4, active_sessions=1)
+        stats = generate_home(root, spec)
+
+        assert stats['session_files'] == 6
+        assert len(glob.glob(os.path.join(root, '.openclaw', 'agents', '*', 'sessions'))) == 2
+        assert os.path.getsize(os.path.join(stats['log_dir'], 'openclaw-0.log')) >= 4096
+
+        sessions_dir = os.path.join(root, '.openclaw', 'agents', 'main', 'sessions')
+        cursors = SessionIndex(workers=1).refresh(sessions_dir)
+        assert sum(c['total'] for c in cursors.values()) > 0
+        assert set().union(*(c['models'] for c in cursors.values())) <= set(spec.models)
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        assert percentile(samples, 50) == 50
+        assert percentile(samples, 99) == 99
+        assert percentile([5.0], 99) == 5.0
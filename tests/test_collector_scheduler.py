@@ -0,0 +1,127 @@
+"""
+Tests for collector_scheduler module
+"""
+
+import time
+import pytest
+from collector_scheduler import CollectorScheduler
+
+
+class TestCollectorScheduler:
+    """Test cases for CollectorScheduler"""
+
+    @pytest.fixture
+    def scheduler(self):
+        scheduler = CollectorScheduler()
+        yield scheduler
+        scheduler.stop()
+
+    def test_refresh_publishes_snapshot(self, scheduler):
+        """Test a refresh publishes data with timing metadata"""
+        scheduler.register('answer', lambda: {"value": 42}, 60)
+        assert scheduler.get('answer') is None
+
+        scheduler.refresh('answer')
+        entry = scheduler.get('answer')
+        assert entry['data'] == {"value": 42}
+        assert entry['error'] is None
+        assert entry['updated_at'] <= time.time()
+
+    def test_snapshot_is_immutable(self, scheduler):
+        """Test published snapshots are never modified in place"""
+        counter = iter(range(100))
+        scheduler.register('count', lambda: next(counter), 60)
+        scheduler.refresh('count')
+        first = scheduler.snapshot()
+
+        scheduler.refresh('count')
+        assert first['count']['data'] == 0
+        assert scheduler.snapshot()['count']['data'] == 1
+        with pytest.raises(TypeError):
+            first['count'] = None
+
+    def test_failure_keeps_previous_data(self, scheduler):
+        """Test a failing collector keeps its last good data"""
+        results = [{"ok": True}]
+
+        def flaky():
+            if not results:
+                raise RuntimeError("boom")
+            return results.pop()
+
+        scheduler.register('flaky', flaky, 60)
+        scheduler.refresh('flaky')
+        scheduler.refresh('flaky')
+
+        entry = scheduler.get('flaky')
+        assert entry['data'] == {"ok": True}
+        assert entry['error'] == "boom"
+
+    def test_background_threads(self, scheduler):
+        """Test collectors run on their own intervals in the background"""
+        calls = {"fast": 0, "slow": 0}
+
+        def make(name):
+            def collect():
+                calls[name] += 1
+                return calls[name]
+            return collect
+
+        scheduler.register('fast', make('fast'), 0.01)
+        scheduler.register('slow', make('slow'), 60)
+        scheduler.start()
+        scheduler.start()
+
+        deadline = time.time() + 2
+        while calls['fast'] < 5 and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert calls['fast'] >= 5
+        assert calls['slow'] == 1
+
+    def test_version_bumps_only_on_change(self, scheduler):
+        """Test identical refreshes do not wake change waiters"""
+        values = [{"n": 1}, {"n": 1}, {"n": 2}]
+        scheduler.register('value', lambda: values.pop(0), 60)
+
+        scheduler.refresh('value')
+        version = scheduler.wait_for_change(None)
+        scheduler.refresh('value')
+        assert scheduler.wait_for_change(version, timeout=0.01) == version
+
+        scheduler.refresh('value')
+        assert scheduler.wait_for_change(version, timeout=0.01) == version + 1
+
+    def test_fingerprint_and_notify(self, scheduler):
+        """Test volatile fields and unpublished collectors do not bump the version"""
+        scheduler.register('stamped', lambda: {"n": 1, "sampled_at": time.time()}, 60,
+                           fingerprint=lambda data: data["n"])
+        scheduler.register('quiet', lambda: time.time(), 60, notify=False)
+        scheduler.refresh('stamped')
+        version = scheduler.wait_for_change(None)
+        changed_at = scheduler.get('stamped')['changed_at']
+
+        scheduler.refresh('stamped')
+        scheduler.refresh('quiet')
+        scheduler.refresh('quiet')
+        assert scheduler.wait_for_change(version, timeout=0.01) == version
+        assert scheduler.get('stamped')['changed_at'] == changed_at
+        assert scheduler.get('quiet')['data'] is not None
+
+    def test_wait_for_change_wakes_on_publish(self, scheduler):
+        """Test a waiter is woken by a background publish"""
+        scheduler.register('tick', lambda: time.time(), 0.01)
+        version = scheduler.wait_for_change(None)
+        scheduler.start()
+        assert scheduler.wait_for_change(version, timeout=2) != version
+
+    def test_trigger_wakes_collector_early(self, scheduler):
+        """Test trigger() runs a collector before its interval elapses"""
+        calls = []
+        scheduler.register('slow', lambda: calls.append(1) or len(calls), 60)
+        scheduler.start()
+        version = scheduler.wait_for_change(0, timeout=2)
+
+        scheduler.trigger('slow')
+        assert scheduler.wait_for_change(version, timeout=2) != version
+        assert len(calls) == 2
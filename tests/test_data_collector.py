@@ -0,0 +1,314 @@
+"""
+Tests for data_collector module
+"""
+
+import os
+import json
+import time
+import socket
+import psutil
+import pytest
+import tempfile
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from data_collector import OpenClawCollector
+
+
+class TestOpenClawCollector:
+    """Test cases for OpenClawCollector"""
+
+    @pytest.fixture
+    def home_dir(self, monkeypatch):
+        """Create temporary home directory"""
+        temp_dir = tempfile.mkdtemp()
+        monkeypatch.setenv('HOME', temp_dir)
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def sessions_dir(self, home_dir):
+        path = os.path.join(home_dir, '.openclaw', 'agents', 'main', 'sessions')
+        os.makedirs(path)
+        return path
+
+    @pytest.fixture
+    def collector(self, home_dir, sessions_dir):
+        return OpenClawCollector()
+
+    def write_session(self, sessions_dir, name, records, age_seconds=0):
+        path = os.path.join(sessions_dir, name)
+        with open(path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        mtime = time.time() - age_seconds
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_running_tasks_status_and_model(self, collector, sessions_dir):
+        """Test running/completed classification and model lookup"""
+        filler = [{"type": "message", "message": {"role": "user", "content": "x" * 500}}] * 50
+        self.write_session(sessions_dir, 'active-session.jsonl', [
+            {"type": "model_change", "modelId": "gpt-4o-mini"},
+            {"type": "model_change", "modelId": "gpt-4o"},
+        ] + filler)
+        self.write_session(sessions_dir, 'done-session.jsonl',
+                           [{"type": "model_change", "modelId": "gpt-4o"}], 7200)
+        self.write_session(sessions_dir, 'old-session.jsonl',
+                           [{"type": "model_change", "modelId": "gpt-4o"}], 3 * 86400)
+
+        tasks = collector.get_running_tasks()
+        assert tasks['running'] == 1
+        assert tasks['completed_24h'] == 1
+        assert tasks['tasks'][0]['id'] == 'active-s'
+        assert tasks['tasks'][0]['model'] == 'gpt-4o'
+
+    def test_running_tasks_huge_last_line(self, collector, sessions_dir, monkeypatch):
+        """Test a last record bigger than the tail cap keeps the session and its model"""
+        monkeypatch.setattr(OpenClawCollector, 'TASK_TAIL_MAX_BYTES', 1024)
+        path = self.write_session(sessions_dir, 'big-session.jsonl', [
+            {"type": "model_change", "modelId": "gpt-4o"},
+            {"type": "message", "message": {"role": "user", "content": "x" * 4096}},
+        ])
+        collector._get_session_index('main').refresh(sessions_dir, [path])
+
+        tasks = collector.get_running_tasks()
+        assert tasks['running'] == 1
+        assert tasks['tasks'][0]['model'] == 'gpt-4o'
+
+    def test_running_tasks_skip_invalid_last_line(self, collector, sessions_dir):
+        """Test sessions whose last record is not valid JSON are skipped"""
+        path = self.write_session(sessions_dir, 'broken.jsonl',
+                                  [{"type": "model_change", "modelId": "gpt-4o"}])
+        with open(path, 'a') as f:
+            f.write('{"type": "mess')
+
+        tasks = collector.get_running_tasks()
+        assert tasks['running'] == 0
+        assert tasks['completed_24h'] == 0
+
+    def test_multiple_agents(self, collector, home_dir, sessions_dir, monkeypatch):
+        """Test every agent is discovered, broken down and filterable"""
+        usage = {"type": "message", "message": {
+            "role": "assistant", "model": "gpt-4o", "usage": {"input": 100, "output": 10}
+        }}
+        other_dir = os.path.join(home_dir, '.openclaw', 'agents', 'coder', 'sessions')
+        os.makedirs(other_dir)
+        os.makedirs(os.path.join(home_dir, '.openclaw', 'agents', 'no-sessions'))
+        self.write_session(sessions_dir, 'main-session.jsonl', [usage])
+        self.write_session(other_dir, 'coder-session.jsonl', [usage, usage])
+
+        assert collector.discover_agents() == ['main', 'coder']
+
+        tasks = collector.get_running_tasks()
+        assert tasks['running'] == 2
+        assert {t['agent'] for t in tasks['tasks']} == {'main', 'coder'}
+        assert collector.get_running_tasks('coder')['running'] == 1
+
+        data = collector.get_token_usage()
+        agents = {a['agent']: a for a in data['agents']}
+        assert agents['coder']['input'] == 200
+        assert agents['main']['input'] == 100
+        assert agents['coder']['sessions'] == 1
+        assert data['week']['input'] == 300
+
+        # Filtering by agent only refreshes that agent's index
+        refreshed = []
+        main_refresh = collector.session_indexes['main'].refresh
+        monkeypatch.setattr(collector.session_indexes['main'], 'refresh',
+                            lambda *args: refreshed.append(args) or main_refresh(*args))
+        coder = collector.get_token_usage(agent='coder')
+        assert refreshed == []
+        assert coder['week']['input'] == 200
+        assert [a['agent'] for a in coder['agents']] == ['coder']
+
+    def test_gateway_port_configuration(self, home_dir, monkeypatch):
+        """Test the gateway port comes from env, then openclaw.json"""
+        config_dir = os.path.join(home_dir, '.openclaw')
+        os.makedirs(config_dir, exist_ok=True)
+        with open(os.path.join(config_dir, 'openclaw.json'), 'w') as f:
+            json.dump({"gateway": {"port": 19000}}, f)
+        assert OpenClawCollector().gateway_port == 19000
+
+        monkeypatch.setenv('OPENCLAW_GATEWAY_PORT', '19001')
+        assert OpenClawCollector().gateway_port == 19001
+
+    def test_gateway_pid_is_cached(self, home_dir, monkeypatch):
+        """Test the gateway process is discovered once and then revalidated"""
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        port = listener.getsockname()[1]
+        pidfile = os.path.join(home_dir, 'gateway.pid')
+        with open(pidfile, 'w') as f:
+            f.write(str(os.getpid()))
+        monkeypatch.setenv('OPENCLAW_GATEWAY_PORT', str(port))
+        monkeypatch.setenv('OPENCLAW_GATEWAY_PIDFILE', pidfile)
+
+        try:
+            collector = OpenClawCollector()
+            status = collector.get_gateway_status()
+            assert status['online'] is True
+            assert status['port'] == port
+            assert status['pid'] == os.getpid()
+            assert 0 < status['start_time'] <= time.time()
+            assert status['uptime_seconds'] > 0
+
+            def no_scan(*args, **kwargs):
+                raise AssertionError("full process scan on cached lookup")
+
+            monkeypatch.setattr(psutil, 'net_connections', no_scan)
+            monkeypatch.setattr(psutil, 'process_iter', no_scan)
+            os.remove(pidfile)
+            assert collector.get_gateway_status()['pid'] == os.getpid()
+        finally:
+            listener.close()
+
+    def test_gateway_offline(self, home_dir, monkeypatch):
+        """Test a closed port reports offline without repeated rescans"""
+        probe = socket.socket()
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+        probe.close()
+        monkeypatch.setenv('OPENCLAW_GATEWAY_PORT', str(port))
+        monkeypatch.setattr(OpenClawCollector, '_find_gateway_process', lambda self: None)
+
+        collector = OpenClawCollector()
+        assert collector.get_gateway_status()['online'] is False
+        last_scan = collector._gateway_last_scan
+        collector.get_gateway_status()
+        assert collector._gateway_last_scan == last_scan
+
+    def test_summary_deadline_returns_partial_results(self, collector, monkeypatch):
+        """Test a slow section times out without blocking the rest of the summary"""
+        release = threading.Event()
+        calls = []
+
+        def slow_gateway():
+            calls.append(1)
+            if len(calls) > 1:
+                release.wait(5)
+            return {"online": len(calls) == 1}
+
+        monkeypatch.setattr(collector, 'get_gateway_status', slow_gateway)
+        monkeypatch.setattr(collector, 'get_openclaw_version', lambda: {"current": "1.0"})
+
+        first = collector.get_summary()
+        assert first['gateway'] == {"online": True}
+        assert first['sections']['gateway'] == {"timed_out": False, "stale": False, "error": None}
+
+        started = time.time()
+        second = collector.get_summary(deadlines={"gateway": 0.1})
+        assert time.time() - started < 3
+        assert second['gateway'] == {"online": True}
+        assert second['sections']['gateway']['timed_out'] is True
+        assert second['sections']['gateway']['stale'] is True
+        assert second['version'] == {"current": "1.0"}
+        assert second['sections']['version']['timed_out'] is False
+
+        # The still-running call is reused rather than piling up a new one
+        collector.get_summary(deadlines={"gateway": 0.1})
+        assert len(calls) == 2
+        release.set()
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the npm registry"""
+
+    hits = []
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        body = json.dumps({"version": "9.9.9"}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestVersionCheck:
+    """Test cases for cached OpenClaw version checks"""
+
+    @pytest.fixture
+    def registry(self):
+        RegistryHandler.hits = []
+        server = HTTPServer(('127.0.0.1', 0), RegistryHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def home_dir(self, monkeypatch):
+        temp_dir = tempfile.mkdtemp()
+        monkeypatch.setenv('HOME', temp_dir)
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def fake_binary(self, home_dir, monkeypatch):
+        """Put a fake `openclaw` on PATH that logs each invocation"""
+        bin_dir = os.path.join(home_dir, 'bin')
+        os.makedirs(bin_dir)
+        path = os.path.join(bin_dir, 'openclaw')
+        with open(path, 'w') as f:
+            f.write('#!/bin/sh\necho x >> "$(dirname "$0")/calls"\necho 1.2.3\n')
+        os.chmod(path, 0o755)
+        monkeypatch.setenv('PATH', bin_dir + os.pathsep + os.environ.get('PATH', ''))
+        return path
+
+    def wait_for(self, predicate, timeout=2.0):
+        deadline = time.time() + timeout
+        while not predicate() and time.time() < deadline:
+            time.sleep(0.01)
+        return predicate()
+
+    def test_latest_version_ttl_cache(self, home_dir, registry, monkeypatch):
+        """Test the registry is queried in the background and cached for the TTL"""
+        monkeypatch.setenv('OPENCLAW_NPM_REGISTRY', registry)
+        collector = OpenClawCollector()
+
+        first = collector.get_openclaw_version()
+        assert first['latest'] == 'unknown'
+        assert self.wait_for(lambda: collector._latest_checked is not None)
+
+        for _ in range(5):
+            info = collector.get_openclaw_version()
+        assert info['latest'] == '9.9.9'
+        assert RegistryHandler.hits == ['/openclaw/latest']
+
+        collector.version_check_ttl = 0
+        collector.get_openclaw_version()
+        assert self.wait_for(lambda: len(RegistryHandler.hits) == 2)
+
+    def test_offline_mode(self, home_dir, registry, monkeypatch):
+        """Test offline mode never touches the network"""
+        monkeypatch.setenv('OPENCLAW_NPM_REGISTRY', registry)
+        monkeypatch.setenv('MONITOR_OFFLINE', '1')
+        collector = OpenClawCollector()
+
+        info = collector.get_openclaw_version()
+        time.sleep(0.1)
+        assert info['offline'] is True
+        assert info['latest'] == 'unknown'
+        assert RegistryHandler.hits == []
+
+    def test_local_version_cached_by_mtime(self, home_dir, fake_binary, monkeypatch):
+        """Test `openclaw --version` only reruns when the binary changes"""
+        monkeypatch.setenv('MONITOR_OFFLINE', '1')
+        collector = OpenClawCollector()
+        calls = os.path.join(os.path.dirname(fake_binary), 'calls')
+
+        assert collector.get_openclaw_version()['current'] == '1.2.3'
+        collector.get_openclaw_version()
+        assert open(calls).read().count('x') == 1
+
+        new_mtime = os.path.getmtime(fake_binary) + 10
+        os.utime(fake_binary, (new_mtime, new_mtime))
+        collector.get_openclaw_version()
+        assert open(calls).read().count('x') == 2
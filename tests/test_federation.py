@@ -0,0 +1,198 @@
+"""
+Tests for federation module
+"""
+
+import json
+import time
+import pytest
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from federation import (
+    FederationClient, parse_peers, merge_summaries, merge_tasks, merge_token_usage
+)
+
+
+class PeerHandler(BaseHTTPRequestHandler):
+    """A stand-in monitor instance serving canned API responses"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        peer = self.server.peer
+        peer['hits'].append(self.path)
+        if peer['delay']:
+            time.sleep(peer['delay'])
+        path = self.path.split('?')[0]
+        if path not in peer['routes']:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        etag = f'W/"{peer["version"]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps(peer['routes'][path]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def usage(total_input, model='gpt-4o', currency='CNY'):
+    tokens = {"input": total_input, "output": 10, "total": total_input + 10, "cost": 0.5}
+    return {
+        "today": {**tokens, "models": {model: dict(tokens)}},
+        "week": {**tokens, "models": {model: dict(tokens)}},
+        "month": {**tokens, "models": {model: dict(tokens)}},
+        "daily": [{"date": "2026-03-01", **tokens, "models": {model: dict(tokens)}}],
+        "models": [{"model": model, **tokens}],
+        "total_sessions": 2,
+        "currency": currency
+    }
+
+
+class TestFederation:
+    """Test cases for FederationClient against local peer instances"""
+
+    @pytest.fixture
+    def peers(self):
+        servers = []
+
+        def start(name, running, total_input):
+            server = ThreadingHTTPServer(('127.0.0.1', 0), PeerHandler)
+            server.daemon_threads = True
+            server.peer = {
+                "hits": [], "delay": 0, "version": 1,
+                "routes": {
+                    "/api/tasks": {
+                        "running": running, "completed_24h": 1,
+                        "tasks": [{"id": f"{name}-1", "last_active": "2026-03-01T10:00:00"}]
+                    },
+                    "/api/token-usage": usage(total_input),
+                    "/api/summary": {
+                        "gateway": {"online": True},
+                        "tasks": {"running": running},
+                        "token_usage": usage(total_input),
+                        "errors": [],
+                        "system": {"cpu": {"percent": running * 10}, "memory": {"percent": 50}}
+                    }
+                }
+            }
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            servers.append(server)
+            return name, f"http://127.0.0.1:{server.server_address[1]}", server.peer
+
+        yield [start('a', 1, 100), start('b', 2, 200)]
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    @pytest.fixture
+    def client(self, peers):
+        client = FederationClient([(name, url) for name, url, _ in peers],
+                                  timeout=0.5, cache_ttl=60)
+        yield client
+        client.close()
+
+    def test_parse_peers(self):
+        """Test named and unnamed peer specs"""
+        assert parse_peers("web=http://10.0.0.2:8081/, http://10.0.0.3:8081") == [
+            ("web", "http://10.0.0.2:8081"),
+            ("10.0.0.3:8081", "http://10.0.0.3:8081"),
+        ]
+        with pytest.raises(ValueError):
+            parse_peers("x=http://a, x=http://b")
+
+    def test_merges_fleet_views(self, client):
+        """Test tasks and token usage are merged with a per-host breakdown"""
+        tasks = merge_tasks(client.fetch('/api/tasks'))
+        assert tasks['running'] == 3
+        assert {t['host'] for t in tasks['tasks']} == {'a', 'b'}
+        assert [h['host'] for h in tasks['hosts']] == ['a', 'b']
+
+        usage = merge_token_usage(client.fetch('/api/token-usage?days=7'))
+        assert usage['week']['input'] == 300
+        assert usage['week']['models']['gpt-4o']['input'] == 300
+        assert usage['models'][0]['total'] == 320
+        assert usage['daily'][0]['input'] == 300
+        assert usage['total_sessions'] == 4
+        assert usage['week']['cost'] == 1.0
+        assert usage['currency'] == 'CNY'
+
+        summary = merge_summaries(client.fetch('/api/summary'))
+        assert summary['hosts_reachable'] == 2
+        assert summary['gateways_online'] == 2
+        assert summary['running_tasks'] == 3
+        assert [h['cpu_percent'] for h in summary['hosts']] == [10, 20]
+
+    def test_costs_are_not_summed_across_currencies(self):
+        """Test peers priced in different currencies keep separate cost totals"""
+        results = {
+            'a': {"data": usage(100, currency='CNY'), "stale": False, "error": None,
+                  "fetched_at": 0, "latency_ms": 1},
+            'b': {"data": usage(200, currency='USD'), "stale": False, "error": None,
+                  "fetched_at": 0, "latency_ms": 1},
+        }
+        merged = merge_token_usage(results)
+        assert merged['week']['input'] == 300
+        assert merged['week']['cost'] is None
+        assert merged['week']['costs'] == {'CNY': 0.5, 'USD': 0.5}
+        assert merged['week']['models']['gpt-4o']['cost'] is None
+        assert merged['models'][0]['costs'] == {'CNY': 0.5, 'USD': 0.5}
+        assert merged['currency'] is None
+        assert merged['currencies'] == ['CNY', 'USD']
+        assert [h['currency'] for h in merged['hosts']] == ['CNY', 'USD']
+
+    def test_cache_and_conditional_requests(self, client, peers):
+        """Test fresh results are cached and expired ones revalidated with ETags"""
+        _, _, peer = peers[0]
+        client.fetch('/api/tasks')
+        client.fetch('/api/tasks')
+        assert len(peer['hits']) == 1
+
+        client.cache_ttl = 0
+        result = client.fetch('/api/tasks', ['a'])['a']
+        assert len(peer['hits']) == 2
+        assert result['data']['running'] == 1
+        assert result['stale'] is False
+
+    def test_unreachable_peer_degrades_to_stale(self, client, peers):
+        """Test a slow or down peer returns cached data without delaying others"""
+        client.fetch('/api/tasks')
+        client.cache_ttl = 0
+        _, _, slow = peers[1]
+        slow['delay'] = 2
+
+        started = time.time()
+        results = client.fetch('/api/tasks')
+        assert time.time() - started < 1.5
+        assert results['a']['stale'] is False
+        assert results['b']['stale'] is True
+        assert results['b']['data']['running'] == 2
+
+        merged = merge_tasks(results)
+        assert merged['running'] == 3
+        assert merged['hosts'][1]['error'] is not None
+
+    def test_peer_without_data(self, peers):
+        """Test a peer that never answered is reported with no data"""
+        client = FederationClient([('a', peers[0][1]), ('down', 'http://127.0.0.1:9')],
+                                  timeout=0.5)
+        try:
+            results = client.fetch('/api/summary')
+            assert results['down']['data'] is None
+            assert results['down']['stale'] is True
+            summary = merge_summaries(results)
+            assert summary['hosts_total'] == 2
+            assert summary['hosts_reachable'] == 1
+        finally:
+            client.close()
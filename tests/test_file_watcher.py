@@ -0,0 +1,88 @@
+"""
+Tests for file_watcher module
+"""
+
+import os
+import time
+import threading
+import pytest
+import tempfile
+import shutil
+from file_watcher import FileWatcher
+
+
+class TestFileWatcher:
+    """Test cases for FileWatcher with both backends"""
+
+    @pytest.fixture
+    def root(self):
+        temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(temp_dir, 'agents', 'main', 'sessions'))
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture(params=[True, False], ids=['inotify', 'polling'])
+    def watcher(self, request, root):
+        watcher = FileWatcher(use_inotify=request.param)
+        watcher.POLL_INTERVAL = 0.05
+        watcher.DEBOUNCE = 0.05
+        watcher.RESCAN_INTERVAL = 0.1
+        watcher.watch(os.path.join(root, 'agents', '*', 'sessions'), 'sessions', '.jsonl')
+        self.notified = threading.Event()
+        self.groups = set()
+
+        def on_change(groups):
+            self.groups |= groups
+            self.notified.set()
+
+        watcher.on_change = on_change
+        yield watcher
+        watcher.stop()
+
+    def wait_for_notification(self):
+        assert self.notified.wait(3)
+        self.notified.clear()
+
+    def test_not_running_requires_full_scan(self, watcher, root):
+        """Test take_dirty returns None until the watcher is running"""
+        assert watcher.take_dirty(os.path.join(root, 'agents', 'main', 'sessions')) is None
+
+    def test_marks_changed_files(self, watcher, root):
+        """Test writes mark exactly the changed files dirty and notify the group"""
+        sessions = os.path.join(root, 'agents', 'main', 'sessions')
+        watcher.start()
+        self.wait_for_notification()
+        # A newly watched directory needs one full scan first
+        assert watcher.take_dirty(sessions) is None
+        assert watcher.take_dirty(sessions) == set()
+
+        path = os.path.join(sessions, 'a.jsonl')
+        with open(path, 'w') as f:
+            f.write('{}\n')
+        with open(os.path.join(sessions, 'ignored.tmp'), 'w') as f:
+            f.write('x')
+
+        self.wait_for_notification()
+        assert self.groups == {'sessions'}
+        assert watcher.take_dirty(sessions) == {path}
+        assert watcher.take_dirty(sessions) == set()
+
+    def test_discovers_new_directories(self, watcher, root):
+        """Test directories matching the pattern later are picked up"""
+        watcher.start()
+        self.wait_for_notification()
+
+        sessions = os.path.join(root, 'agents', 'other', 'sessions')
+        os.makedirs(sessions)
+        deadline = time.time() + 3
+        while watcher.take_dirty(sessions) is None and time.time() < deadline:
+            time.sleep(0.05)
+
+        path = os.path.join(sessions, 'b.jsonl')
+        with open(path, 'w') as f:
+            f.write('{}\n')
+        dirty = set()
+        while path not in dirty and time.time() < deadline:
+            time.sleep(0.05)
+            dirty |= watcher.take_dirty(sessions)
+        assert path in dirty
@@ -0,0 +1,74 @@
+"""
+Tests for line_index module
+"""
+
+import os
+import pytest
+import tempfile
+import shutil
+from line_index import LineIndex, LineIndexCache
+
+
+class TestLineIndex:
+    """Test cases for LineIndex"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def path(self, temp_dir):
+        path = os.path.join(temp_dir, 'session.jsonl')
+        with open(path, 'w') as f:
+            for i in range(1000):
+                f.write(f'{{"n": {i}}}\n')
+        return path
+
+    def test_random_access(self, path):
+        """Test any page is read straight from its offsets"""
+        index = LineIndex(path)
+        total, lines = index.read(500, 3)
+        assert total == 1000
+        assert lines == [b'{"n": 500}', b'{"n": 501}', b'{"n": 502}']
+        assert index.read(998, 10)[1] == [b'{"n": 998}', b'{"n": 999}']
+        assert index.read(1000, 10)[1] == []
+
+    def test_incremental_extension(self, path):
+        """Test appended lines extend the index and partial lines wait"""
+        index = LineIndex(path)
+        assert index.update() == 1000
+        end = index.end
+
+        with open(path, 'a') as f:
+            f.write('{"n": 1000}\n{"n": 10')
+        assert index.update() == 1001
+        assert index.starts[1000] == end
+        with open(path, 'a') as f:
+            f.write('01}\n')
+        assert index.read(1001, 5)[1] == [b'{"n": 1001}']
+
+    def test_truncation_rebuilds(self, path):
+        """Test a truncated or rewritten file is reindexed from scratch"""
+        index = LineIndex(path)
+        index.update()
+        with open(path, 'w') as f:
+            f.write('a\nb\n')
+        assert index.read(0, 10) == (2, [b'a', b'b'])
+
+    def test_empty_file(self, temp_dir):
+        """Test an empty file has no lines"""
+        path = os.path.join(temp_dir, 'empty.jsonl')
+        open(path, 'w').close()
+        assert LineIndex(path).read(0, 10) == (0, [])
+
+    def test_cache_evicts_least_recently_used(self, temp_dir):
+        """Test the cache keeps at most max_files indexes"""
+        cache = LineIndexCache(max_files=2)
+        a = cache.get('a')
+        cache.get('b')
+        cache.get('a')
+        cache.get('c')
+        assert cache.get('a') is a
+        assert list(cache._indexes) == ['c', 'a']
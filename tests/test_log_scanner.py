@@ -0,0 +1,118 @@
+"""
+Tests for log_scanner module
+"""
+
+import os
+import gzip
+import pytest
+import tempfile
+import shutil
+import log_scanner
+from log_scanner import LogScanner
+from archives import ArchiveCache
+
+
+class TestLogScanner:
+    """Test cases for LogScanner"""
+
+    @pytest.fixture
+    def logs_dir(self):
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def scanner(self):
+        return LogScanner()
+
+    def write(self, path, text, mode='a'):
+        with open(path, mode) as f:
+            f.write(text)
+
+    def test_counts_and_levels(self, logs_dir, scanner):
+        """Test matching lines are counted with the right level"""
+        path = os.path.join(logs_dir, 'gateway.log')
+        self.write(path, 'ok\nERROR: db down\nrequest Timeout\nERROR: db down\n')
+
+        scanner.refresh([path])
+        errors = scanner.top_errors()
+        assert errors[0] == {
+            "message": "ERROR: db down", "count": 2,
+            "time": errors[0]["time"], "level": "error"
+        }
+        assert errors[1]["message"] == "request Timeout"
+        assert errors[1]["level"] == "warning"
+
+        counts = scanner.pattern_counts()
+        assert counts["error"] == 2
+        assert counts["timeout"] == 1
+        assert counts["refused"] == 0
+
+    def test_only_appended_bytes_are_scanned(self, logs_dir, scanner):
+        """Test a refresh only processes data appended since the last one"""
+        path = os.path.join(logs_dir, 'gateway.log')
+        self.write(path, 'ERROR one\n')
+        scanner.refresh([path])
+
+        # Overwrite the already-scanned prefix: a full rescan would see it
+        with open(path, 'r+') as f:
+            f.write('xxxxxxxxx')
+        self.write(path, 'ERROR two\npartial fail')
+        scanner.refresh([path])
+
+        messages = {e["message"]: e["count"] for e in scanner.top_errors()}
+        assert messages == {"ERROR one": 1, "ERROR two": 1}
+
+        self.write(path, 'ure\n')
+        scanner.refresh([path])
+        messages = {e["message"] for e in scanner.top_errors()}
+        assert "partial failure" in messages
+
+    def test_truncation_and_deletion(self, logs_dir, scanner):
+        """Test truncated files restart and deleted files are forgotten"""
+        path = os.path.join(logs_dir, 'gateway.log')
+        self.write(path, 'ERROR one\n' * 5)
+        scanner.refresh([path])
+
+        self.write(path, 'ERROR two\n', mode='w')
+        scanner.refresh([path])
+        assert [(e["message"], e["count"]) for e in scanner.top_errors()] == [("ERROR two", 1)]
+
+        os.remove(path)
+        scanner.refresh([])
+        assert scanner.top_errors() == []
+
+    def test_merges_files_and_limits(self, logs_dir, scanner):
+        """Test counts merge across files and the result is limited"""
+        a = os.path.join(logs_dir, 'a.log')
+        b = os.path.join(logs_dir, 'b.log')
+        self.write(a, ''.join(f'error {i}\n' for i in range(20)) + 'error same\n')
+        self.write(b, 'error same\n')
+
+        scanner.refresh([a, b])
+        errors = scanner.top_errors(limit=10)
+        assert len(errors) == 10
+        assert errors[0]["message"] == "error same"
+        assert errors[0]["count"] == 2
+
+    def test_rotated_archives(self, logs_dir, monkeypatch):
+        """Test gzip-rotated logs are counted and cached by content"""
+        path = os.path.join(logs_dir, 'gateway.log.1.gz')
+        with gzip.open(path, 'wb') as f:
+            f.write(b'ERROR: disk full\nok\nERROR: disk full')
+
+        cache_file = os.path.join(logs_dir, 'state', 'archives.json')
+        scanner = LogScanner(archive_cache=ArchiveCache(cache_file))
+        scanner.refresh([path])
+        assert scanner.top_errors()[0]["count"] == 2
+        assert os.path.exists(cache_file)
+
+        def fail(path):
+            raise AssertionError('archive decompressed again')
+        monkeypatch.setattr(log_scanner, 'open_archive', fail)
+
+        restarted = LogScanner(archive_cache=ArchiveCache(cache_file))
+        restarted.refresh([path])
+        restarted.refresh([path])
+        assert restarted.top_errors()[0]["count"] == 2
+        assert restarted.pattern_counts()["error"] == 2
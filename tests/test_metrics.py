@@ -0,0 +1,95 @@
+"""
+Tests for metrics module
+"""
+
+import time
+from types import MappingProxyType
+from metrics import (
+    Histogram, TimingRegistry, TIMINGS, begin_request_timings, end_request_timings,
+    escape_label, render_metrics, timed
+)
+
+
+def entry(data):
+    return MappingProxyType({"data": data, "updated_at": 1700000000.5})
+
+
+class TestHistogram:
+    """Test cases for Histogram"""
+
+    def test_cumulative_buckets(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        buckets, total, count = histogram.snapshot()
+        assert buckets == [("0.1", 2), ("1", 3), ("+Inf", 4)]
+        assert total == 3.65
+        assert count == 4
+
+
+class TestRenderMetrics:
+    """Test cases for render_metrics"""
+
+    def test_exposition_format(self):
+        """Test snapshot sections become labelled samples"""
+        snapshot = {
+            "gateway": entry({"online": True, "start_time": time.time() - 12.5}),
+            "tasks": entry({"running": 2, "completed_24h": 5}),
+            "token_usage": entry({
+                "daily": [{"date": "2026-01-01", "models": {
+                    "gpt-4o": {"input": 100, "output": 40, "total": 140}
+                }}],
+                "total_sessions": 3
+            }),
+        }
+        histogram = Histogram()
+        histogram.observe(0.02)
+
+        text = render_metrics(snapshot, {"tasks": histogram}, {"tasks": 1},
+                              error_patterns={"timeout": 4})
+        lines = text.splitlines()
+
+        assert "# TYPE openclaw_tokens_total counter" in lines
+        assert 'openclaw_tokens_total{model="gpt-4o",day="2026-01-01",type="input"} 100' in lines
+        assert "openclaw_gateway_up 1" in lines
+        uptime = next(line for line in lines if line.startswith("openclaw_gateway_uptime_seconds "))
+        assert 12.5 <= float(uptime.split()[1]) < 60
+        assert "openclaw_tasks_running 2" in lines
+        assert "# TYPE openclaw_log_errors_7d gauge" in lines
+        assert 'openclaw_log_errors_7d{pattern="timeout"} 4' in lines
+        assert 'openclaw_monitor_collector_duration_seconds_count{collector="tasks"} 1' in lines
+        assert 'openclaw_monitor_collector_failures_total{collector="tasks"} 1' in lines
+        # Sections that were never collected are simply absent
+        assert "openclaw_system_cpu_percent" not in text
+
+    def test_escape_label(self):
+        assert escape_label('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+
+class TestTimings:
+    """Test cases for the timing registry and @timed"""
+
+    def test_rolling_summary(self):
+        registry = TimingRegistry(window=3)
+        for seconds in (0.001, 0.002, 0.003, 0.004):
+            registry.record('op', seconds)
+
+        summary = registry.summary()['op']
+        assert summary['count'] == 4
+        assert summary['max_ms'] == 4.0
+        assert summary['p50_ms'] == 3.0
+        assert summary['last_ms'] == 4.0
+
+    def test_timed_records_request_entries(self):
+        @timed('test.op')
+        def op():
+            return 42
+
+        assert op() == 42
+        begin_request_timings()
+        op()
+        entries = end_request_timings()
+        assert [name for name, _ in entries] == ['test.op']
+        assert end_request_timings() == []
+        assert TIMINGS.summary()['test.op']['count'] == 2
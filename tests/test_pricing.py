@@ -7,6 +7,7 @@ import json
 import pytest
 import tempfile
 import shutil
+import time
 from pricing_manager import PricingManager
 
 
@@ -26,7 +27,9 @@ class TestPricingManager:
         monkeypatch.setattr(PricingManager, 'CONFIG_DIR', temp_config_dir)
         monkeypatch.setattr(PricingManager, 'CONFIG_FILE', 
                           os.path.join(temp_config_dir, 'pricing.json'))
-        return PricingManager()
+        manager = PricingManager()
+        yield manager
+        manager.close()
     
     def test_default_config_creation(self, pricing_manager):
         """Test default config is created"""
@@ -104,3 +107,128 @@ class TestPricingManager:
         # Verify deletion
         pricing = pricing_manager.get_model_pricing('temp-model')
         assert pricing == pricing_manager.get_model_pricing('default')
+    
+    def test_calculate_costs_batch(self, pricing_manager):
+        """Test batch costing matches per-call costing"""
+        items = [
+            ('moonshot/kimi-k2.5', 1000, 500),
+            ('gpt-4o', 2000, 100),
+            ('moonshot/kimi-k2.5', 10, 10),
+            ('unknown-model', 1000, 1000),
+        ]
+        batch = pricing_manager.calculate_costs(items)
+        assert batch == [pricing_manager.calculate_cost(*item) for item in items]
+        assert batch[1]['original_currency'] == 'USD'
+    
+    def test_model_resolution_is_deterministic(self, pricing_manager):
+        """Test fuzzy lookups pick the most specific configured model"""
+        models = pricing_manager.config['models']
+        assert pricing_manager.get_model_pricing('kimi-k2') is models['moonshot/kimi-k2']
+        assert pricing_manager.get_model_pricing('kimi-k2.5') is models['moonshot/kimi-k2.5']
+        assert pricing_manager.get_model_pricing('gpt-4o-mini-2024-07-18') is models['gpt-4o-mini']
+        assert pricing_manager.get_model_pricing('gpt-4o-2024-08-06') is models['gpt-4o']
+        assert pricing_manager.get_model_pricing('openrouter/GPT-4o') is models['gpt-4o']
+        assert pricing_manager.get_model_pricing('claude-3') is models['claude-3-opus']
+    
+    def test_model_resolution_strips_dotted_provider(self, pricing_manager):
+        """Test Bedrock-style provider prefixes are stripped without breaking versions"""
+        models = pricing_manager.config['models']
+        assert pricing_manager.get_model_pricing(
+            'anthropic.claude-3-haiku-20240307-v1:0') is models['claude-3-haiku']
+        assert pricing_manager.get_model_pricing(
+            'us.anthropic.claude-3-opus-20240229-v1:0') is models['claude-3-opus']
+        assert pricing_manager._normalize_model_name('Moonshot/Kimi-K2.5') == 'kimi-k2.5'
+        assert pricing_manager._normalize_model_name('gpt-4.1') == 'gpt-4.1'
+    
+    def test_missing_model_name_uses_default(self, pricing_manager):
+        """Test None or non-string model names fall back to default pricing"""
+        default = pricing_manager.config['models']['default']
+        assert pricing_manager._normalize_model_name(None) == ''
+        assert pricing_manager.get_model_pricing(None) is default
+        assert pricing_manager.get_model_pricing(42) is default
+        assert pricing_manager.get_model_pricing('') is default
+        costs = pricing_manager.calculate_costs([(None, 1000, 1000), ('gpt-4o', 1000, 0)])
+        assert costs[0]['input_cost'] == pricing_manager.calculate_cost('unknown-model', 1000, 1000)['input_cost']
+    
+    def test_model_resolution_ignores_insertion_order(self, pricing_manager):
+        """Test the result does not depend on the order models were configured"""
+        models = pricing_manager.config['models']
+        pricing_manager.config['models'] = dict(reversed(list(models.items())))
+        pricing_manager._build_index()
+        assert pricing_manager.get_model_pricing('kimi-k2')['input_per_1k'] == 0.001
+    
+    def test_resolution_cache_invalidated_on_update(self, pricing_manager):
+        """Test cached resolutions are dropped when pricing changes"""
+        assert pricing_manager.get_model_pricing('gpt-4o-mini-x')['input_per_1k'] == 0.00015
+        pricing_manager.update_model_pricing('gpt-4o-mini-x', 0.5, 0.5, 'USD')
+        assert pricing_manager.get_model_pricing('gpt-4o-mini-x-2025')['input_per_1k'] == 0.5
+        pricing_manager.delete_model_pricing('gpt-4o-mini-x')
+        assert pricing_manager.get_model_pricing('gpt-4o-mini-x-2025')['input_per_1k'] == 0.00015
+    
+    def test_writes_are_coalesced_and_atomic(self, pricing_manager, monkeypatch):
+        """Test a burst of mutations results in one atomic write"""
+        writes = []
+        original = pricing_manager._write_config
+        monkeypatch.setattr(pricing_manager, '_write_config',
+                            lambda data: (writes.append(data), original(data)))
+        
+        for i in range(20):
+            pricing_manager.update_model_pricing(f'model-{i}', 0.001, 0.002, 'USD')
+        pricing_manager.set_display_currency('USD')
+        assert writes == []
+        
+        pricing_manager.flush()
+        assert len(writes) == 1
+        assert not os.path.exists(pricing_manager.config_file + '.tmp')
+        with open(pricing_manager.config_file) as f:
+            saved = json.load(f)
+        assert saved['currency'] == 'USD'
+        assert 'model-19' in saved['models']
+        
+        pricing_manager.flush()
+        assert len(writes) == 1
+    
+    def test_debounced_write_happens_without_flush(self, pricing_manager, monkeypatch):
+        """Test pending changes are written once the debounce delay passes"""
+        monkeypatch.setattr(pricing_manager, 'SAVE_DELAY', 0.01)
+        pricing_manager.set_display_currency('USD')
+        
+        deadline = time.time() + 2
+        while pricing_manager._dirty and time.time() < deadline:
+            time.sleep(0.01)
+        with open(pricing_manager.config_file) as f:
+            assert json.load(f)['currency'] == 'USD'
+    
+    def test_import_pricing(self, pricing_manager):
+        """Test bulk import applies valid entries and skips invalid ones"""
+        imported = pricing_manager.import_pricing({
+            'bulk-a': {'input_per_1k': 0.1, 'output_per_1k': 0.2, 'currency': 'USD'},
+            'bulk-b': {'input_per_1k': '0.3', 'output_per_1k': 0.4},
+            'bulk-c': {'input_per_1k': 'abc', 'output_per_1k': 0.4},
+        })
+        assert imported == 2
+        assert pricing_manager.get_model_pricing('bulk-b')['input_per_1k'] == 0.3
+        assert 'bulk-c' not in pricing_manager.config['models']
+    
+    def test_import_pricing_rebuilds_index_once(self, pricing_manager, monkeypatch):
+        """Test a bulk import rebuilds the resolution index and schedules a save once"""
+        calls = {'index': 0, 'save': 0}
+        build_index = pricing_manager._build_index
+        save_config = pricing_manager._save_config
+
+        def counting_build_index():
+            calls['index'] += 1
+            build_index()
+
+        def counting_save_config(config):
+            calls['save'] += 1
+            save_config(config)
+
+        monkeypatch.setattr(pricing_manager, '_build_index', counting_build_index)
+        monkeypatch.setattr(pricing_manager, '_save_config', counting_save_config)
+        imported = pricing_manager.import_pricing({
+            f'bulk-model-{i}': {'input_per_1k': 0.1, 'output_per_1k': 0.2} for i in range(50)
+        })
+        assert imported == 50
+        assert calls == {'index': 1, 'save': 1}
+        assert pricing_manager.get_model_pricing('bulk-model-42-preview')['input_per_1k'] == 0.1
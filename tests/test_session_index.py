@@ -0,0 +1,341 @@
+"""
+Tests for session_index module
+"""
+
+import os
+import gzip
+import json
+import pytest
+import tempfile
+import shutil
+import session_index
+from session_index import SessionIndex, iter_lines_reversed, parse_line, is_candidate
+from token_ledger import TokenLedger
+from archives import ArchiveCache
+
+
+def usage_line(input_tokens, output_tokens):
+    return json.dumps({
+        "type": "message",
+        "message": {
+            "role": "assistant",
+            "usage": {"input": input_tokens, "output": output_tokens}
+        }
+    }) + "\n"
+
+
+class TestSessionIndex:
+    """Test cases for SessionIndex"""
+
+    @pytest.fixture
+    def sessions_dir(self):
+        """Create temporary sessions directory"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def index(self, sessions_dir):
+        return SessionIndex(os.path.join(sessions_dir, 'state', 'index.json'))
+
+    def test_initial_scan(self, sessions_dir, index):
+        """Test usage is aggregated on first scan"""
+        path = os.path.join(sessions_dir, 'a.jsonl')
+        with open(path, 'w') as f:
+            f.write(usage_line(100, 50))
+            f.write('{"type": "model_change", "modelId": "gpt-4o"}\n')
+            f.write(usage_line(10, 5))
+
+        cursor = index.refresh(sessions_dir)[path]
+        assert cursor['input'] == 110
+        assert cursor['output'] == 55
+        assert cursor['total'] == 165
+        assert cursor['offset'] == os.path.getsize(path)
+
+    def test_append_only_parses_new_bytes(self, sessions_dir, index):
+        """Test appended lines are added without re-reading history"""
+        path = os.path.join(sessions_dir, 'a.jsonl')
+        with open(path, 'w') as f:
+            f.write(usage_line(100, 50))
+        index.refresh(sessions_dir)
+
+        # Corrupt the already-indexed prefix in place: a rescan would drop it
+        with open(path, 'r+') as f:
+            f.write('X')
+        with open(path, 'a') as f:
+            f.write(usage_line(1, 2))
+
+        cursor = index.refresh(sessions_dir)[path]
+        assert cursor['input'] == 101
+        assert cursor['output'] == 52
+
+    def test_partial_line_waits_for_completion(self, sessions_dir, index):
+        """Test a half-written trailing line is not consumed"""
+        path = os.path.join(sessions_dir, 'a.jsonl')
+        line = usage_line(7, 3)
+        with open(path, 'w') as f:
+            f.write(usage_line(100, 50))
+            f.write(line[:20])
+
+        cursor = index.refresh(sessions_dir)[path]
+        assert cursor['input'] == 100
+
+        with open(path, 'a') as f:
+            f.write(line[20:])
+
+        cursor = index.refresh(sessions_dir)[path]
+        assert cursor['input'] == 107
+
+    def test_truncation_and_rotation(self, sessions_dir, index):
+        """Test truncated or replaced files are re-read from the start"""
+        path = os.path.join(sessions_dir, 'a.jsonl')
+        with open(path, 'w') as f:
+            f.write(usage_line(100, 50) * 3)
+        index.refresh(sessions_dir)
+
+        with open(path, 'w') as f:
+            f.write(usage_line(1, 1))
+        assert index.refresh(sessions_dir)[path]['input'] == 1
+
+        rotated = path + '.new'
+        with open(rotated, 'w') as f:
+            f.write(usage_line(5, 5) * 2)
+        os.replace(rotated, path)
+        assert index.refresh(sessions_dir)[path]['input'] == 10
+
+    def test_deleted_files_are_dropped(self, sessions_dir, index):
+        """Test deleted files disappear from the index"""
+        path = os.path.join(sessions_dir, 'a.jsonl')
+        with open(path, 'w') as f:
+            f.write(usage_line(1, 1))
+        assert path in index.refresh(sessions_dir)
+
+        os.remove(path)
+        assert path not in index.refresh(sessions_dir)
+
+    def test_refresh_only_changed_files(self, sessions_dir, index):
+        """Test a changed-file set limits which files are examined"""
+        a = os.path.join(sessions_dir, 'a.jsonl')
+        b = os.path.join(sessions_dir, 'b.jsonl')
+        for path in (a, b):
+            with open(path, 'w') as f:
+                f.write(usage_line(1, 1))
+        index.refresh(sessions_dir)
+
+        for path in (a, b):
+            with open(path, 'a') as f:
+                f.write(usage_line(10, 10))
+        cursors = index.refresh(sessions_dir, changed_files={a})
+        assert cursors[a]['input'] == 11
+        assert cursors[b]['input'] == 1
+
+        os.remove(a)
+        cursors = index.refresh(sessions_dir, changed_files={a})
+        assert a not in cursors
+        assert b in cursors
+
+    def test_state_persists(self, sessions_dir, index):
+        """Test cursors are reloaded from the state file"""
+        path = os.path.join(sessions_dir, 'a.jsonl')
+        with open(path, 'w') as f:
+            f.write(usage_line(100, 50))
+        index.refresh(sessions_dir)
+
+        reloaded = SessionIndex(index.state_file)
+        assert reloaded.cursors[path]['input'] == 100
+        assert reloaded.cursors[path]['offset'] == os.path.getsize(path)
+
+    def test_prefilter_skips_irrelevant_lines(self, sessions_dir, index):
+        """Test lines without usage/model_change markers are skipped undecoded"""
+        path = os.path.join(sessions_dir, 'a.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"type": "tool_result", "content": "' + 'x' * 1000 + '"}\n')
+            f.write('not json but irrelevant\n')
+            f.write('{"type": "model_change", "modelId": "gpt-4o"}\n')
+            f.write(usage_line(3, 4))
+
+        cursor = index.refresh(sessions_dir)[path]
+        assert cursor['total'] == 7
+        assert cursor['models'] == {'gpt-4o': {'input': 3, 'output': 4, 'total': 7}}
+        assert cursor['offset'] == os.path.getsize(path)
+
+    def test_parallel_backfill_matches_serial(self, sessions_dir):
+        """Test a process-pool backfill produces the same cursors as a serial scan"""
+        for i in range(6):
+            with open(os.path.join(sessions_dir, 's%d.jsonl' % i), 'w') as f:
+                f.write('{"type": "model_change", "modelId": "m%d"}\n' % (i % 2))
+                f.write(usage_line(10 * i, i) * (i + 1))
+
+        serial = SessionIndex(workers=1).refresh(sessions_dir)
+
+        ledger = TokenLedger(os.path.join(sessions_dir, 'state', 'ledger.db'))
+        parallel_index = SessionIndex(ledger=ledger, workers=2)
+        parallel_index.BACKFILL_MIN_FILES = 4
+        parallel = parallel_index.refresh(sessions_dir)
+
+        assert parallel == serial
+        ledger_total = sum(r['total'] for r in ledger.daily_by_model('1970-01-01'))
+        assert ledger_total == sum(c['total'] for c in serial.values())
+        assert ledger.session_count('1970-01-01') == 6
+        ledger.close()
+        progress = parallel_index.backfill_progress()
+        assert progress['running'] is False
+        assert progress['workers'] == 2
+        assert progress['files_done'] == progress['files_total'] == 6
+
+
+class TestSessionArchives:
+    """Test cases for compressed session archives"""
+
+    @pytest.fixture
+    def sessions_dir(self):
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def compress(self, path):
+        """gzip a file in place, like `gzip session.jsonl`"""
+        with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+        return path + '.gz'
+
+    def test_compressed_session_counts_once(self, sessions_dir):
+        """Test compressing a scanned session neither loses nor doubles its usage"""
+        path = os.path.join(sessions_dir, 'a.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"type": "model_change", "modelId": "gpt-4o"}\n')
+            f.write(usage_line(100, 50) * 3)
+
+        ledger = TokenLedger(os.path.join(sessions_dir, 'state', 'ledger.db'))
+        index = SessionIndex(ledger=ledger, workers=1, archive_cache=ArchiveCache())
+        index.refresh(sessions_dir)
+        archive = self.compress(path)
+
+        cursors = index.refresh(sessions_dir)
+        assert list(cursors) == [archive]
+        assert cursors[archive]['input'] == 300
+        assert cursors[archive]['model'] == 'gpt-4o'
+        assert sum(r['input'] for r in ledger.daily_by_model('1970-01-01')) == 300
+        assert ledger.session_count('1970-01-01') == 1
+        ledger.close()
+
+    def test_touched_archive_keeps_ledger_rows(self, sessions_dir):
+        """Test a stat-only change to an ingested archive leaves the ledger intact"""
+        path = os.path.join(sessions_dir, 'd.jsonl')
+        with open(path, 'w') as f:
+            f.write(usage_line(10, 5) * 2)
+        archive = self.compress(path)
+
+        state_dir = os.path.join(sessions_dir, 'state')
+        ledger_file = os.path.join(state_dir, 'ledger.db')
+        state_file = os.path.join(state_dir, 'index.json')
+        cache = ArchiveCache()
+        ledger = TokenLedger(ledger_file)
+        SessionIndex(state_file, ledger=ledger, workers=1, archive_cache=cache).refresh(sessions_dir)
+        ledger.close()
+
+        # After a restart the ledger is no longer fresh, so the archive cache is in play
+        ledger = TokenLedger(ledger_file)
+        index = SessionIndex(state_file, ledger=ledger, workers=1, archive_cache=cache)
+        assert sum(r['total'] for r in ledger.daily_by_model('1970-01-01')) == 30
+
+        os.utime(archive, (1, 1))
+        assert index.refresh(sessions_dir)[archive]['total'] == 30
+        assert sum(r['total'] for r in ledger.daily_by_model('1970-01-01')) == 30
+
+        # New content under the same name replaces the old rows
+        with gzip.open(archive, 'wb') as f:
+            f.write(usage_line(1, 1).encode())
+        assert index.refresh(sessions_dir)[archive]['total'] == 2
+        assert sum(r['total'] for r in ledger.daily_by_model('1970-01-01')) == 2
+        ledger.close()
+
+    def test_archives_are_parsed_once(self, sessions_dir, monkeypatch):
+        """Test an unchanged archive is never decompressed again, even by a new index"""
+        path = os.path.join(sessions_dir, 'b.jsonl')
+        with open(path, 'w') as f:
+            f.write(usage_line(7, 3))
+        archive = self.compress(path)
+
+        cache_file = os.path.join(sessions_dir, 'state', 'archives.json')
+        first = SessionIndex(archive_cache=ArchiveCache(cache_file)).refresh(sessions_dir)
+
+        def fail(path):
+            raise AssertionError('archive decompressed again')
+        monkeypatch.setattr(session_index, 'open_archive', fail)
+
+        index = SessionIndex(archive_cache=ArchiveCache(cache_file))
+        assert index.refresh(sessions_dir) == first
+        assert index.refresh(sessions_dir)[archive]['total'] == 10
+
+    def test_uncompressed_copy_wins(self, sessions_dir):
+        """Test `gzip -k` style copies are not counted twice"""
+        path = os.path.join(sessions_dir, 'c.jsonl')
+        with open(path, 'w') as f:
+            f.write(usage_line(1, 1))
+        with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+
+        assert list(SessionIndex().refresh(sessions_dir)) == [path]
+
+
+class TestIterLinesReversed:
+    """Test cases for iter_lines_reversed"""
+
+    @pytest.fixture
+    def path(self):
+        temp_dir = tempfile.mkdtemp()
+        yield os.path.join(temp_dir, 'a.jsonl')
+        shutil.rmtree(temp_dir)
+
+    def test_yields_lines_backwards(self, path):
+        """Test lines come back last-first across block boundaries"""
+        lines = [('line-%d-' % i) + 'x' * (i * 7) for i in range(50)]
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        result = list(iter_lines_reversed(path, block_size=16))
+        assert [line.decode() for line in result] == list(reversed(lines))
+
+    def test_no_trailing_newline_and_blank_lines(self, path):
+        """Test a missing final newline and blank lines are handled"""
+        with open(path, 'w') as f:
+            f.write('a\n\nb\nc')
+
+        assert list(iter_lines_reversed(path, block_size=2)) == [b'c', b'b', b'a']
+
+    def test_max_bytes_bounds_io(self, path):
+        """Test reading stops once max_bytes have been consumed"""
+        with open(path, 'w') as f:
+            f.write('x' * 10 + '\n' + 'y' * 10 + '\n')
+
+        assert list(iter_lines_reversed(path, block_size=4, max_bytes=12)) == [b'y' * 10]
+
+    def test_last_line_longer_than_max_bytes(self, path):
+        """Test the last line is always finished even past max_bytes"""
+        with open(path, 'w') as f:
+            f.write('x' * 10 + '\n' + 'y' * 40 + '\n')
+
+        assert list(iter_lines_reversed(path, block_size=4, max_bytes=12)) == [b'y' * 40]
+
+    def test_empty_file(self, path):
+        open(path, 'w').close()
+        assert list(iter_lines_reversed(path)) == []
+
+
+
+class TestParseLine:
+    """Test cases for parse_line and is_candidate"""
+
+    def test_parse_line(self):
+        assert parse_line(b'{"type": "message"}\n') == {"type": "message"}
+        # Non-standard JSON still decodes through the stdlib fallback
+        assert parse_line(b'{"value": NaN}').keys() == {"value"}
+        with pytest.raises(ValueError):
+            parse_line(b'{"type": "mess')
+
+    def test_is_candidate(self):
+        assert is_candidate(usage_line(1, 1).encode())
+        assert is_candidate(b'{"type": "model_change"}')
+        assert not is_candidate(b'{"type": "tool_result", "content": "usage: ls [dir]"}')
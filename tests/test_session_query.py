@@ -0,0 +1,90 @@
+"""
+Tests for session_query module
+"""
+
+import json
+import time
+import base64
+import pytest
+from session_query import query_sessions, session_metadata, decode_cursor, encode_cursor
+
+
+def cursor(total, model='gpt-4o', age=0, first_at=None):
+    return {
+        "mtime": time.time() - age,
+        "input": total, "output": 0, "total": total, "records": 1,
+        "size": total * 10, "model": model, "models": {model: {}},
+        "first_at": first_at
+    }
+
+
+class TestSessionQuery:
+    """Test cases for query_sessions"""
+
+    @pytest.fixture
+    def sessions(self):
+        now = time.time()
+        return [
+            session_metadata(f'/s/{i:02d}.jsonl', cursor(
+                total=i * 100,
+                model='gpt-4o' if i % 2 else 'claude-3-haiku',
+                age=0 if i < 3 else 86400 * i
+            ), 'main', now)
+            for i in range(10)
+        ]
+
+    def test_metadata(self, sessions):
+        """Test metadata derived from a cursor"""
+        first = sessions[0]
+        assert first['id'] == '00'
+        assert first['key'] == 'main/00'
+        assert first['status'] == 'running'
+        assert sessions[5]['status'] == 'completed'
+
+    def test_filters(self, sessions):
+        """Test model, status and token range filters"""
+        assert query_sessions(sessions, {"model": "gpt-4o"})['total'] == 5
+        assert query_sessions(sessions, {"status": "running"})['total'] == 3
+        result = query_sessions(sessions, {"min_tokens": "300", "max_tokens": "500"})
+        assert sorted(s['id'] for s in result['sessions']) == ['03', '04', '05']
+
+    def test_date_range(self, sessions):
+        """Test since/until bound the last active time, date-only until is inclusive"""
+        today = time.strftime('%Y-%m-%d')
+        result = query_sessions(sessions, {"since": today, "until": today})
+        assert sorted(s['id'] for s in result['sessions']) == ['00', '01', '02']
+
+    def test_cursor_pagination(self, sessions):
+        """Test pages are disjoint, ordered and stable across inserts"""
+        params = {"sort": "total", "order": "desc", "limit": "4"}
+        first = query_sessions(sessions, params)
+        assert [s['total'] for s in first['sessions']] == [900, 800, 700, 600]
+
+        # A session inserted ahead of the cursor does not shift the next page
+        sessions.append(session_metadata('/s/new.jsonl', cursor(total=5000), 'main', time.time()))
+        second = query_sessions(sessions, {**params, "cursor": first['next_cursor']})
+        assert [s['total'] for s in second['sessions']] == [500, 400, 300, 200]
+        third = query_sessions(sessions, {**params, "cursor": second['next_cursor']})
+        assert [s['total'] for s in third['sessions']] == [100, 0]
+        assert third['next_cursor'] is None
+
+        ascending = query_sessions(sessions, {"sort": "total", "order": "asc", "limit": "2"})
+        assert [s['total'] for s in ascending['sessions']] == [0, 100]
+        assert decode_cursor(ascending['next_cursor']) == (100, 'main/01')
+
+    def test_invalid_parameters(self, sessions):
+        """Test malformed parameters raise ValueError"""
+        for params in ({"sort": "nope"}, {"status": "zombie"}, {"since": "yesterday"},
+                       {"limit": "ten"}, {"cursor": "!!!"},
+                       {"sort": "total", "cursor": "WyJhIiwgImIiXQ"}):
+            with pytest.raises(ValueError):
+                query_sessions(sessions, params)
+
+    def test_malformed_cursor_shapes(self, sessions):
+        """Test cursors with the wrong shape or key type raise ValueError, not TypeError"""
+        for decoded in ([300, 7], [300], [300, "main/03", "x"], {"a": 1, "b": 2},
+                        "text", [True, "main/03"], [[300], "main/03"]):
+            token = encode_cursor(decoded) if isinstance(decoded, list) \
+                else base64.urlsafe_b64encode(json.dumps(decoded).encode()).decode()
+            with pytest.raises(ValueError):
+                query_sessions(sessions, {"sort": "total", "cursor": token})
@@ -0,0 +1,59 @@
+"""
+Tests for system_sampler module
+"""
+
+import time
+import pytest
+from system_sampler import SystemSampler
+
+
+class TestSystemSampler:
+    """Test cases for SystemSampler"""
+
+    @pytest.fixture
+    def sampler(self):
+        sampler = SystemSampler(interval=0.01, capacity=4)
+        yield sampler
+        sampler.stop()
+
+    def test_latest_empty(self, sampler):
+        """Test no sample is reported before the first one is taken"""
+        assert sampler.latest() is None
+        assert sampler.history()['timestamp'] == []
+
+    def test_sample_is_non_blocking(self, sampler):
+        """Test taking a sample does not wait for a CPU interval"""
+        started = time.time()
+        sampler.sample()
+        assert time.time() - started < 0.5
+
+        latest = sampler.latest()
+        assert 0 <= latest['cpu_percent'] <= 100
+        assert len(latest['per_cpu']) == sampler.cpu_count
+        assert latest['memory_total'] > 0
+
+    def test_ring_buffer_wraps(self, sampler):
+        """Test only the most recent `capacity` samples are kept, oldest first"""
+        for _ in range(6):
+            sampler.sample()
+
+        history = sampler.history()
+        assert len(history['timestamp']) == 4
+        assert history['timestamp'] == sorted(history['timestamp'])
+        assert history['timestamp'][-1] == sampler.latest()['timestamp']
+        assert len(history['per_cpu']) == 4
+
+    def test_history_window(self, sampler):
+        """Test history can be limited to a recent time window"""
+        sampler.sample()
+        time.sleep(0.05)
+        sampler.sample()
+        assert len(sampler.history(0.03)['timestamp']) == 1
+
+    def test_background_thread(self, sampler):
+        """Test the sampler thread fills the buffer on its own"""
+        sampler.start()
+        deadline = time.time() + 2
+        while len(sampler.history()['timestamp']) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(sampler.history()['timestamp']) >= 3
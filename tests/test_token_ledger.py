@@ -0,0 +1,159 @@
+"""
+Tests for token_ledger module
+"""
+
+import os
+import sqlite3
+import json
+import pytest
+import tempfile
+import shutil
+from token_ledger import TokenLedger
+from session_index import SessionIndex
+
+
+def usage_line(input_tokens, output_tokens, timestamp):
+    return json.dumps({
+        "type": "message",
+        "timestamp": timestamp,
+        "message": {
+            "role": "assistant",
+            "usage": {"input": input_tokens, "output": output_tokens}
+        }
+    }) + "\n"
+
+
+def ledger_totals(ledger, since_day, agent=None):
+    """Sum the ledger's (day, model) rollup into one input/output/total dict"""
+    totals = {"input": 0, "output": 0, "total": 0}
+    for row in ledger.daily_by_model(since_day, agent):
+        for key in totals:
+            totals[key] += row[key]
+    return totals
+
+
+class TestTokenLedger:
+    """Test cases for TokenLedger"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def ledger(self, temp_dir):
+        ledger = TokenLedger(os.path.join(temp_dir, 'state', 'ledger.db'))
+        yield ledger
+        ledger.close()
+
+    @pytest.fixture
+    def sessions_dir(self, temp_dir):
+        path = os.path.join(temp_dir, 'sessions')
+        os.makedirs(path)
+        return path
+
+    def row(self, offset, day='2026-03-01', hour='2026-03-01T10', model='gpt-4o',
+            session='s1', input_tokens=100, output_tokens=50):
+        return {
+            "offset": offset, "session": session, "model": model,
+            "ts": hour + ":00:00", "day": day, "hour": hour,
+            "input": input_tokens, "output": output_tokens,
+            "total": input_tokens + output_tokens
+        }
+
+    def test_wal_mode(self, ledger):
+        """Test the database runs in WAL mode"""
+        mode = ledger._conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == 'wal'
+
+    def test_ingest_is_idempotent(self, ledger):
+        """Test re-ingesting the same records does not double count"""
+        rows = [self.row(0), self.row(120)]
+        assert ledger.ingest('a.jsonl', rows) == 2
+        assert ledger.ingest('a.jsonl', rows) == 0
+        assert ledger_totals(ledger, '2026-01-01') == {"input": 200, "output": 100, "total": 300}
+
+    def test_rollups(self, ledger):
+        """Test hourly and daily rollups are maintained"""
+        ledger.ingest('a.jsonl', [
+            self.row(0),
+            self.row(1, hour='2026-03-01T11', model='claude-3-haiku'),
+            self.row(2, day='2026-03-02', hour='2026-03-02T09', session='s2'),
+        ])
+
+        daily = ledger.daily_by_model('2026-03-01')
+        assert [(d['day'], d['model']) for d in daily] == [
+            ('2026-03-01', 'claude-3-haiku'), ('2026-03-01', 'gpt-4o'), ('2026-03-02', 'gpt-4o')
+        ]
+        assert sum(d['input'] for d in daily if d['day'] == '2026-03-01') == 200
+
+        hourly = ledger.hourly('2026-03-01T11')
+        assert [h['hour'] for h in hourly] == ['2026-03-01T11', '2026-03-02T09']
+        assert ledger.session_count('2026-03-01') == 2
+        assert ledger.session_count('2026-03-02') == 1
+
+    def test_remove_source(self, ledger):
+        """Test removing a source rolls back its aggregates"""
+        ledger.ingest('a.jsonl', [self.row(0)])
+        ledger.ingest('b.jsonl', [self.row(0, session='s2', input_tokens=7)])
+
+        ledger.remove_source('a.jsonl')
+        assert ledger_totals(ledger, '2026-01-01')['input'] == 7
+        assert ledger.session_count('2026-01-01') == 1
+
+    def test_agent_filter(self, ledger):
+        """Test aggregates can be filtered and broken down by agent"""
+        ledger.ingest('a.jsonl', [self.row(0)], agent='main')
+        ledger.ingest('b.jsonl', [self.row(0, session='s2', input_tokens=7)], agent='coder')
+
+        assert ledger_totals(ledger, '2026-01-01')['input'] == 107
+        assert ledger_totals(ledger, '2026-01-01', agent='coder')['input'] == 7
+        assert ledger.session_count('2026-01-01', agent='main') == 1
+        assert [r['agent'] for r in ledger.totals_by_agent('2026-01-01')] == ['coder', 'main']
+        assert ledger.session_counts_by_agent('2026-01-01') == {'coder': 1, 'main': 1}
+
+    def test_outdated_schema_is_rebuilt(self, temp_dir):
+        """Test a ledger from an older schema is recreated for a full backfill"""
+        path = os.path.join(temp_dir, 'old.db')
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE usage_records (id INTEGER PRIMARY KEY, source TEXT)")
+        conn.commit()
+        conn.close()
+
+        ledger = TokenLedger(path)
+        assert ledger.created
+        ledger.ingest('a.jsonl', [self.row(0)], agent='coder')
+        ledger.close()
+
+        ledger = TokenLedger(path)
+        assert not ledger.created
+        assert ledger_totals(ledger, '2026-01-01', agent='coder')['input'] == 100
+        ledger.close()
+
+    def test_session_index_feeds_ledger(self, ledger, sessions_dir):
+        """Test parsed records land in the ledger by their own timestamp"""
+        path = os.path.join(sessions_dir, 'abc.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"type": "model_change", "modelId": "gpt-4o"}\n')
+            f.write(usage_line(100, 50, '2026-03-01T10:00:00'))
+            f.write(usage_line(10, 5, '2026-03-02T10:00:00'))
+
+        index = SessionIndex(ledger=ledger)
+        index.refresh(sessions_dir)
+        index.refresh(sessions_dir)
+
+        daily = ledger.daily_by_model('2026-01-01')
+        assert [(d['day'], d['input']) for d in daily] == [
+            ('2026-03-01', 100), ('2026-03-02', 10)
+        ]
+        models = ledger._conn.execute(
+            "SELECT DISTINCT model FROM usage_records"
+        ).fetchall()
+        assert [m[0] for m in models] == ['gpt-4o']
+
+        # Truncation replaces the file's records instead of adding to them
+        with open(path, 'w') as f:
+            f.write(usage_line(1, 1, '2026-03-01T10:00:00'))
+        index.refresh(sessions_dir)
+        assert ledger_totals(ledger, '2026-01-01')['input'] == 1
@@ -0,0 +1,241 @@
+"""
+OpenClaw Monitor - Token Ledger
+本地 SQLite（WAL 模式）Token 账本：每条 assistant 用量记录一行，
+并通过触发器维护按小时 / 按天的汇总表；所有汇总都带 agent 维度
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+# 表结构版本（PRAGMA user_version）；旧版本的账本在打开时重建并全量回填
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_records (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    agent TEXT NOT NULL DEFAULT 'main',
+    line_offset INTEGER NOT NULL,
+    session TEXT NOT NULL,
+    model TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    day TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    input INTEGER NOT NULL DEFAULT 0,
+    output INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (source, line_offset)
+);
+CREATE INDEX IF NOT EXISTS idx_usage_records_day ON usage_records (day);
+CREATE INDEX IF NOT EXISTS idx_usage_records_session_day ON usage_records (session, day);
+
+CREATE TABLE IF NOT EXISTS hourly_usage (
+    hour TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    model TEXT NOT NULL,
+    input INTEGER NOT NULL DEFAULT 0,
+    output INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    records INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, agent, model)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS daily_usage (
+    day TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    model TEXT NOT NULL,
+    input INTEGER NOT NULL DEFAULT 0,
+    output INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    records INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, agent, model)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS daily_sessions (
+    day TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    session TEXT NOT NULL,
+    PRIMARY KEY (day, agent, session)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS usage_records_after_insert
+AFTER INSERT ON usage_records
+BEGIN
+    INSERT INTO hourly_usage (hour, agent, model, input, output, total, records)
+    VALUES (NEW.hour, NEW.agent, NEW.model, NEW.input, NEW.output, NEW.total, 1)
+    ON CONFLICT (hour, agent, model) DO UPDATE SET
+        input = input + excluded.input,
+        output = output + excluded.output,
+        total = total + excluded.total,
+        records = records + 1;
+
+    INSERT INTO daily_usage (day, agent, model, input, output, total, records)
+    VALUES (NEW.day, NEW.agent, NEW.model, NEW.input, NEW.output, NEW.total, 1)
+    ON CONFLICT (day, agent, model) DO UPDATE SET
+        input = input + excluded.input,
+        output = output + excluded.output,
+        total = total + excluded.total,
+        records = records + 1;
+
+    INSERT OR IGNORE INTO daily_sessions (day, agent, session)
+    VALUES (NEW.day, NEW.agent, NEW.session);
+END;
+
+CREATE TRIGGER IF NOT EXISTS usage_records_after_delete
+AFTER DELETE ON usage_records
+BEGIN
+    UPDATE hourly_usage SET
+        input = input - OLD.input,
+        output = output - OLD.output,
+        total = total - OLD.total,
+        records = records - 1
+    WHERE hour = OLD.hour AND agent = OLD.agent AND model = OLD.model;
+    DELETE FROM hourly_usage
+    WHERE hour = OLD.hour AND agent = OLD.agent AND model = OLD.model AND records <= 0;
+
+    UPDATE daily_usage SET
+        input = input - OLD.input,
+        output = output - OLD.output,
+        total = total - OLD.total,
+        records = records - 1
+    WHERE day = OLD.day AND agent = OLD.agent AND model = OLD.model;
+    DELETE FROM daily_usage
+    WHERE day = OLD.day AND agent = OLD.agent AND model = OLD.model AND records <= 0;
+
+    DELETE FROM daily_sessions
+    WHERE day = OLD.day AND agent = OLD.agent AND session = OLD.session
+      AND NOT EXISTS (
+          SELECT 1 FROM usage_records
+          WHERE session = OLD.session AND day = OLD.day AND agent = OLD.agent
+      );
+END;
+"""
+
+# 旧版本账本重建前需要删除的对象
+DROP_SCHEMA = """
+DROP TRIGGER IF EXISTS usage_records_after_insert;
+DROP TRIGGER IF EXISTS usage_records_after_delete;
+DROP TABLE IF EXISTS usage_records;
+DROP TABLE IF EXISTS hourly_usage;
+DROP TABLE IF EXISTS daily_usage;
+DROP TABLE IF EXISTS daily_sessions;
+"""
+
+
+class TokenLedger:
+    """Token 用量账本
+
+    明细行以 (source, line_offset) 唯一，重复写入同一条记录会被忽略，
+    因此重新扫描文件是幂等的；汇总表由触发器随明细增删自动维护。
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        # 新建的账本需要全量回填，调用方据此丢弃旧游标
+        self.created = not os.path.exists(db_file)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # 新建或表结构已过时：重建后由调用方全量回填
+            if not self.created:
+                print(f"Token 账本表结构已更新（{version} -> {SCHEMA_VERSION}），重新回填")
+            self.created = True
+            self._conn.executescript(DROP_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def ingest(self, source: str, rows: List[dict], agent: str = "main") -> int:
+        """写入一个文件新解析出的用量记录，返回实际新增的行数"""
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            cur = self._conn.executemany(
+                "INSERT OR IGNORE INTO usage_records "
+                "(source, agent, line_offset, session, model, ts, day, hour, input, output, total) "
+                "VALUES (:source, :agent, :offset, :session, :model, :ts, :day, :hour, "
+                ":input, :output, :total)",
+                [{"source": source, "agent": agent, **row} for row in rows]
+            )
+            return cur.rowcount
+
+    def remove_source(self, source: str):
+        """删除某个文件的全部记录（文件被截断或轮转后重建时使用）"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM usage_records WHERE source = ?", (source,)
+            )
+
+    @staticmethod
+    def _filter(column: str, since: str, agent: Optional[str]) -> Tuple[str, tuple]:
+        """WHERE 子句：时间下限，可选按 agent 过滤"""
+        if agent is None:
+            return f"WHERE {column} >= ?", (since,)
+        return f"WHERE {column} >= ? AND agent = ?", (since, agent)
+
+    def daily_by_model(self, since_day: str, agent: Optional[str] = None) -> List[dict]:
+        """按 (天, 模型) 汇总"""
+        where, params = self._filter("day", since_day, agent)
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT day, model, SUM(input) AS input, SUM(output) AS output, "
+                f"SUM(total) AS total FROM daily_usage {where} "
+                "GROUP BY day, model ORDER BY day, model",
+                params
+            )
+            return [dict(row) for row in cur.fetchall()]
+
+    def totals_by_agent(self, since_day: str) -> List[dict]:
+        """某天以来按 (agent, 模型) 的合计"""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT agent, model, SUM(input) AS input, SUM(output) AS output, "
+                "SUM(total) AS total FROM daily_usage WHERE day >= ? "
+                "GROUP BY agent, model ORDER BY agent, model",
+                (since_day,)
+            )
+            return [dict(row) for row in cur.fetchall()]
+
+    def session_counts_by_agent(self, since_day: str) -> Dict[str, int]:
+        """某天以来各 agent 产生过用量的会话数"""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT agent, COUNT(DISTINCT session) FROM daily_sessions "
+                "WHERE day >= ? GROUP BY agent",
+                (since_day,)
+            )
+            return {agent: count for agent, count in cur.fetchall()}
+
+    def hourly(self, since_hour: str, agent: Optional[str] = None) -> List[dict]:
+        """按小时汇总（合并所有模型），since_hour 为 YYYY-MM-DDTHH"""
+        where, params = self._filter("hour", since_hour, agent)
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT hour, SUM(input) AS input, SUM(output) AS output, "
+                f"SUM(total) AS total FROM hourly_usage {where} "
+                "GROUP BY hour ORDER BY hour",
+                params
+            )
+            return [dict(row) for row in cur.fetchall()]
+
+    def session_count(self, since_day: str, agent: Optional[str] = None) -> int:
+        """某天以来产生过用量的会话数"""
+        where, params = self._filter("day", since_day, agent)
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT COUNT(DISTINCT session) FROM daily_sessions {where}",
+                params
+            )
+            return cur.fetchone()[0]